@@ -0,0 +1,181 @@
+"""
+bench_export.py
+Benchmark del pipeline de exportación (compile → emit → main.dart → proyecto en
+disco → compresión → ZIP) sobre UI sintética. No usa base de datos ni OpenAI.
+
+    python -m benchmarks.bench_export --pages 20 --widgets 40 --depth 4 --out bench.json
+    python -m benchmarks.bench_export --baseline bench.json --tolerance 0.25
+
+Por etapa registra tiempo de pared (mediana y mínimo de --repeat corridas),
+pico de memoria (tracemalloc, en una corrida aparte para no distorsionar los
+tiempos) y tamaño de la salida. Con --baseline sale con código 1 si alguna
+etapa es más lenta que la guardada por encima de la tolerancia.
+"""
+import argparse, json, os, platform, statistics, sys, tempfile, time, tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+# core.config exige estas variables aunque el benchmark no las use
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("OPENAI_API_KEY", "offline")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.synthetic_ui import DEFAULT_MIX, synthetic_ui
+from services.flutter_generator import (
+    GENERATOR_VERSION, compress_overlays, generate_flutter_app, iter_flutter_zip,
+    skeleton_entries, template_version,
+)
+from services.ui_compiler import build_dart_files, build_main_dart, clear_page_cache, compile_ui, emit_app
+
+# Diferencias por debajo de esto (ms) se consideran ruido en modo regresión
+NOISE_FLOOR_MS = 2.0
+
+# ─── Etapas ───
+# Cada etapa: (nombre, preparar() → estado, ejecutar(estado) → tamaño de salida en bytes)
+
+Stage = Tuple[str, Callable[[], Any], Callable[[Any], int]]
+
+def _dir_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+def _write_project(data: Dict[str, Any]) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        out = Path(tmp) / "app"
+        generate_flutter_app(data, out)
+        return _dir_size(out)
+
+def _manual_data(ui: Dict[str, Any]) -> Dict[str, Any]:
+    files = build_dart_files(ui)
+    return {"appName": ui["name"], "generated_code": files.pop("lib/main.dart"), "generated_files": files}
+
+def _compile(ui: Dict[str, Any]) -> int:
+    compile_ui(ui)
+    return 0                    # el IR vive en memoria: sin salida serializada
+
+def _utf8_len(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+def _main_dart_cold(ui: Dict[str, Any]) -> int:
+    clear_page_cache()
+    return _utf8_len(build_main_dart(ui))
+
+def _warm(ui: Dict[str, Any]) -> Dict[str, Any]:
+    build_main_dart(ui)
+    return ui
+
+def _dart_files_cold(ui: Dict[str, Any]) -> int:
+    clear_page_cache()
+    return sum(_utf8_len(code) for code in build_dart_files(ui).values())
+
+def stages(ui: Dict[str, Any]) -> List[Stage]:
+    return [
+        ("compile", lambda: ui, _compile),
+        ("emit", lambda: compile_ui(ui), lambda ir: _utf8_len(emit_app(ir))),
+        ("build_main_dart_cold", lambda: ui, _main_dart_cold),
+        ("build_main_dart_warm", lambda: _warm(ui), lambda u: _utf8_len(build_main_dart(u))),
+        ("build_dart_files", lambda: ui, _dart_files_cold),
+        ("generate_flutter_app", lambda: _manual_data(ui), _write_project),
+        ("compress_overlays", lambda: _manual_data(ui),
+         lambda d: sum(e.size for e in compress_overlays(d).values())),
+        ("zip_stream", lambda: compress_overlays(_manual_data(ui)),
+         lambda ov: sum(len(c) for c in iter_flutter_zip(ov))),
+    ]
+
+# ─── Medición ───
+
+def measure(stage: Stage, repeat: int) -> Dict[str, Any]:
+    name, prepare, run = stage
+    times: List[float] = []
+    size = 0
+    for _ in range(repeat):
+        state = prepare()
+        t0 = time.perf_counter()
+        size = run(state)
+        times.append((time.perf_counter() - t0) * 1000)
+
+    state = prepare()
+    tracemalloc.start()
+    try:
+        run(state)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "wall_ms_median": round(statistics.median(times), 3),
+        "wall_ms_min": round(min(times), 3),
+        "peak_kib": round(peak / 1024, 1),
+        "output_bytes": size,
+    }
+
+def run_suite(args: argparse.Namespace) -> Dict[str, Any]:
+    ui = synthetic_ui(args.pages, args.widgets, args.depth, args.fanout, args.mix, args.seed)
+    skeleton_entries()          # el skeleton se prepara una vez al arrancar la app
+    results: Dict[str, Any] = {}
+    for stage in stages(ui):
+        if args.stages and stage[0] not in args.stages:
+            continue
+        r = results[stage[0]] = measure(stage, args.repeat)
+        print(f"{stage[0]:<22} {r['wall_ms_median']:>10.2f} ms {r['peak_kib']:>10.1f} KiB"
+              f" {r['output_bytes']:>12} B", file=sys.stderr)
+    return {
+        "meta": {
+            "params": {k: getattr(args, k) for k in ("pages", "widgets", "depth", "fanout", "mix", "seed", "repeat")},
+            "python": platform.python_version(),
+            "generator_version": GENERATOR_VERSION,
+            "template_version": template_version(),
+        },
+        "stages": results,
+    }
+
+def regressions(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    out = []
+    for name, base in baseline.get("stages", {}).items():
+        cur = current["stages"].get(name)
+        if cur is None:
+            continue
+        before, after = base["wall_ms_median"], cur["wall_ms_median"]
+        if after > before * (1 + tolerance) and after - before > NOISE_FLOOR_MS:
+            out.append(f"{name}: {before:.2f} ms → {after:.2f} ms (+{(after / before - 1) * 100:.0f}%)")
+    return out
+
+# ─── CLI ───
+
+def main(argv: List[str] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pages", type=int, default=10)
+    ap.add_argument("--widgets", type=int, default=20, help="widgets de nivel superior por página")
+    ap.add_argument("--depth", type=int, default=3, help="niveles de anidamiento de contenedores")
+    ap.add_argument("--fanout", type=int, default=3, help="hijos por contenedor")
+    ap.add_argument("--mix", default=DEFAULT_MIX, help="pesos por tipo, p. ej. 'text=3,button=1,column=2'")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--stages", nargs="*", help="sólo estas etapas")
+    ap.add_argument("--out", help="guardar resultados JSON aquí (por defecto stdout)")
+    ap.add_argument("--baseline", help="JSON de una corrida anterior para detectar regresiones")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="lentitud relativa permitida (0.25 = +25%%)")
+    args = ap.parse_args(argv)
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        # misma carga que la baseline para que la comparación tenga sentido
+        for k, v in baseline["meta"]["params"].items():
+            if k != "repeat":
+                setattr(args, k, v)
+
+    result = run_suite(args)
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    if args.baseline:
+        slow = regressions(result, baseline, args.tolerance)
+        for line in slow:
+            print(f"REGRESIÓN {line}", file=sys.stderr)
+        return 1 if slow else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+synthetic_ui.py
+Generador de UI JSON sintético (mismo formato que envía el editor) para los
+benchmarks: número de páginas, widgets por página, profundidad de anidamiento
+y mezcla de tipos configurables. Determinista para una misma semilla.
+"""
+import random
+from typing import Any, Callable, Dict, List
+
+# ─── Widgets hoja ───
+
+def _text(r: random.Random, i: int) -> Dict[str, Any]:
+    return {"type": "text", "text": f"Texto {i}", "fontSize": r.choice([12, 14, 16])}
+
+def _heading(r: random.Random, i: int) -> Dict[str, Any]:
+    return {"type": "heading", "text": f"Título {i}", "fontSize": 22, "bold": True, "align": "center"}
+
+def _button(r: random.Random, i: int) -> Dict[str, Any]:
+    return {"type": "button", "label": f"Acción {i}", "backgroundColor": r.choice(["#2563eb", "#16a34a"])}
+
+def _image(r: random.Random, i: int) -> Dict[str, Any]:
+    return {"type": "image", "src": f"https://picsum.photos/seed/{i}/200", "width": "100%", "height": "120px"}
+
+def _text_field(r: random.Random, i: int) -> Dict[str, Any]:
+    return {"type": "textField", "label": f"Campo {i}", "placeholder": "Escribe aquí"}
+
+def _checkbox(r: random.Random, i: int) -> Dict[str, Any]:
+    return {"type": "checkbox", "label": f"Opción {i}", "value": r.random() < 0.5}
+
+def _switch(r: random.Random, i: int) -> Dict[str, Any]:
+    return {"type": "switch", "label": f"Ajuste {i}", "value": r.random() < 0.5}
+
+def _dropdown(r: random.Random, i: int) -> Dict[str, Any]:
+    return {"type": "dropdown", "label": f"Lista {i}", "items": ["A", "B", "C"], "value": "A"}
+
+def _list_tile(r: random.Random, i: int) -> Dict[str, Any]:
+    return {"type": "listTile", "title": f"Elemento {i}", "subtitle": "Detalle",
+            "icon": {"name": "star", "color": "#f59e0b"}}
+
+def _data_table(r: random.Random, i: int) -> Dict[str, Any]:
+    return {"type": "dataTable", "table": {"columns": ["Id", "Nombre"],
+                                           "rows": [[str(n), f"Fila {n}"] for n in range(5)]}}
+
+LEAVES: Dict[str, Callable[[random.Random, int], Dict[str, Any]]] = {
+    "text": _text, "heading": _heading, "button": _button, "image": _image,
+    "textField": _text_field, "checkbox": _checkbox, "switch": _switch,
+    "dropdown": _dropdown, "listTile": _list_tile, "dataTable": _data_table,
+}
+
+# Widgets con hijos
+CONTAINERS = ("column", "row", "card", "container", "listView", "stack")
+
+DEFAULT_MIX = "text=4,button=2,image=1,textField=1,checkbox=1,listTile=1,column=2,row=1,card=1,container=1"
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """'text=3,button=1,column=2' → {tipo: peso}."""
+    mix: Dict[str, float] = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        kind, _, weight = part.partition("=")
+        if kind not in LEAVES and kind not in CONTAINERS:
+            raise ValueError(f"tipo de widget no soportado en el benchmark: '{kind}'")
+        mix[kind] = float(weight or 1)
+    if not any(k in LEAVES for k in mix):
+        raise ValueError("la mezcla necesita al menos un widget hoja")
+    return mix
+
+# ─── Generador ───
+
+def synthetic_ui(pages: int = 5, widgets: int = 20, depth: int = 3, fanout: int = 3,
+                 mix: str = DEFAULT_MIX, seed: int = 0) -> Dict[str, Any]:
+    """
+    `widgets` es el número de widgets de nivel superior por página; cada contenedor
+    lleva `fanout` hijos hasta `depth` niveles (a partir de ahí sólo hojas).
+    """
+    r = random.Random(seed)
+    weights = parse_mix(mix)
+    leaf_kinds = [k for k in weights if k in LEAVES]
+    counter = 0
+
+    def pick(level: int) -> str:
+        kinds = list(weights) if level < depth else leaf_kinds
+        return r.choices(kinds, [weights[k] for k in kinds])[0]
+
+    def tree(level: int) -> Dict[str, Any]:
+        nonlocal counter
+        # iterativo: con depth alto no debe chocar con el límite de recursión
+        root: Dict[str, Any] = {}
+        stack = [(root, level)]
+        while stack:
+            slot, lvl = stack.pop()
+            counter += 1
+            kind = pick(lvl)
+            if kind in LEAVES:
+                slot.update(LEAVES[kind](r, counter))
+                continue
+            children: List[Dict[str, Any]] = [{} for _ in range(fanout)]
+            slot.update({"type": kind, "children": children})
+            if kind == "container":
+                slot.update({"padding": "8px", "backgroundColor": "#f1f5f9"})
+            stack.extend((ch, lvl + 1) for ch in children)
+        return root
+
+    names = [f"page_{n}" for n in range(pages)]
+    return {
+        "name": "Benchmark App",
+        "theme": {"primary": "#2563eb"},
+        "routes": [f"/{n}" for n in names],
+        "pages": [
+            {
+                "name": name,
+                "title": f"Página {n}",
+                "widgets": [{"type": "appBar", "title": f"Página {n}"}]
+                           + [tree(0) for _ in range(widgets)],
+            }
+            for n, name in enumerate(names)
+        ],
+    }
@@ -4,6 +4,65 @@ class Settings(BaseSettings):
     DATABASE_URL: str
     openai_api_key: str  # Add this line to accept the OpenAI API key
 
+    # Caché de exportaciones (ZIP) compartida por todos los workers del host
+    export_cache_dir: str = ""                      # vacío → <tmp>/flutter_builder_exports
+    export_cache_max_bytes: int = 512 * 1024 * 1024
+
+    # Pool para codegen + compresión fuera del event loop
+    export_pool_kind: str = "thread"                # "thread" | "process"
+    export_pool_workers: int = 4
+    export_pool_queue: int = 16                     # tareas extra en espera antes de rechazar
+    export_pool_retry_after: int = 5                # segundos sugeridos en Retry-After
+
+    # Redis opcional (estado de jobs, cachés); vacío → todo en memoria del proceso
+    redis_url: str = ""
+
+    # Cliente de OpenAI: pool, timeouts, reintentos y circuit breaker
+    openai_base_url: str = ""                      # vacío → API oficial (útil para proxies o un fake local)
+    openai_max_connections: int = 100
+    openai_max_keepalive: int = 20
+    openai_keepalive_expiry: float = 30
+    openai_connect_timeout: float = 5
+    openai_read_timeout: float = 120                # entre bytes: una respuesta larga en streaming no corta
+    openai_write_timeout: float = 30
+    openai_pool_timeout: float = 10                 # esperando una conexión libre del pool
+    openai_max_retries: int = 3                     # sobre 429, 5xx, timeouts y errores de conexión
+    openai_backoff_base: float = 0.5
+    openai_backoff_max: float = 20                  # tope de espera entre intentos (y de Retry-After aceptado)
+    openai_breaker_failures: int = 5                # fallos seguidos que abren el circuito
+    openai_breaker_reset: float = 30                # segundos abierto antes de la llamada de prueba
+
+    # Generación con LLM por página: completions en paralelo por exportación
+    llm_page_concurrency: int = 4
+
+    # UI JSON del modelo: re-prompts de un subárbol cuando la reparación local no alcanza
+    ui_repair_max_reprompts: int = 2
+
+    # Caché de respuestas del LLM para prompts repetidos
+    llm_cache_ttl: int = 24 * 3600
+    llm_cache_max_entries: int = 1024
+
+    # Dedup de capturas en los endpoints de visión
+    image_cache_max_entries: int = 256
+    image_cache_ttl: int = 24 * 3600
+    image_cache_max_distance: int = 0               # bits de dHash distintos que aún cuentan como la misma imagen; 0 → sólo sha256
+
+    # Preprocesado de capturas antes de las llamadas de visión (requiere Pillow)
+    vision_max_side: int = 1536                     # lado mayor máximo en px
+    vision_format: str = "jpeg"                     # "jpeg" | "webp" | "png"
+    vision_quality: int = 85
+    vision_detail: str = "auto"                     # "auto" elige low/high por tamaño
+    vision_low_detail_max_side: int = 512
+
+    # Límites de memoria para subidas de imágenes
+    upload_max_bytes: int = 10 * 1024 * 1024        # por petición; más → 413
+    upload_inflight_max_bytes: int = 64 * 1024 * 1024   # por worker, sumando todas las subidas en curso
+    upload_budget_wait: float = 10                  # segundos esperando hueco antes del 503
+
+    # Jobs de exportación asíncronos
+    export_jobs_concurrency: int = 4
+    export_job_ttl: int = 3600                      # segundos que se conserva el resultado
+
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -0,0 +1,115 @@
+"""
+llm_telemetry.py
+Telemetría por llamada a OpenAI: endpoint, modelo, latencias, tokens y resultado.
+
+    with LLMCall("analyze-ui-prompt", "gpt-4o") as call:
+        call.attempt()              # antes de cada intento (los reintentos cuentan como cola)
+        call.token()                # en cada fragmento de un stream
+        call.record_usage(usage)    # `usage` de la respuesta
+
+Al salir del bloque se observan los histogramas, se suman tokens y resultado en
+/metrics y se escribe una línea JSON en el logger "llm".
+
+Latencias: queue = desde que empieza la llamada hasta el intento que respondió
+(reintentos + backoff), first_token = hasta el primer fragmento (sólo streaming),
+total = todo. Resultados: ok, invalid_json, timeout, rate_limited, upstream_error,
+client_error, circuit_open, cancelled, error.
+"""
+import asyncio, json, logging, time
+from typing import Any, Optional
+
+import openai
+
+from core.metrics import Counter, Histogram
+
+log = logging.getLogger("llm")
+
+_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+
+LLM_QUEUE = Histogram("llm_call_queue_seconds", "Espera antes del intento que respondió (reintentos y backoff)", _BUCKETS)
+LLM_FIRST_TOKEN = Histogram("llm_call_first_token_seconds", "Hasta el primer fragmento en streaming", _BUCKETS)
+LLM_TOTAL = Histogram("llm_call_seconds", "Duración total de la llamada al modelo", _BUCKETS)
+LLM_CALLS = Counter("llm_calls_total", "Llamadas al modelo por endpoint, modelo y resultado")
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens consumidos por endpoint, modelo y tipo (prompt, completion)")
+
+
+def classify(exc: BaseException) -> str:
+    if isinstance(exc, (asyncio.CancelledError, GeneratorExit)):
+        return "cancelled"
+    if isinstance(exc, openai.APITimeoutError):
+        return "timeout"
+    if isinstance(exc, openai.RateLimitError):
+        return "rate_limited"
+    if isinstance(exc, openai.APIConnectionError):
+        return "upstream_error"
+    if isinstance(exc, openai.APIStatusError):
+        return "upstream_error" if exc.status_code >= 500 else "client_error"
+    return "error"
+
+
+class LLMCall:
+    def __init__(self, endpoint: str, model: str) -> None:
+        self.endpoint = endpoint
+        self.model = model
+        self.outcome: Optional[str] = None      # quien detecta algo más específico lo fija antes de salir
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.attempts = 0
+        self._started = time.perf_counter()
+        self._sent: Optional[float] = None
+        self._first_token: Optional[float] = None
+
+    def attempt(self) -> None:
+        self.attempts += 1
+        self._sent = time.perf_counter()
+
+    def token(self) -> None:
+        if self._first_token is None:
+            self._first_token = time.perf_counter()
+
+    def record_usage(self, usage: Any) -> None:
+        if usage is not None:
+            self.prompt_tokens = getattr(usage, "prompt_tokens", None)
+            self.completion_tokens = getattr(usage, "completion_tokens", None)
+
+    def __enter__(self) -> "LLMCall":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self.outcome is None:
+            self.outcome = "ok" if exc is None else classify(exc)
+        self._finish()
+
+    def _finish(self) -> None:
+        end = time.perf_counter()
+        labels = {"endpoint": self.endpoint, "model": self.model}
+        total = end - self._started
+        queue = (self._sent - self._started) if self._sent is not None else None
+        first_token = (self._first_token - self._started) if self._first_token is not None else None
+
+        LLM_TOTAL.observe(total, **labels)
+        if queue is not None:
+            LLM_QUEUE.observe(queue, **labels)
+        if first_token is not None:
+            LLM_FIRST_TOKEN.observe(first_token, **labels)
+        LLM_CALLS.inc(outcome=self.outcome, **labels)
+        if self.prompt_tokens:
+            LLM_TOKENS.inc(self.prompt_tokens, kind="prompt", **labels)
+        if self.completion_tokens:
+            LLM_TOKENS.inc(self.completion_tokens, kind="completion", **labels)
+
+        log.info(json.dumps({
+            "event": "llm_call",
+            **labels,
+            "outcome": self.outcome,
+            "attempts": self.attempts,
+            "queue_ms": _ms(queue),
+            "first_token_ms": _ms(first_token),
+            "total_ms": _ms(total),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+        }))
+
+
+def _ms(seconds: Optional[float]) -> Optional[int]:
+    return None if seconds is None else round(seconds * 1000)
@@ -0,0 +1,92 @@
+"""
+metrics.py
+Registro mínimo de métricas en proceso (counters, gauges, histogramas) expuesto
+en formato de texto Prometheus por GET /metrics. Cada worker reporta lo suyo.
+"""
+import threading
+from typing import Dict, List, Tuple
+
+_LabelKey = Tuple[Tuple[str, str], ...]
+
+_REGISTRY: List["_Metric"] = []
+_lock = threading.Lock()
+
+
+def _key(labels: Dict[str, str]) -> _LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt(key: _LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self.values: Dict[_LabelKey, float] = {}
+        _REGISTRY.append(self)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, v in self.values.items():
+            lines.append(f"{self.name}{_fmt(key)} {v}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        k = _key(labels)
+        with _lock:
+            self.values[k] = self.values.get(k, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        with _lock:
+            self.values[_key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, help)
+        self.buckets = buckets
+        self.series: Dict[_LabelKey, List[float]] = {}   # [counts..., +Inf, sum]
+
+    def observe(self, value: float, **labels: str) -> None:
+        k = _key(labels)
+        with _lock:
+            s = self.series.setdefault(k, [0.0] * (len(self.buckets) + 2))
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    s[i] += 1
+            s[-2] += 1
+            s[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, s in self.series.items():
+            for b, c in zip(self.buckets, s):
+                lines.append(f"{self.name}_bucket{_fmt(key, (('le', str(b)),))} {c}")
+            lines.append(f"{self.name}_bucket{_fmt(key, (('le', '+Inf'),))} {s[-2]}")
+            lines.append(f"{self.name}_count{_fmt(key)} {s[-2]}")
+            lines.append(f"{self.name}_sum{_fmt(key)} {s[-1]}")
+        return lines
+
+
+def render() -> str:
+    with _lock:
+        return "\n".join(line for m in _REGISTRY for line in m.render()) + "\n"
@@ -0,0 +1,193 @@
+"""
+openai_client.py
+Cliente de OpenAI compartido y su política de resiliencia.
+
+- Pool httpx acotado (conexiones, keep-alive) y timeouts de connect/read/write/pool
+  explícitos: una respuesta colgada no retiene el handler para siempre.
+- call(): reintenta 429, 5xx, timeouts y errores de conexión con backoff
+  exponencial con jitter, respetando Retry-After / retry-after-ms del upstream.
+  Los reintentos del SDK se desactivan para que la política sea sólo ésta.
+- CircuitBreaker: tras N fallos seguidos del upstream corta en seco con
+  UpstreamUnavailable durante `openai_breaker_reset` segundos y luego deja pasar
+  una sola llamada de prueba.
+
+Todo se configura en core/config.Settings (openai_*).
+"""
+import asyncio, logging, random, time
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+from core.config import settings
+from core.metrics import Counter, Gauge
+
+T = TypeVar("T")
+
+log = logging.getLogger(__name__)
+
+OPENAI_RETRIES = Counter("openai_retries_total", "Reintentos de llamadas a OpenAI por motivo")
+OPENAI_BREAKER_STATE = Gauge("openai_breaker_open", "1 si el circuit breaker de OpenAI está abierto")
+OPENAI_BREAKER_REJECTED = Counter("openai_breaker_rejected_total", "Llamadas cortadas por el circuit breaker")
+
+
+class UpstreamUnavailable(Exception):
+    def __init__(self, retry_after: int) -> None:
+        super().__init__("OpenAI upstream unavailable")
+        self.retry_after = retry_after
+
+
+# ─────────── Circuit breaker ───────────
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == "closed":
+            return
+        if state == "half_open" and not self._probing:
+            # una sola llamada de prueba; el resto sigue cortado hasta saber el resultado
+            self._probing = True
+            return
+        OPENAI_BREAKER_REJECTED.inc()
+        remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+        raise UpstreamUnavailable(max(1, int(remaining + 0.999)))
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            log.info("Circuit breaker de OpenAI cerrado")
+        self.failures, self.opened_at, self._probing = 0, None, False
+        OPENAI_BREAKER_STATE.set(0)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            if self.opened_at is None or self._probing:
+                log.warning("Circuit breaker de OpenAI abierto tras %d fallos", self.failures)
+            self.opened_at, self._probing = time.monotonic(), False
+            OPENAI_BREAKER_STATE.set(1)
+
+    def release_probe(self) -> None:
+        # la llamada de prueba terminó sin veredicto (p. ej. error 400 del cliente)
+        self._probing = False
+
+
+# ─────────── Reintentos ───────────
+
+def _retry_reason(exc: Exception) -> Optional[str]:
+    if isinstance(exc, openai.APITimeoutError):
+        return "timeout"
+    if isinstance(exc, openai.APIConnectionError):
+        return "connection"
+    if isinstance(exc, openai.RateLimitError):
+        return "rate_limit"
+    if isinstance(exc, openai.APIStatusError) and exc.status_code >= 500:
+        return "server_error"
+    return None
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    """Segundos pedidos por el upstream (retry-after-ms, Retry-After en segundos o fecha HTTP)."""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def _backoff(attempt: int) -> float:
+    # "full jitter": uniforme en [0, min(max, base·2^n)] para no sincronizar reintentos
+    return random.uniform(0, min(settings.openai_backoff_max, settings.openai_backoff_base * 2 ** attempt))
+
+
+async def call(fn: Callable[[], Awaitable[T]]) -> T:
+    """Ejecuta una llamada a OpenAI con reintentos y circuit breaker."""
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            breaker.release_probe()
+            raise
+        except Exception as exc:
+            reason = _retry_reason(exc)
+            if reason is None:
+                breaker.release_probe()
+                raise
+            # 429 es cuota, no salud del upstream: no abre el breaker
+            if reason != "rate_limit":
+                breaker.record_failure()
+            else:
+                breaker.release_probe()
+            if attempt >= settings.openai_max_retries:
+                raise
+            wait = _retry_after(exc)
+            if wait is None:
+                wait = _backoff(attempt)
+            elif wait > settings.openai_backoff_max:
+                raise   # el upstream pide esperar más de lo que aceptamos
+            attempt += 1
+            OPENAI_RETRIES.inc(reason=reason)
+            log.warning("OpenAI %s; reintento %d/%d en %.2fs", reason, attempt, settings.openai_max_retries, wait)
+            await asyncio.sleep(wait)
+            continue
+        breaker.record_success()
+        return result
+
+
+# ─────────── Cliente ───────────
+
+def _build_client() -> AsyncOpenAI:
+    timeout = httpx.Timeout(
+        connect=settings.openai_connect_timeout,
+        read=settings.openai_read_timeout,
+        write=settings.openai_write_timeout,
+        pool=settings.openai_pool_timeout,
+    )
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.openai_max_connections,
+            max_keepalive_connections=settings.openai_max_keepalive,
+            keepalive_expiry=settings.openai_keepalive_expiry,
+        ),
+        timeout=timeout,
+    )
+    # el SDK manda su propio timeout por petición (600s): pasarlo también acá
+    return AsyncOpenAI(
+        api_key=settings.openai_api_key,
+        base_url=settings.openai_base_url or None,
+        timeout=timeout,
+        max_retries=0,
+        http_client=http_client,
+    )
+
+
+client = _build_client()
+breaker = CircuitBreaker(settings.openai_breaker_failures, settings.openai_breaker_reset)
+
+async def close_openai() -> None:
+    await client.close()
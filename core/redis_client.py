@@ -0,0 +1,25 @@
+"""
+redis_client.py
+Conexión Redis compartida y opcional. `redis` queda en None si no hay REDIS_URL
+o si el paquete no está instalado; quien lo use debe tener un fallback en memoria.
+"""
+import logging
+from core.config import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+log = logging.getLogger(__name__)
+
+redis = None
+if settings.redis_url:
+    if aioredis is None:
+        log.warning("REDIS_URL configurado pero el paquete 'redis' no está instalado; usando memoria")
+    else:
+        redis = aioredis.from_url(settings.redis_url, decode_responses=True)
+
+async def close_redis() -> None:
+    if redis is not None:
+        await redis.aclose()
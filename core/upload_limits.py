@@ -0,0 +1,141 @@
+"""
+upload_limits.py
+Límites de memoria para las subidas de imágenes.
+
+- UploadLimitMiddleware: corta con 413 las peticiones multipart más grandes que
+  `upload_max_bytes` (+ margen del multipart), por Content-Length o contando
+  el body mientras llega.
+- read_upload(): lee el archivo ya recibido validando su tamaño.
+- ByteBudget: tope por worker de bytes de imagen en proceso; si se llena, las
+  peticiones esperan un poco y luego reciben 503 con Retry-After.
+"""
+import asyncio
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+from core.config import settings
+from core.metrics import Counter, Gauge
+
+UPLOAD_INFLIGHT_BYTES = Gauge("upload_inflight_bytes", "Bytes de imágenes en proceso en este worker")
+UPLOAD_REJECTED = Counter("upload_rejected_total", "Subidas rechazadas (too_large, busy)")
+
+# Margen sobre el máximo del archivo para el resto del body multipart (boundaries, encabezados, campos)
+MULTIPART_OVERHEAD = 64 * 1024
+
+def _too_large(max_bytes: int) -> str:
+    return f"La imagen supera el máximo de {max_bytes / (1024 * 1024):.3g} MB."
+
+
+class UploadLimitMiddleware:
+    """ASGI puro: no toca las peticiones que no son multipart.
+
+    `max_bytes` es el máximo del archivo (el que ve el usuario en el 413); el body
+    puede pesar hasta `overhead` bytes más.
+    """
+
+    def __init__(self, app, max_bytes: int, overhead: int = MULTIPART_OVERHEAD) -> None:
+        self.app = app
+        self.max_bytes = max_bytes
+        self.max_body = max_bytes + overhead
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        if not headers.get(b"content-type", b"").startswith(b"multipart/form-data"):
+            return await self.app(scope, receive, send)
+
+        length = headers.get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_body:
+            UPLOAD_REJECTED.inc(reason="too_large")
+            response = JSONResponse({"detail": _too_large(self.max_bytes)}, status_code=413)
+            return await response(scope, receive, send)
+
+        # sin Content-Length (chunked): contar mientras llega y cortar en cuanto se pase
+        seen = 0
+
+        async def limited_receive():
+            nonlocal seen
+            message = await receive()
+            if message["type"] == "http.request":
+                seen += len(message.get("body", b""))
+                if seen > self.max_body:
+                    UPLOAD_REJECTED.inc(reason="too_large")
+                    raise HTTPException(413, _too_large(self.max_bytes))
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def read_upload(file: UploadFile, max_bytes: int = settings.upload_max_bytes) -> bytes:
+    # el multipart ya está en un SpooledTemporaryFile: validar antes de traerlo a memoria
+    if file.size is not None and file.size > max_bytes:
+        UPLOAD_REJECTED.inc(reason="too_large")
+        raise HTTPException(413, _too_large(max_bytes))
+    data = await file.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        UPLOAD_REJECTED.inc(reason="too_large")
+        raise HTTPException(413, _too_large(max_bytes))
+    return data
+
+
+class _Lease:
+    __slots__ = ("budget", "size")
+
+    def __init__(self, budget: "ByteBudget", size: int) -> None:
+        self.budget = budget
+        self.size = size
+
+    async def release(self) -> None:
+        # idempotente: se puede llamar desde un finally y desde una BackgroundTask
+        if self.size:
+            size, self.size = self.size, 0
+            await self.budget._release(size)
+
+
+class ByteBudget:
+    def __init__(self, max_bytes: int, wait_seconds: float, retry_after: int) -> None:
+        self.max_bytes = max_bytes
+        self.wait_seconds = wait_seconds
+        self.retry_after = retry_after
+        self.used = 0
+        self._cond: Optional[asyncio.Condition] = None
+
+    @property
+    def cond(self) -> asyncio.Condition:
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    async def acquire(self, size: int) -> _Lease:
+        # una subida sola nunca puede pedir más que el total
+        size = min(max(size, 1), self.max_bytes)
+        async with self.cond:
+            try:
+                await asyncio.wait_for(
+                    self.cond.wait_for(lambda: self.used + size <= self.max_bytes), self.wait_seconds
+                )
+            except asyncio.TimeoutError:
+                UPLOAD_REJECTED.inc(reason="busy")
+                raise HTTPException(
+                    503, "Demasiadas imágenes en proceso, reintenta en unos segundos.",
+                    headers={"Retry-After": str(self.retry_after)}
+                )
+            self.used += size
+            UPLOAD_INFLIGHT_BYTES.set(self.used)
+        return _Lease(self, size)
+
+    async def _release(self, size: int) -> None:
+        async with self.cond:
+            self.used -= size
+            UPLOAD_INFLIGHT_BYTES.set(self.used)
+            self.cond.notify_all()
+
+
+upload_budget = ByteBudget(
+    settings.upload_inflight_max_bytes,
+    settings.upload_budget_wait,
+    settings.export_pool_retry_after,
+)
@@ -1,17 +1,41 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 # Importar rutas
 from routers import user as user_router
 from routers import project as project_router
 from routers import openai_router
 from routers import project_ws         # ⬅️  importar
+from routers import export_jobs
+from routers import openai_stream
+from services.flutter_generator import skeleton_entries, template_version
+from services.worker_pool import export_pool
+from services.prompts import log_prompt_sizes
+from core.redis_client import close_redis
+from core.openai_client import close_openai
+from core import metrics
+from core.config import settings
+from core.upload_limits import UploadLimitMiddleware
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Cargar y comprimir el skeleton Flutter antes de aceptar peticiones
+    skeleton_entries()
+    template_version()
+    log_prompt_sizes()
+    yield
+    export_pool.shutdown()
+    await close_redis()
+    await close_openai()
 
 # Crear la aplicación 
 app = FastAPI(
     title="Flutter Builder API",
     version="1.0.0", 
     description="API para generar proyectos Flutter dinámicamente",
+    lifespan=lifespan,
 )
 
 # Configurar CORS
@@ -23,12 +47,22 @@ app.add_middleware(
     allow_headers=["*"],  # Permite todos los headers
 )
 
+# Subidas multipart: 413 en cuanto superan el máximo (el middleware suma el margen del multipart)
+app.add_middleware(UploadLimitMiddleware, max_bytes=settings.upload_max_bytes)
+
 # Incluir routers
 app.include_router(user_router.router, prefix="/users", tags=["Users"])
 app.include_router(project_router.router, prefix="/projects", tags=["Projects"]) 
 app.include_router(openai_router.router, prefix="/openai", tags=["OpenAI"])
+app.include_router(export_jobs.router, prefix="/openai/jobs", tags=["Export Jobs"])
+app.include_router(openai_stream.router, prefix="/openai", tags=["OpenAI Streaming"])
 app.include_router(project_ws.router)
 # Ruta raíz
 @app.get("/")
 def read_root():
     return {"message": "Bienvenido a la API de Flutter Builder 🚀"}
+
+# Métricas en formato Prometheus (por worker)
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return PlainTextResponse(metrics.render())
@@ -0,0 +1,121 @@
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, Literal
+from pydantic import BaseModel
+import asyncio, json, logging
+
+from core.config import settings
+from services.export_jobs import job_store, FINAL
+from services.flutter_generator import compress_overlays, iter_flutter_zip
+from services.ui_compiler import UIValidationError
+from services.ui_schema import validate_ui
+from services.generation import (
+    main_dart_for, main_dart_from_prompt_cached, manual_sources, run_export, zip_response
+)
+
+router = APIRouter()
+
+# Cuántos jobs corren a la vez en este worker (LLM incluido)
+_slots = asyncio.Semaphore(settings.export_jobs_concurrency)
+_tasks: set = set()
+
+class ExportJobCreate(BaseModel):
+    kind: Literal["generate-flutter", "generate-flutter-from-prompt", "generate-main-dart-manual"]
+    payload: Dict[str, Any]
+    mode: Literal["hybrid", "llm"] = "hybrid"      # sólo generate-flutter
+
+# ─────────── Runner ───────────
+
+async def _run_job(job_id: str, kind: str, payload: Dict[str, Any], mode: str = "hybrid") -> None:
+    async with _slots:
+        try:
+            if kind == "generate-main-dart-manual":
+                await job_store.update(job_id, stage="codegen")
+                result = await run_export(manual_sources, payload)
+            elif kind == "generate-flutter":
+                await job_store.update(job_id, stage="codegen" if mode == "hybrid" else "llm")
+                code, _, _ = await main_dart_for(payload, mode)
+                result = {"appName": payload.get("appName", "FlutterApp"), "generated_code": code}
+            else:
+                await job_store.update(job_id, stage="llm")
+                code, _ = await main_dart_from_prompt_cached(payload.get("prompt", "").strip())
+                result = {"appName": "PromptGeneratedApp", "generated_code": code}
+
+            await job_store.update(job_id, stage="done", result=result)
+        except Exception as e:
+            logging.exception("Error en export job %s", job_id)
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            await job_store.update(job_id, stage="error", error=detail)
+
+async def _get_job(job_id: str) -> Dict[str, Any]:
+    job = await job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job no encontrado o expirado")
+    return job
+
+def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in job.items() if k != "result"}
+
+# ─────────── Endpoints ───────────
+
+@router.post("/", status_code=status.HTTP_202_ACCEPTED)
+async def create_export_job(body: ExportJobCreate):
+    if body.kind == "generate-flutter-from-prompt" and not body.payload.get("prompt", "").strip():
+        raise HTTPException(status_code=400, detail="Prompt cannot be empty.")
+    if body.kind == "generate-main-dart-manual":
+        try:
+            validate_ui(body.payload)
+        except UIValidationError as e:
+            raise HTTPException(status_code=422, detail={"path": e.path, "error": e.msg})
+
+    job = await job_store.create(body.kind)
+    task = asyncio.create_task(_run_job(job["id"], body.kind, body.payload, body.mode))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+    base = f"/openai/jobs/{job['id']}"
+    return {
+        **_public(job),
+        "status_url": base,
+        "events_url": f"{base}/events",
+        "artifact_url": f"{base}/artifact",
+    }
+
+@router.get("/{job_id}")
+async def get_export_job(job_id: str):
+    return _public(await _get_job(job_id))
+
+@router.get("/{job_id}/events")
+async def export_job_events(job_id: str):
+    await _get_job(job_id)
+
+    async def stream():
+        last = None
+        while True:
+            job = await job_store.get(job_id)
+            if job is None:
+                yield "event: error\ndata: {\"error\": \"expired\"}\n\n"
+                return
+            if job["stage"] != last:
+                last = job["stage"]
+                yield f"event: progress\ndata: {json.dumps(_public(job))}\n\n"
+            if last in FINAL:
+                return
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/{job_id}/artifact")
+async def export_job_artifact(job_id: str):
+    job = await _get_job(job_id)
+    if job["stage"] == "error":
+        raise HTTPException(status_code=409, detail=job["error"])
+    if job["stage"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job aún en curso ({job['stage']})")
+
+    overlays = await run_export(compress_overlays, job["result"])
+    return zip_response(iter_flutter_zip(overlays), "flutter_project.zip")
@@ -0,0 +1,207 @@
+"""
+Variantes en streaming (SSE) de los endpoints de /openai que llaman a GPT-4o.
+
+Eventos:
+  token  → {"text": "..."} por cada fragmento que genera el modelo
+  page   → cada página del UI JSON en cuanto el modelo la cierra (sólo analyze)
+  result → resultado final validado (UI JSON en los analyze; job con el ZIP en los generate)
+  error  → {"status": ..., "error": ...}
+
+Si la respuesta ya está en caché se envía directamente `result`.
+"""
+from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+import json, logging
+
+from services.export_jobs import job_store
+from services.image_cache import image_cache
+from services.llm_cache import llm_cache
+from services.json_stream import JsonStreamExtractor, first_valid
+from services.ui_repair import model_json_text
+from services.image_prep import prepare_for_vision
+from core.llm_telemetry import LLMCall
+from core.config import settings
+from core.upload_limits import read_upload, upload_budget
+from services.generation import PROMPT_VERSIONS, image_request, json_request, prompt_request, strip_dart_fences
+from services.llm_calls import stream_completion
+from services.ui_analysis import analyze_image_request, analyze_prompt_request, repaired_ui_text
+
+router = APIRouter()
+
+Finalize = Callable[[str, bool], Awaitable[Any]]
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _events(endpoint: str, request: Optional[Dict[str, Any]], finalize: Finalize, cached: Optional[str],
+                  extractor: Optional[JsonStreamExtractor] = None) -> AsyncIterator[str]:
+    try:
+        if cached is not None:
+            yield _sse("result", await finalize(cached, True))
+            return
+        with LLMCall(endpoint, request["model"]) as call:
+            parts = []
+            async for delta in stream_completion(request, call):
+                parts.append(delta)
+                yield _sse("token", {"text": delta})
+                # el JSON se va parseando mientras el modelo sigue generando
+                for kind, text in extractor.feed(delta) if extractor else ():
+                    if kind == "page":
+                        try:
+                            yield _sse("page", json.loads(text))
+                        except ValueError:
+                            pass
+            try:
+                result = await finalize("".join(parts), False)
+            except HTTPException:
+                call.outcome = "invalid_json"
+                raise
+        yield _sse("result", result)
+    except HTTPException as e:
+        yield _sse("error", {"status": e.status_code, "error": e.detail})
+    except Exception as e:
+        logging.exception("Error en streaming de OpenAI")
+        yield _sse("error", {"status": 500, "error": str(e)})
+
+def _sse_response(events: AsyncIterator[str], cache_status: str,
+                  background: Optional[BackgroundTask] = None) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-LLM-Cache": cache_status},
+        background=background,
+    )
+
+async def _artifact(kind: str, app_name: str, code: str) -> Dict[str, Any]:
+    # el ZIP se arma al descargar, igual que en los jobs de exportación
+    job = await job_store.create(kind)
+    await job_store.update(job["id"], stage="done", result={"appName": app_name, "generated_code": code})
+    return {
+        "job_id": job["id"],
+        "artifact_url": f"/openai/jobs/{job['id']}/artifact",
+        "generated_code": code,
+    }
+
+def _image_cache_status(outcome: str) -> str:
+    return "MISS" if outcome == "miss" else f"HIT-{outcome}"
+
+async def _streamed_ui_json(endpoint: str, extractor: JsonStreamExtractor, text: str) -> Tuple[str, bool]:
+    try:
+        clean = first_valid(extractor.values)
+    except ValueError:
+        # nada cerró bien mientras llegaba: reparar el texto completo
+        try:
+            clean = model_json_text(text)
+        except ValueError:
+            raise HTTPException(400, "La IA no devolvió un JSON válido.")
+    return await repaired_ui_text(clean, endpoint)
+
+# ─────────── Analyze ───────────
+
+@router.post("/analyze-ui-prompt/stream")
+async def analyze_ui_prompt_stream(payload: dict):
+    prompt_text = payload.get("prompt", "").strip()
+    if not prompt_text:
+        raise HTTPException(400, "El campo 'prompt' no puede estar vacío.")
+
+    key = llm_cache.key(prompt_text, "gpt-4o", 0.1, PROMPT_VERSIONS["analyze-ui-prompt"])
+    cached = await llm_cache.lookup(key)
+    extractor = JsonStreamExtractor(roots="{", pages=True)
+
+    async def finalize(text: str, hit: bool) -> Any:
+        if hit:
+            return json.loads(text)
+        clean, valid = await _streamed_ui_json("analyze-ui-prompt", extractor, text)
+        if valid:
+            await llm_cache.set(key, clean)
+        return json.loads(clean)
+
+    return _sse_response(
+        _events("analyze-ui-prompt", analyze_prompt_request(prompt_text), finalize, cached, extractor),
+        "HIT" if cached is not None else "MISS"
+    )
+
+@router.post("/analyze-ui-image/stream")
+async def analyze_ui_image_stream(image: UploadFile = File(...)):
+    # la reserva de memoria se libera al terminar el stream
+    lease = await upload_budget.acquire(image.size or settings.upload_max_bytes)
+    try:
+        image_bytes = await read_upload(image)
+        kind = f"analyze-ui-image:{PROMPT_VERSIONS['analyze-ui-image']}"
+        cached, outcome, fingerprint = await image_cache.lookup(kind, image_bytes)
+        request = None if cached is not None else analyze_image_request(
+            await prepare_for_vision(image_bytes, image.content_type))
+    except BaseException:
+        await lease.release()
+        raise
+    extractor = JsonStreamExtractor(roots="{", pages=True)
+
+    async def finalize(text: str, hit: bool) -> Any:
+        if hit:
+            return json.loads(text)
+        clean, valid = await _streamed_ui_json("analyze-ui-image", extractor, text)
+        if valid:
+            image_cache.store(kind, fingerprint, clean)
+        return json.loads(clean)
+
+    return _sse_response(
+        _events("analyze-ui-image", request, finalize, cached, extractor),
+        _image_cache_status(outcome),
+        BackgroundTask(lease.release)
+    )
+
+# ─────────── Generate ───────────
+
+@router.post("/generate-flutter/stream")
+async def generate_flutter_stream(json_data: Dict):
+    app_name = json_data.get("appName", "FlutterApp")
+
+    async def finalize(text: str, hit: bool) -> Any:
+        return await _artifact("generate-flutter", app_name, strip_dart_fences(text))
+
+    return _sse_response(_events("generate-flutter", json_request(json_data), finalize, None), "MISS")
+
+@router.post("/generate-flutter-from-prompt/stream")
+async def generate_flutter_from_prompt_stream(data: Dict):
+    user_prompt = data.get("prompt", "").strip()
+    if not user_prompt:
+        raise HTTPException(status_code=400, detail="Prompt cannot be empty.")
+
+    key = llm_cache.key(user_prompt, "gpt-4o", None, PROMPT_VERSIONS["main-dart-from-prompt"])
+    cached = await llm_cache.lookup(key)
+
+    async def finalize(text: str, hit: bool) -> Any:
+        if not hit:
+            await llm_cache.set(key, text)
+        return await _artifact("generate-flutter-from-prompt", "PromptGeneratedApp", text)
+
+    return _sse_response(
+        _events("generate-flutter-from-prompt", prompt_request(user_prompt), finalize, cached),
+        "HIT" if cached is not None else "MISS"
+    )
+
+@router.post("/generate-flutter-from-image/stream")
+async def generate_flutter_from_image_stream(image: UploadFile = File(...)):
+    lease = await upload_budget.acquire(image.size or settings.upload_max_bytes)
+    try:
+        image_bytes = await read_upload(image)
+        kind = f"main-dart-from-image:{PROMPT_VERSIONS['main-dart-from-image']}"
+        cached, outcome, fingerprint = await image_cache.lookup(kind, image_bytes)
+        request = None if cached is not None else image_request(
+            await prepare_for_vision(image_bytes, image.content_type))
+    except BaseException:
+        await lease.release()
+        raise
+
+    async def finalize(text: str, hit: bool) -> Any:
+        if not hit:
+            image_cache.store(kind, fingerprint, text)
+        return await _artifact("generate-flutter-from-image", "ImageApp", text)
+
+    return _sse_response(
+        _events("generate-flutter-from-image", request, finalize, cached),
+        _image_cache_status(outcome),
+        BackgroundTask(lease.release)
+    )
@@ -6,14 +6,18 @@ from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from uuid import UUID
 from pathlib import Path
-import tempfile, zipfile, os, datetime
+from typing import Any, Dict, List, Tuple
+import asyncio, tempfile, zipfile, os, datetime
 
 from core.database import SessionLocal
 from models.project import Project
 from models.user_project_access import UserProjectAccess
 from services.flutter_generator import generate_flutter_app
 from core.security import get_current_user                      # JWT helper
-from schemas.project_schema import ProjectCreate, ProjectOut
+from schemas.project_schema import ProjectAIEdit, ProjectCreate, ProjectOut
+from services.scoped_edit import EditPathError, Step, get_at, parse_path, replace_at, target_kind
+from services.ui_schema import ui_schema_errors
+from services.ai_edit import ScopedEditError, scoped_edit
 from schemas.user_project_access_schema import UserProjectAccessOut
 
 router = APIRouter(prefix="/projects", tags=["Projects"])
@@ -107,15 +111,7 @@ def get_all_projects(
 # ---------------------------------------------------------------------------
 # 4. ACTUALIZAR PROYECTO
 # ---------------------------------------------------------------------------
-@router.put("/{project_id}", response_model=ProjectOut)
-def update_project(
-    project_id: UUID,
-    payload: ProjectCreate,
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user)
-):
-    user_id = UUID(user["sub"])
-
+def _editable_project(db: Session, project_id: UUID, user_id: UUID) -> Project:
     # 1) ¿Existe el proyecto?
     project = db.query(Project).filter(Project.id == project_id).first()
     if not project:
@@ -133,8 +129,18 @@ def update_project(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have permission to update this project"
         )
+    return project
+
+@router.put("/{project_id}", response_model=ProjectOut)
+def update_project(
+    project_id: UUID,
+    payload: ProjectCreate,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user)
+):
+    project = _editable_project(db, project_id, UUID(user["sub"]))
 
-    # 3) Actualizar campos
+    # Actualizar campos
     project.name = payload.name
     project.data = payload.data
     project.updated_at = datetime.datetime.utcnow()
@@ -143,6 +149,72 @@ def update_project(
     db.refresh(project)
     return project
 # ---------------------------------------------------------------------------
+# 4b. EDITAR UNA PÁGINA O UN WIDGET CON IA
+# ---------------------------------------------------------------------------
+# La sesión es síncrona: estas dos partes corren en un thread, fuera del event loop
+
+def _edit_target(db: Session, project_id: UUID, user_id: UUID, path: str) -> Tuple[List[Step], Any]:
+    project = _editable_project(db, project_id, user_id)
+    try:
+        steps = parse_path(path)
+        subtree = get_at(project.data, steps, path)
+    except EditPathError as e:
+        raise HTTPException(status_code=422, detail={"path": e.path, "error": e.msg})
+    # no retener la conexión de la base mientras responde el modelo
+    db.rollback()
+    return steps, subtree
+
+def _save_edit(db: Session, project_id: UUID, user_id: UUID, path: str,
+               steps: List[Step], subtree: Any, edited: Dict[str, Any]) -> Project:
+    # reemplazarlo sobre la versión actual, si nadie lo cambió mientras tanto
+    project = _editable_project(db, project_id, user_id)
+    try:
+        current = get_at(project.data, steps, path)
+    except EditPathError:
+        current = None
+    if current != subtree:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="El proyecto cambió durante la edición; vuelve a intentarlo"
+        )
+    project.data = replace_at(project.data, steps, edited)
+    project.updated_at = datetime.datetime.utcnow()
+
+    db.commit()
+    db.refresh(project)
+    return project
+
+@router.post("/{project_id}/ai-edit", response_model=ProjectOut)
+async def ai_edit_project(
+    project_id: UUID,
+    payload: ProjectAIEdit,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user)
+):
+    user_id = UUID(user["sub"])
+    instruction = payload.instruction.strip()
+    if not instruction:
+        raise HTTPException(status_code=400, detail="La instrucción no puede estar vacía.")
+
+    # 1) Subárbol a editar
+    steps, subtree = await asyncio.to_thread(_edit_target, db, project_id, user_id, payload.path)
+    kind = target_kind(steps)
+
+    # 2) Sólo ese subárbol va al modelo
+    try:
+        edited = await scoped_edit(subtree, kind, instruction)
+    except ScopedEditError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # 3) Mismo esquema que ProjectCreate.data, sólo sobre lo editado
+    errors = ui_schema_errors(edited, kind, payload.path)
+    if errors:
+        raise HTTPException(status_code=422, detail={"path": errors[0].path, "error": errors[0].msg})
+
+    # 4) Guardar
+    return await asyncio.to_thread(_save_edit, db, project_id, user_id, payload.path, steps, subtree, edited)
+
+# ---------------------------------------------------------------------------
 # 5. ELIMINAR PROYECTO
 # ---------------------------------------------------------------------------
 @router.delete("/{project_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -1,12 +1,24 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from uuid import UUID
 from datetime import datetime
 from typing import Any
 
+from services.ui_schema import validate_ui
+
 class ProjectCreate(BaseModel):
     name: str
     data: dict
 
+    @field_validator("data")
+    @classmethod
+    def _ui_json(cls, data: dict) -> dict:
+        validate_ui(data)       # UIValidationError es ValueError → 422 con la ruta
+        return data
+
+class ProjectAIEdit(BaseModel):
+    path: str           # "$.pages[0]" o "$.pages[0].widgets[2].children[1]"
+    instruction: str
+
 class ProjectOut(BaseModel):
     id: UUID
     name: str
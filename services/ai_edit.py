@@ -0,0 +1,65 @@
+"""
+ai_edit.py
+Edición con IA acotada a una página o un widget del UI JSON.
+
+Sólo el subárbol viaja al modelo, sin la guía completa de widgets: los tokens
+de entrada y salida escalan con el tamaño de la edición, no con el de la app.
+La usan el endpoint de edición de proyectos y el re-prompt de ui_repair.
+
+La llamada pasa por services/llm_calls (reintentos, circuit breaker y
+telemetría con el endpoint de quien la pide). Errores: ScopedEditError si el
+modelo no devuelve algo con la forma de lo que se editaba (quien llama responde
+400); los de OpenAI salen como HTTPException, igual que en los demás endpoints.
+"""
+import json
+from typing import Any, Dict
+
+from services.llm_calls import complete
+from services.scoped_edit import edit_max_tokens
+from services.ui_compiler import SUPPORTED_WIDGETS
+from services.ui_repair import model_json_text
+
+
+class ScopedEditError(ValueError):
+    pass
+
+
+def edit_request(subtree: Any, kind: str, instruction: str) -> Dict[str, Any]:
+    what = "una página (objeto con name, title y widgets)" if kind == "page" else "un widget (objeto con type)"
+    types = ", ".join(sorted(SUPPORTED_WIDGETS))
+    return {
+        "model": "gpt-4o",
+        "temperature": 0.1,
+        "max_tokens": edit_max_tokens(subtree),
+        "messages": [
+            {"role": "system", "content": (
+                f"Editas {what} del UI JSON de una app Flutter. Devuelves SOLO el objeto JSON "
+                f"editado, con la misma forma, sin texto extra. Tipos de widget disponibles: {types}. "
+                "Conserva todo lo que la instrucción no pide cambiar."
+            )},
+            {"role": "user", "content": f"JSON actual:\n{json.dumps(subtree, ensure_ascii=False)}\n\nInstrucción: {instruction}"}
+        ],
+    }
+
+def edited_subtree(subtree: Any, kind: str, text: str) -> Dict[str, Any]:
+    """Respuesta del modelo → subárbol editado; ScopedEditError si no tiene la forma esperada."""
+    try:
+        edited = json.loads(model_json_text(text))
+    except ValueError:
+        raise ScopedEditError("La IA no devolvió un JSON válido.")
+    if not isinstance(edited, dict):
+        raise ScopedEditError("La IA no devolvió un objeto JSON.")
+    if kind == "page":
+        if not isinstance(edited.get("widgets"), list):
+            raise ScopedEditError("La IA no devolvió una página válida.")
+        # el nombre de la página es su ruta: no se renombra desde acá
+        if isinstance(subtree, dict) and "name" in subtree:
+            edited["name"] = subtree["name"]
+    elif not isinstance(edited.get("type"), str):
+        raise ScopedEditError("La IA no devolvió un widget válido.")
+    return edited
+
+async def scoped_edit(subtree: Any, kind: str, instruction: str, endpoint: str = "ai-edit") -> Dict[str, Any]:
+    """Subárbol editado por el modelo según `instruction`; la llamada queda registrada como `endpoint`."""
+    return await complete(edit_request(subtree, kind, instruction), endpoint,
+                          lambda text: edited_subtree(subtree, kind, text))
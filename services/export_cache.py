@@ -0,0 +1,101 @@
+"""
+export_cache.py
+Caché en disco de ZIPs exportados, direccionada por contenido.
+
+La clave es sha256(JSON canónico + versión del template). Los archivos viven en
+un directorio local compartido por todos los workers de uvicorn del host: las
+escrituras son atómicas (os.replace) y la expulsión LRU se serializa con flock.
+"""
+import os, json, time, hashlib, logging, tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock entre procesos
+    fcntl = None
+
+from core.config import settings
+from services.flutter_generator import template_version
+
+log = logging.getLogger(__name__)
+
+# Entradas usadas hace menos de esto no se expulsan (pueden estar sirviéndose)
+EVICT_GRACE_SECONDS = 60
+
+
+def canonical_json(data: Any) -> bytes:
+    return json.dumps(
+        data, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    ).encode("utf-8")
+
+
+class ExportCache:
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def key(self, ui: Dict[str, Any], kind: str = "manual") -> str:
+        h = hashlib.sha256()
+        h.update(f"{kind}:{template_version()}:".encode())
+        h.update(canonical_json(ui))
+        return h.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.zip"
+
+    def get(self, key: str) -> Optional[Path]:
+        path = self._path(key)
+        try:
+            os.utime(path)          # marca de uso para el LRU
+        except FileNotFoundError:
+            return None
+        return path
+
+    def store_stream(self, key: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Reenvía `chunks` y en paralelo los guarda; publica la entrada sólo si se completó."""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".part")
+        done = False
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                for chunk in chunks:
+                    fh.write(chunk)
+                    yield chunk
+            os.replace(tmp, path)
+            done = True
+        finally:
+            if not done:            # error o cliente desconectado
+                Path(tmp).unlink(missing_ok=True)
+        self.evict()
+
+    def evict(self) -> None:
+        with open(self.root / ".lock", "a") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            entries = []
+            total = 0
+            for p in self.root.glob("*/*.zip"):
+                try:
+                    st = p.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, p))
+                total += st.st_size
+            if total <= self.max_bytes:
+                return
+            cutoff = time.time() - EVICT_GRACE_SECONDS
+            for mtime, size, p in sorted(entries):
+                if total <= self.max_bytes or mtime > cutoff:
+                    break
+                p.unlink(missing_ok=True)
+                total -= size
+                log.info("export cache: evicted %s (%d bytes)", p.name, size)
+
+
+export_cache = ExportCache(
+    Path(settings.export_cache_dir or Path(tempfile.gettempdir()) / "flutter_builder_exports"),
+    settings.export_cache_max_bytes,
+)
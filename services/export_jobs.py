@@ -0,0 +1,68 @@
+"""
+export_jobs.py
+Estado de los jobs de exportación asíncronos.
+
+Se guarda en Redis (core/redis_client) para que cualquier worker pueda responder
+el progreso; sin Redis cae a un dict en memoria del proceso. El resultado es el
+código generado (pocos KB): el ZIP se reconstruye al descargarlo.
+"""
+import json, time, uuid
+from typing import Any, Dict, Optional
+
+from core.config import settings
+from core.redis_client import redis
+
+# Etapas: queued → llm | codegen → done; "error" puede ocurrir en cualquiera.
+# El ZIP se arma al descargar el artefacto.
+FINAL = ("done", "error")
+
+
+class JobStore:
+    def __init__(self, ttl: int) -> None:
+        self.ttl = ttl
+        self._mem: Dict[str, Dict[str, Any]] = {}
+
+    def _purge(self) -> None:
+        now = time.time()
+        for jid in [j for j, v in self._mem.items() if v["expires_at"] < now]:
+            self._mem.pop(jid, None)
+
+    async def _save(self, job: Dict[str, Any]) -> None:
+        if redis is not None:
+            await redis.set(f"export_job:{job['id']}", json.dumps(job), ex=self.ttl)
+        else:
+            self._purge()
+            self._mem[job["id"]] = {**job, "expires_at": time.time() + self.ttl}
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        if redis is not None:
+            raw = await redis.get(f"export_job:{job_id}")
+            return json.loads(raw) if raw else None
+        job = self._mem.get(job_id)
+        if job is None or job["expires_at"] < time.time():
+            return None
+        return {k: v for k, v in job.items() if k != "expires_at"}
+
+    async def create(self, kind: str) -> Dict[str, Any]:
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "stage": "queued",
+            "error": None,
+            "result": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await self._save(job)
+        return job
+
+    async def update(self, job_id: str, **fields: Any) -> None:
+        job = await self.get(job_id)
+        if job is None:
+            return
+        job.update(fields, updated_at=time.time())
+        await self._save(job)
+
+
+job_store = JobStore(settings.export_job_ttl)
@@ -1,16 +1,27 @@
 """
 flutter_generator.py
-Copia un proyecto Flutter base y reemplaza lib/main.dart + lib/pages/*.dart
+Empaqueta el proyecto Flutter base (cargado y comprimido en memoria una sola
+vez) junto con lib/main.dart + pubspec.yaml generados, directo a un ZIP en streaming.
 """
-import shutil, datetime
+import hashlib
+from functools import lru_cache
 from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
 from jinja2 import Environment, FileSystemLoader
 
+from services.zip_stream import ZipEntry, prepare_entry, iter_zip
+
 # rutas
 BASE = Path(__file__).parent.parent
 TEMPLATE_JINJA   = BASE / "utils" / "flutter_template"
 TEMPLATE_PROJECT = BASE / "utils" / "flutter_template_project"
 
+# Súbelo cuando cambie la forma en que se genera el código/ZIP sin tocar los templates
+GENERATOR_VERSION = "5"
+
+# Directorios que siempre van en el ZIP aunque estén vacíos
+EXTRA_DIRS = ("lib/", "lib/pages/")
+
 env = Environment(
     loader=FileSystemLoader([
         str(TEMPLATE_JINJA),
@@ -23,24 +34,78 @@ env = Environment(
 def camel(s: str) -> str:
     return "".join(w.capitalize() for w in s.split("_"))
 
-def generate_flutter_app(data: dict, output_dir: Path):
-    # 1. copiar skeleton completo
-    if output_dir.exists():
-        shutil.rmtree(output_dir)
-    shutil.copytree(TEMPLATE_PROJECT, output_dir, dirs_exist_ok=True)
+# ─────────── Skeleton en memoria ───────────
 
-    pages_dir = output_dir / "lib" / "pages"
-    pages_dir.mkdir(parents=True, exist_ok=True)
+@lru_cache(maxsize=1)
+def load_skeleton() -> Dict[str, bytes]:
+    """Lee utils/flutter_template_project una sola vez: {ruta posix: contenido}."""
+    return {
+        p.relative_to(TEMPLATE_PROJECT).as_posix(): p.read_bytes()
+        for p in TEMPLATE_PROJECT.rglob("*") if p.is_file()
+    }
 
-    # 2. Generate main.dart directly
-    main_file = output_dir / "lib" / "main.dart"
-    main_file.write_text(data.get("generated_code", ""), encoding="utf-8")
+@lru_cache(maxsize=1)
+def template_version() -> str:
+    """Hash del skeleton + plantilla de pubspec; invalida la caché de exportaciones."""
+    h = hashlib.sha256(GENERATOR_VERSION.encode())
+    skeleton = load_skeleton()
+    for name in sorted(skeleton):
+        h.update(name.encode())
+        h.update(b"\0")
+        h.update(skeleton[name])
+    h.update((TEMPLATE_JINJA / "pubspec.yaml.jinja").read_bytes())
+    return h.hexdigest()[:16]
 
-    # 3. Update pubspec.yaml
+def overlay_files(data: dict) -> Dict[str, bytes]:
+    """Archivos generados que reemplazan/añaden entradas al skeleton."""
     pubspec_tpl = env.get_template("pubspec.yaml.jinja")
-    (output_dir / "pubspec.yaml").write_text(
-        pubspec_tpl.render(app=data.get("appName","FlutterApp")),
-        encoding="utf-8"
-    )
+    files = {
+        "lib/main.dart": data.get("generated_code", "").encode("utf-8"),
+        "pubspec.yaml": pubspec_tpl.render(app=data.get("appName","FlutterApp")).encode("utf-8"),
+    }
+    # lib/pages/*.dart cuando el código viene separado por página
+    for name, code in data.get("generated_files", {}).items():
+        files[name] = code.encode("utf-8")
+    return files
+
+def _entries(data: dict) -> List[Tuple[str, Optional[bytes]]]:
+    """Entradas del proyecto final (dirs con None) en orden determinista."""
+    files = {**load_skeleton(), **overlay_files(data)}
+    dirs = set(EXTRA_DIRS)
+    for name in files:
+        parts = name.split("/")[:-1]
+        for i in range(1, len(parts) + 1):
+            dirs.add("/".join(parts[:i]) + "/")
+    entries: List[Tuple[str, Optional[bytes]]] = [(d, None) for d in dirs]
+    entries.extend(files.items())
+    entries.sort(key=lambda e: e[0].rstrip("/"))
+    return entries
+
+# ─────────── Salida ───────────
+
+def generate_flutter_app(data: dict, output_dir: Path):
+    """Escribe el proyecto en disco (para inspección/depuración local)."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for name, content in _entries(data):
+        target = output_dir / name
+        if content is None:
+            target.mkdir(parents=True, exist_ok=True)
+        else:
+            target.write_bytes(content)
+
+@lru_cache(maxsize=1)
+def skeleton_entries() -> Dict[str, ZipEntry]:
+    """Tabla de entradas ZIP del skeleton, comprimidas una sola vez al arrancar."""
+    return {
+        name: prepare_entry(name, content, level=9)
+        for name, content in _entries({"generated_code": ""})
+    }
+
+def compress_overlays(data: dict) -> Dict[str, ZipEntry]:
+    """Comprime los archivos generados (trabajo de CPU: correr en el pool)."""
+    return {name: prepare_entry(name, content) for name, content in overlay_files(data).items()}
 
-    print("✅ Flutter app generated in:", output_dir)
+def iter_flutter_zip(overlays: Dict[str, ZipEntry]) -> Iterator[bytes]:
+    """ZIP determinista: el skeleton se copia ya comprimido, sólo se agregan los overlays."""
+    entries = {**skeleton_entries(), **overlays}
+    yield from iter_zip(entries[name] for name in sorted(entries, key=lambda n: n.rstrip("/")))
@@ -0,0 +1,387 @@
+"""
+generation.py
+Pipeline de generación de main.dart y de exportación que comparten los routers
+de /openai: respuesta completa, streaming (openai_stream) y jobs de exportación
+(export_jobs).
+
+- Generación por página: una app multipágina se pide como una completion por
+  página, en paralelo, y se une con el shell determinístico de ui_compiler.
+- Modo híbrido: codegen local + snippets del modelo sólo para los widgets que
+  el generador no soporta.
+- Exportación: el codegen y la compresión corren en export_pool, fuera del
+  event loop (503 con Retry-After si está lleno).
+"""
+import asyncio, hashlib, json, logging, re
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from core.config import settings
+from services.hybrid_codegen import normalize_snippet, plan_hybrid
+from services.image_prep import PreparedImage, prepare_for_vision
+from services.llm_cache import llm_cache
+from services.llm_calls import complete, valid_json_text
+from services.prompts import prompt_version
+from services.single_flight import SingleFlight
+from services.ui_compiler import UIValidationError, build_app_shell, build_dart_files, build_main_dart, compile_ui, page_class
+from services.ui_schema import validate_ui
+from services.worker_pool import PoolSaturated, export_pool
+
+# Versión de cada template de prompt, para no servir respuestas cacheadas con el
+# prompt anterior. Los de utils/prompts se versionan solos; los inline, a mano.
+PROMPT_VERSIONS = {
+    "main-dart-from-prompt": "2",
+    "main-dart-page": "1",
+    "app-plan": "1",
+    "analyze-ui-prompt": prompt_version("widget_guide", "analyze_prompt_system"),
+    "main-dart-from-image": "1",
+    "analyze-ui-image": prompt_version("widget_guide", "analyze_image_system"),
+    "widget-snippet": "1",
+}
+
+# ─────────────── Exportación ───────────────
+
+async def run_export(fn, *args):
+    try:
+        return await export_pool.run(fn, *args)
+    except PoolSaturated as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Servidor ocupado generando otros proyectos, reintenta en unos segundos.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+def zip_response(chunks, filename: str, headers: Optional[Dict[str, str]] = None) -> StreamingResponse:
+    return StreamingResponse(
+        chunks,
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', **(headers or {})}
+    )
+
+def manual_sources(ui_json: Dict[str, Any], shared_widgets: bool = False) -> Dict[str, Any]:
+    files = build_dart_files(ui_json, shared_widgets)
+    return {
+        "appName": ui_json.get("appName", "FlutterApp"),
+        "generated_code": files.pop("lib/main.dart"),
+        "generated_files": files,
+    }
+
+# ─────────────── main.dart desde el UI JSON ───────────────
+
+def strip_dart_fences(code: str) -> str:
+    return re.sub(r'^```dart\s*|```$', '', code.strip(), flags=re.MULTILINE)
+
+def json_request(json_data: Dict) -> Dict[str, Any]:
+    prompt = f"""
+    Genera un archivo main.dart completo para una aplicación Flutter basada en esta especificación JSON:
+    {json_data}
+
+    Requisitos obligatorios:
+    1. CÓDIGO VÁLIDO:
+       - Debe ser ejecutable sin modificaciones
+       - Debe compilar sin errores ni advertencias
+       - Solo código Dart puro, sin comentarios ni formato markdown
+
+    2. ESTRUCTURA:
+       - Usa widgets Flutter apropiados y mejores prácticas
+       - Estructura básica: main(), MaterialApp y Scaffold
+       - El código debe ser limpio, legible y mantenible
+       - La interfaz debe reflejar exactamente la estructura JSON
+
+    3. OPTIMIZACIÓN:
+       - Diseño responsive que se adapte a diferentes tamaños de pantalla
+       - Optimizado para rendimiento
+       - Todos los widgets del JSON deben estar presentes
+       - No uses widgets innecesarios ni contenedores extra
+
+    4. FORMATO:
+       - Devuelve SOLO el contenido del archivo main.dart
+       - Sin explicaciones
+       - Sin comentarios
+       - Sin marcadores de código
+       - Sin formato markdown
+
+    5. CODIGO:
+      - Si el JSON te parece incompleto o ambiguo, completa los detalles necesarios para que el código Dart sea funcional.
+      - Hace todo responsivo y adaptado a diferentes tamaños de pantalla.
+      - ⚠️ Uso de primary: en ElevatedButton.styleFrom está obsoleto
+      - El parámetro primary: fue deprecado y ahora debes usar backgroundColor::
+      - No uses nada deprecado, usa siempre lo más reciente y actualizado de Flutter.
+      - Todos los widgets deben ser funcionales como ser switch, checkbox, slider, radioGroup, dropdown, datePicker, etc.
+      - Las tablas responsive deben ser creadas con SingleChildScrollView y DataTable.
+      - BottomNavigationBar debe ser creado con BottomNavigationBar y sus elementos deben ser creados con BottomNavigationBarItem.Tambien sus rutas deben ser creadas con Navigator.pushReplacementNamed(context, 'ruta').
+    IMPORTANTE: Solo devuelve el código Dart puro y válido.
+      
+    """
+
+    return {
+        "model": "gpt-4o",
+        "messages": [
+            {"role": "system", "content": "Eres un experto en generación de código Flutter."},
+            {"role": "user", "content": prompt}
+        ]
+    }
+
+# ─── Generación por página ───
+# Una app multipágina se pide como una completion por página, en paralelo (hasta
+# llm_page_concurrency a la vez), y se une con el shell determinístico de
+# ui_compiler (main + MaterialApp + rutas): la latencia es la de la página más
+# lenta y no la suma. Cada página se cachea por separado.
+
+_PAGE_NAME = re.compile(r"^[A-Za-z][A-Za-z0-9_]*$")
+
+class _AppLayout:
+    __slots__ = ("name", "primary", "routes", "pages")
+
+    def __init__(self, name: str, primary: str, routes: List[str], pages: List[Tuple[str, Any]]) -> None:
+        self.name = name
+        self.primary = primary
+        self.routes = routes
+        self.pages = pages          # (nombre de la página, especificación para el modelo)
+
+def _page_request(layout: _AppLayout, page_name: str, spec: Any) -> Dict[str, Any]:
+    cls = page_class(page_name)
+    prompt = f"""
+Genera SOLO la clase de la página `{cls}` de una app Flutter llamada '{layout.name}' (color primario #{layout.primary.lstrip('#')}).
+Especificación de la página:
+{json.dumps(spec, ensure_ascii=False)}
+
+Rutas de la app (para navegar usa Navigator.pushReplacementNamed(context, 'ruta')): {', '.join(layout.routes)}
+
+Requisitos:
+- Declara `class {cls}` (StatelessWidget o StatefulWidget) con constructor `const {cls}({{super.key}});` y un Scaffold.
+- Si necesitas clases auxiliares, nómbralas con el prefijo `_{cls}`.
+- NO incluyas imports, main(), MaterialApp ni otras páginas: se agregan aparte. Sólo package:flutter/material.dart está disponible.
+- Diseño responsive, widgets funcionales, nada deprecado (usa backgroundColor, no primary).
+- Devuelve sólo código Dart, sin comentarios ni markdown.
+""".strip()
+    return {
+        "model": "gpt-4o",
+        "messages": [
+            {"role": "system", "content": "Eres un experto en generación de código Flutter."},
+            {"role": "user", "content": prompt}
+        ]
+    }
+
+async def _page_code_llm(layout: _AppLayout, page_name: str, spec: Any) -> str:
+    async def ask_model() -> str:
+        return strip_dart_fences(await complete(_page_request(layout, page_name, spec), "generate-flutter-page")).strip()
+
+    raw = json.dumps([layout.name, layout.primary, layout.routes, page_name, spec], sort_keys=True, ensure_ascii=False, default=str)
+    code, _ = await llm_cache.get_or_call(llm_cache.key(raw, "gpt-4o", None, PROMPT_VERSIONS["main-dart-page"]), ask_model)
+    return code
+
+async def _main_dart_by_pages(layout: _AppLayout) -> str:
+    slots = asyncio.Semaphore(settings.llm_page_concurrency)
+
+    async def one(page_name: str, spec: Any) -> str:
+        async with slots:
+            return await _page_code_llm(layout, page_name, spec)
+
+    pages = await asyncio.gather(*(one(n, s) for n, s in layout.pages))
+    return "\n".join([build_app_shell(layout.name, layout.primary, layout.routes)] + list(pages))
+
+def _json_layout(json_data: Dict) -> Optional[_AppLayout]:
+    """Layout por páginas del UI JSON, o None si no se puede partir (nombres de página inválidos...)."""
+    pages = json_data.get("pages")
+    if not isinstance(pages, list) or not pages:
+        return None
+    if not all(isinstance(p, dict) and _PAGE_NAME.match(str(p.get("name", ""))) for p in pages):
+        return None
+    routes = [f"/{p['name']}" for p in pages]
+    if len(set(routes)) != len(routes):
+        return None
+    # ruta inicial: la primera de `routes` si la hay
+    first = (json_data.get("routes") or [None])[0]
+    if first in routes:
+        routes.remove(first)
+        routes.insert(0, first)
+    theme = json_data.get("theme") if isinstance(json_data.get("theme"), dict) else {}
+    name = json_data.get("name") or json_data.get("appName") or "FlutterApp"
+    return _AppLayout(str(name), str(theme.get("primary") or "2196F3"), routes,
+                      [(p["name"], p) for p in pages])
+
+_json_flight = SingleFlight("main-dart-from-json")
+
+async def _main_dart_from_json(json_data: Dict) -> str:
+    async def ask_model() -> str:
+        if (layout := _json_layout(json_data)) is not None:
+            return await _main_dart_by_pages(layout)
+        # Limpiar marcadores de código Dart
+        return strip_dart_fences(await complete(json_request(json_data), "generate-flutter"))
+
+    key = hashlib.sha256(json.dumps(json_data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    code, _ = await _json_flight.do(key, ask_model)
+    return code
+
+# ─── Modo híbrido: codegen local + snippets del modelo para lo no soportado ───
+
+def _snippet_request(widget: Any) -> Dict[str, Any]:
+    spec = json.dumps(widget, ensure_ascii=False)
+    return {
+        "model": "gpt-4o",
+        "temperature": 0.2,
+        "max_tokens": 800,
+        "messages": [
+            {"role": "system", "content": "Eres un experto en Flutter. Respondes sólo con código Dart."},
+            {"role": "user", "content": f"""
+Convierte este widget de un UI JSON en UNA expresión de widget Flutter:
+{spec}
+
+Reglas:
+- Devuelve sólo la expresión (p. ej. `Column(children: [...])`), sin `;`, imports, clases ni markdown.
+- Se inserta dentro de la lista `children` de un Column; `context` y `constraints` (BoxConstraints) están disponibles.
+- No uses setState ni variables externas: debe compilar por sí sola.
+- No uses APIs deprecadas de Flutter.
+""".strip()}
+        ],
+    }
+
+async def _widget_snippet(widget: Any) -> str:
+    async def ask_model() -> str:
+        return normalize_snippet(await complete(_snippet_request(widget), "widget-snippet"))
+
+    spec = json.dumps(widget, sort_keys=True, ensure_ascii=False, default=str)
+    key = llm_cache.key(spec, "gpt-4o", 0.2, PROMPT_VERSIONS["widget-snippet"])
+    code, _ = await llm_cache.get_or_call(key, ask_model)
+    return code
+
+async def _main_dart_hybrid(json_data: Dict) -> Tuple[str, int]:
+    """(main.dart, snippets pedidos al modelo). UIValidationError si el JSON no sirve para el compilador."""
+    plan = plan_hybrid(json_data)
+    # validar antes de gastar llamadas: los marcadores ya compilan como Container()
+    validate_ui(plan.ui)
+    await run_export(partial(compile_ui, snippets=True), plan.ui)
+    keys = list(plan.snippets)
+    codes = await asyncio.gather(*(_widget_snippet(plan.snippets[k]) for k in keys))
+    plan.fill(dict(zip(keys, codes)))
+    return await run_export(partial(build_main_dart, snippets=True), plan.ui), len(keys)
+
+async def main_dart_for(json_data: Dict, mode: str) -> Tuple[str, str, int]:
+    """(main.dart, modo usado, snippets). En híbrido cae al LLM completo si el JSON no compila."""
+    if mode == "hybrid":
+        try:
+            code, snippets = await _main_dart_hybrid(json_data)
+            return code, "hybrid", snippets
+        except UIValidationError as e:
+            logging.info("generate-flutter: JSON fuera del generador local (%s); uso el LLM completo", e)
+    return await _main_dart_from_json(json_data), "llm", 0
+
+# ─────────────── main.dart desde una imagen ───────────────
+
+def image_request(img: PreparedImage) -> Dict[str, Any]:
+    # Preparar entrada multimodal para GPT-4o
+    messages = [
+        {
+            "role": "system",
+            "content": "You are a Flutter UI expert that converts design images into working Flutter code."
+        },
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "text",
+                    "text": """
+You will receive an image. Your task is to analyze the visual content of the image and replicate it using proper Flutter widgets and styling.
+
+You must return only the Flutter code required to replicate the image layout and design as accurately as possible.
+
+Strict rules:
+- Do NOT include any explanations, descriptions, or markdown formatting.
+- Do NOT wrap the code in ```dart or any code blocks.This is a direct code generation task.
+- Return only the complete Dart code for main.dart.
+- Do NOT include comments.
+- Only return valid Flutter code starting from a full main.dart file, including main(), MaterialApp, and Scaffold.
+- Use appropriate layout widgets (e.g., Column, Row, Stack, Container, etc.) and apply correct styling (colors, fonts, spacing).
+- Use placeholder assets where needed (e.g., network images, icons).
+- Do not user Padding or Margin widgets 
+Return only the final code of main.dart.
+""".strip()
+                },
+                {
+                    "type": "image_url",
+                    "image_url": img.image_url
+                }
+            ]
+        }
+    ]
+
+    # Generar código con GPT-4o
+    return {"model": "gpt-4o", "messages": messages}
+
+async def main_dart_from_image(image_bytes: bytes, content_type: str) -> str:
+    img = await prepare_for_vision(image_bytes, content_type)
+    return await complete(image_request(img), "generate-flutter-from-image")
+
+# ─────────────── main.dart desde un prompt ───────────────
+
+def prompt_request(user_prompt: str) -> Dict[str, Any]:
+    messages = [
+        {
+            "role": "system",
+            "content": "You are a Flutter code generation expert. You generate full Flutter main.dart files from design prompts."
+        },
+        {
+            "role": "user",
+            "content": f"""
+{user_prompt}
+
+Rules:
+- Only return the complete Dart code for main.dart.
+- Do NOT use markdown formatting or ```dart blocks.
+- Do NOT include explanations or comments.
+- Include necessary imports, main(), MaterialApp, and a full Scaffold.
+- Use valid Flutter widgets and styling.
+- It has to be responsive and adapt to different screen sizes.
+- Completely functional and ready to run.
+""".strip()
+        }
+    ]
+
+    return {"model": "gpt-4o", "messages": messages}
+
+def _app_plan_request(user_prompt: str) -> Dict[str, Any]:
+    # plan chico y rápido: sólo la lista de páginas, el código va después en paralelo
+    return {
+        "model": "gpt-4o",
+        "temperature": 0.2,
+        "max_tokens": 1500,
+        "messages": [
+            {"role": "system", "content": "You plan Flutter apps. You answer with JSON only."},
+            {"role": "user", "content": f"""
+{user_prompt}
+
+Split this app into pages. Return ONLY this JSON:
+{{"name": "AppName", "primary": "RRGGBB", "pages": [{{"name": "home", "title": "Home", "description": "what the page shows and how it navigates"}}]}}
+- Page names are unique lowerCamelCase identifiers; the first page is the initial route.
+- Descriptions must be detailed enough to build each page on its own.
+""".strip()}
+        ],
+    }
+
+def _plan_layout(plan_text: str) -> Optional[_AppLayout]:
+    plan = json.loads(plan_text)
+    if not isinstance(plan, dict):
+        return None
+    return _json_layout({"name": plan.get("name") or "PromptGeneratedApp",
+                         "theme": {"primary": plan.get("primary")}, "pages": plan.get("pages")})
+
+async def _main_dart_from_prompt(user_prompt: str) -> str:
+    # 1) plan de páginas; 2) una completion por página en paralelo + shell local
+    try:
+        plan = await complete(_app_plan_request(user_prompt), "generate-flutter-plan", valid_json_text)
+        layout = _plan_layout(plan)
+    except HTTPException as e:
+        if e.status_code != 400:
+            raise
+        layout = None
+    if layout is None:
+        # plan inutilizable: un solo main.dart como antes
+        return await complete(prompt_request(user_prompt), "generate-flutter-from-prompt")
+    return await _main_dart_by_pages(layout)
+
+async def main_dart_from_prompt_cached(user_prompt: str) -> Tuple[str, bool]:
+    key = llm_cache.key(user_prompt, "gpt-4o", None, PROMPT_VERSIONS["main-dart-from-prompt"])
+    return await llm_cache.get_or_call(key, lambda: _main_dart_from_prompt(user_prompt))
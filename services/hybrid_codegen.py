@@ -0,0 +1,88 @@
+"""
+hybrid_codegen.py
+Modo híbrido de /generate-flutter: el generador determinístico (ui_compiler)
+arma la app y sólo los widgets que no sabe generar van al modelo, cada uno como
+un snippet acotado.
+
+plan_hybrid() copia el UI JSON reemplazando cada widget no soportado (tipo
+desconocido, claves inválidas o fuera del esquema de ui_schema) por un marcador
+`dartSnippet`; widgets idénticos comparten marcador y se piden una sola vez. Con
+los snippets ya generados, fill() completa los marcadores y la copia se compila
+con snippets=True. Sólo esa copia lleva marcadores: en el JSON de un cliente el
+tipo no existe y sale como Container().
+"""
+import hashlib, json
+from collections import deque
+from typing import Any, Deque, Dict, List, Tuple
+
+from services.ui_compiler import CHILD_WIDGETS, SNIPPET_TYPE, widget_supported
+from services.ui_schema import ui_schema_errors
+
+# Hasta que llega el snippet (y para validar la copia antes de llamar al modelo)
+_PENDING = "Container()"
+
+
+def _emittable(w: Any) -> bool:
+    """¿El emisor lo genera sin fallar? Sin mirar los hijos: cada uno se decide aparte."""
+    if not widget_supported(w):
+        return False
+    return not ui_schema_errors({**w, "children": []} if "children" in w else w, "widget")
+
+def _widget_key(w: Any) -> str:
+    raw = json.dumps(w, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class HybridPlan:
+    def __init__(self, ui: Dict[str, Any]) -> None:
+        self.ui = ui                                        # copia con marcadores
+        self.snippets: Dict[str, Any] = {}                  # clave → widget original
+        self._markers: Dict[str, List[Dict[str, Any]]] = {}
+
+    def _marker(self, w: Any) -> Dict[str, Any]:
+        key = _widget_key(w)
+        self.snippets.setdefault(key, w)
+        marker = {"type": SNIPPET_TYPE, "code": _PENDING}
+        self._markers.setdefault(key, []).append(marker)
+        return marker
+
+    def fill(self, codes: Dict[str, str]) -> None:
+        for key, code in codes.items():
+            for marker in self._markers.get(key, ()):
+                marker["code"] = code
+
+
+def plan_hybrid(ui: Dict[str, Any]) -> HybridPlan:
+    """Copia de `ui` con los widgets no soportados como marcadores. No modifica `ui`."""
+    plan = HybridPlan({**ui})
+    pages = ui.get("pages")
+    if not isinstance(pages, list):
+        return plan         # que lo rechace el compilador
+    plan.ui["pages"] = []
+
+    # (widget, lista destino) en anchura: cada lista se llena en el orden original
+    queue: Deque[Tuple[Any, List[Any]]] = deque()
+    for pg in pages:
+        if isinstance(pg, dict) and isinstance(pg.get("widgets"), list):
+            copy = {**pg, "widgets": []}
+            queue.extend((w, copy["widgets"]) for w in pg["widgets"])
+            pg = copy
+        plan.ui["pages"].append(pg)
+
+    while queue:
+        w, dest = queue.popleft()
+        if not _emittable(w):
+            dest.append(plan._marker(w))
+            continue
+        if w["type"] in CHILD_WIDGETS and isinstance(w.get("children"), list):
+            copy = {**w, "children": []}
+            queue.extend((c, copy["children"]) for c in w["children"])
+            w = copy
+        dest.append(w)
+    return plan
+
+
+def normalize_snippet(code: str) -> str:
+    """Expresión de widget limpia: sin fences de markdown ni `;`/`,` finales."""
+    lines = [l for l in code.strip().splitlines() if not l.strip().startswith("```")]
+    return "\n".join(lines).strip().rstrip(";,").strip() or _PENDING
@@ -0,0 +1,133 @@
+"""
+image_cache.py
+Deduplicación de capturas para los endpoints de visión: la misma imagen (o una
+copia re-codificada) devuelve el resultado ya generado sin volver a llamar a GPT-4o.
+
+Cada subida se identifica por sha256 de los bytes. Opcionalmente (max_distance > 0
+y Pillow instalado) también por un dHash perceptual de 64 bits: una imagen cuyo
+dHash esté a distancia de Hamming ≤ `max_distance` de uno guardado cuenta como la
+misma. Viene apagado: dos capturas con el mismo layout y distinto texto dan el
+mismo dHash de 9x8, y la caché es global (un usuario recibiría el resultado de otro). LRU acotado con
+TTL, en memoria del proceso. Subidas idénticas (mismo sha256) que llegan mientras
+la primera sigue esperando al modelo comparten esa llamada.
+"""
+import asyncio, hashlib, io, logging, time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from core.config import settings
+from core.metrics import Counter, Gauge
+from services.single_flight import SingleFlight
+
+log = logging.getLogger(__name__)
+
+IMAGE_CACHE_LOOKUPS = Counter("image_cache_lookups_total", "Búsquedas por resultado (exact, perceptual, miss)")
+IMAGE_CACHE_HIT_RATIO = Gauge("image_cache_hit_ratio", "Fracción de subidas servidas desde caché")
+IMAGE_CACHE_ENTRIES = Gauge("image_cache_entries", "Resultados guardados")
+
+
+def dhash(data: bytes) -> Optional[int]:
+    """dHash de 64 bits (gradiente horizontal en 9x8 gris); None sin Pillow o si no es imagen."""
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            px = list(img.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    except Exception:
+        return None
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (px[row * 9 + col] > px[row * 9 + col + 1])
+    return bits
+
+
+class _Entry:
+    __slots__ = ("kind", "dhash", "value", "expires_at")
+
+    def __init__(self, kind: str, dhash: Optional[int], value: str, expires_at: float) -> None:
+        self.kind, self.dhash, self.value, self.expires_at = kind, dhash, value, expires_at
+
+
+class ImageResultCache:
+    def __init__(self, max_entries: int, ttl: int, max_distance: int) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+        # (kind, sha256) → entrada; kind separa endpoint + versión del prompt
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self.stats: Dict[str, int] = {"exact": 0, "perceptual": 0, "miss": 0}
+        self._flight = SingleFlight("image_cache")
+
+    def _count(self, outcome: str) -> None:
+        self.stats[outcome] += 1
+        IMAGE_CACHE_LOOKUPS.inc(outcome=outcome)
+        total = sum(self.stats.values())
+        IMAGE_CACHE_HIT_RATIO.set(round((total - self.stats["miss"]) / total, 4))
+
+    def _lookup(self, kind: str, digest: str, dh: Optional[int]) -> Tuple[Optional[str], str]:
+        now = time.time()
+        entry = self._entries.get((kind, digest))
+        if entry is not None and entry.expires_at > now:
+            self._entries.move_to_end((kind, digest))
+            return entry.value, "exact"
+        if dh is not None:
+            # búsqueda lineal: el LRU está acotado a unos cientos de entradas
+            for key, e in reversed(self._entries.items()):
+                if (e.kind == kind and e.dhash is not None and e.expires_at > now
+                        and bin(e.dhash ^ dh).count("1") <= self.max_distance):
+                    self._entries.move_to_end(key)
+                    return e.value, "perceptual"
+        return None, "miss"
+
+    def _store(self, kind: str, digest: str, dh: Optional[int], value: str) -> None:
+        now = time.time()
+        for key in [k for k, e in self._entries.items() if e.expires_at <= now]:
+            del self._entries[key]
+        self._entries[(kind, digest)] = _Entry(kind, dh, value, now + self.ttl)
+        self._entries.move_to_end((kind, digest))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        IMAGE_CACHE_ENTRIES.set(len(self._entries))
+
+    async def lookup(self, kind: str, data: bytes) -> Tuple[Optional[str], str, Tuple[str, Optional[int]]]:
+        """(resultado | None, "exact" | "perceptual" | "miss", huella para store())."""
+        digest = hashlib.sha256(data).hexdigest()
+        exact = self._entries.get((kind, digest))
+        fresh = exact is not None and exact.expires_at > time.time()
+        # el dHash decodifica la imagen: sólo si está activado, sin acierto exacto, y fuera del loop
+        dh = None if fresh or self.max_distance <= 0 else await asyncio.to_thread(dhash, data)
+        value, outcome = self._lookup(kind, digest, dh)
+        self._count(outcome)
+        return value, outcome, (digest, dh)
+
+    def store(self, kind: str, fingerprint: Tuple[str, Optional[int]], value: str) -> None:
+        self._store(kind, fingerprint[0], fingerprint[1], value)
+
+    async def get_or_call(self, kind: str, data: bytes, produce: Callable[[], Awaitable[str]],
+                          cacheable: Callable[[str], bool] = lambda value: True) -> Tuple[str, str]:
+        """(resultado, "exact" | "perceptual" | "miss"). `produce` sólo corre en un miss, una vez por
+        imagen en curso; lo que `cacheable` rechaza se devuelve pero no se guarda."""
+        value, outcome, fingerprint = await self.lookup(kind, data)
+        if value is not None:
+            return value, outcome
+
+        async def produce_and_store() -> str:
+            value = await produce()
+            if cacheable(value):
+                self.store(kind, fingerprint, value)
+            return value
+
+        value, _ = await self._flight.do(f"{kind}:{fingerprint[0]}", produce_and_store)
+        return value, outcome
+
+image_cache = ImageResultCache(
+    settings.image_cache_max_entries,
+    settings.image_cache_ttl,
+    settings.image_cache_max_distance,
+)
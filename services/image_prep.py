@@ -0,0 +1,127 @@
+"""
+image_prep.py
+Preprocesado de capturas antes de mandarlas a GPT-4o: aplica la orientación
+EXIF, limita la resolución, re-codifica en un formato eficiente sin metadatos
+(siempre: el original nunca sale tal cual) y elige el `detail` de visión
+según el tamaño resultante. Registra bytes y tokens estimados antes/después.
+
+Requiere Pillow; sin él la imagen se envía tal cual.
+"""
+import asyncio, binascii, io, logging, math
+from typing import Optional, Tuple
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = ImageOps = None
+
+from core.config import settings
+
+log = logging.getLogger(__name__)
+
+_MIME = {"jpeg": "image/jpeg", "webp": "image/webp", "png": "image/png"}
+
+# Bloque de entrada para el base64 por partes (múltiplo de 3: sin padding intermedio)
+_B64_CHUNK = 3 * 64 * 1024
+
+
+class PreparedImage:
+    __slots__ = ("data", "content_type", "detail", "size", "original_size")
+
+    def __init__(self, data: bytes, content_type: str, detail: str,
+                 size: Optional[Tuple[int, int]] = None, original_size: Optional[Tuple[int, int]] = None) -> None:
+        self.data = data
+        self.content_type = content_type
+        self.detail = detail
+        self.size = size
+        self.original_size = original_size or size
+
+    @property
+    def data_url(self) -> str:
+        # prefijo + base64 escritos por partes en un único buffer y decodificados una
+        # vez: sin las copias completas de b64encode() → .decode() → f-string
+        prefix = f"data:{self.content_type};base64,".encode("ascii")
+        out = bytearray(len(prefix) + 4 * ((len(self.data) + 2) // 3))
+        out[:len(prefix)] = prefix
+        view, pos = memoryview(self.data), len(prefix)
+        for i in range(0, len(view), _B64_CHUNK):
+            enc = binascii.b2a_base64(view[i:i + _B64_CHUNK], newline=False)
+            out[pos:pos + len(enc)] = enc
+            pos += len(enc)
+        return out.decode("ascii")
+
+    @property
+    def image_url(self) -> dict:
+        return {"url": self.data_url, "detail": self.detail}
+
+
+def vision_tokens(size: Optional[Tuple[int, int]], detail: str) -> Optional[int]:
+    """Tokens de imagen de gpt-4o: 85 fijos + 170 por tesela de 512px en alta resolución."""
+    if size is None:
+        return None
+    if detail == "low":
+        return 85
+    w, h = size
+    scale = min(1.0, 2048 / max(w, h))
+    w, h = w * scale, h * scale
+    scale = min(1.0, 768 / min(w, h))
+    w, h = w * scale, h * scale
+    return 85 + 170 * math.ceil(w / 512) * math.ceil(h / 512)
+
+
+def _choose_detail(size: Tuple[int, int]) -> str:
+    if settings.vision_detail != "auto":
+        return settings.vision_detail
+    # imágenes chicas no ganan nada con teselas de 512px
+    return "low" if max(size) <= settings.vision_low_detail_max_side else "high"
+
+
+def _encode(img: "Image.Image", fmt: str) -> bytes:
+    buf = io.BytesIO()
+    # sin exif/icc: el PNG copiaría los de img.info, los demás sólo los que se pasan
+    img.info.clear()
+    img.save(buf, fmt.upper(), quality=settings.vision_quality, optimize=True)
+    return buf.getvalue()
+
+
+def _prepare(data: bytes, content_type: str) -> PreparedImage:
+    if Image is None:
+        return PreparedImage(data, content_type, settings.vision_detail)
+    try:
+        img = Image.open(io.BytesIO(data))
+        img.load()
+    except Exception:
+        # no es una imagen que Pillow entienda: que decida el modelo
+        return PreparedImage(data, content_type, settings.vision_detail)
+
+    source_format = (img.format or "").lower()
+    # la orientación EXIF no sobrevive al re-encode sin metadatos: aplicarla a los píxeles
+    img = ImageOps.exif_transpose(img)
+    original_size = img.size
+    img.thumbnail((settings.vision_max_side, settings.vision_max_side), Image.LANCZOS)
+    fmt = settings.vision_format
+    if fmt == "jpeg" and img.mode != "RGB":
+        # JPEG no tiene alfa: aplanar sobre blanco como se ve en pantalla
+        rgba = img.convert("RGBA")
+        img = Image.new("RGB", rgba.size, (255, 255, 255))
+        img.paste(rgba, mask=rgba.getchannel("A"))
+    elif img.mode not in ("RGB", "RGBA", "L"):
+        img = img.convert("RGBA")
+
+    # capturas planas (UI) a veces pesan menos en PNG que en JPEG: quedarse con la menor
+    formats = [fmt] + (["png"] if source_format == "png" and fmt != "png" else [])
+    # siempre el re-encode, aunque pese más: el original puede traer GPS, cámara, etc.
+    out, out_fmt = min(((_encode(img, f), f) for f in formats), key=lambda c: len(c[0]))
+    return PreparedImage(out, _MIME[out_fmt], _choose_detail(img.size), img.size, original_size)
+
+
+async def prepare_for_vision(data: bytes, content_type: Optional[str]) -> PreparedImage:
+    content_type = content_type or "application/octet-stream"
+    prepared = await asyncio.to_thread(_prepare, data, content_type)
+    log.info(
+        "Imagen para visión: %d → %d bytes, %s → %s, %s → %s px, detail=%s, tokens≈%s → %s",
+        len(data), len(prepared.data), content_type, prepared.content_type,
+        prepared.original_size, prepared.size, prepared.detail,
+        vision_tokens(prepared.original_size, "high"), vision_tokens(prepared.size, prepared.detail),
+    )
+    return prepared
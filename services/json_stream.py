@@ -0,0 +1,138 @@
+"""
+json_stream.py
+Extractor incremental de JSON para la salida del modelo.
+
+Recibe la respuesta por fragmentos (streaming o completa), ignora el texto
+alrededor (prosa, ```json ... ```) y emite cada valor de nivel superior en cuanto
+se cierra. Entiende strings y escapes, así que una llave dentro de un label no
+rompe el balanceo. Con pages=True emite además cada elemento de "pages" del
+objeto raíz apenas termina, para poder parsearlo mientras el modelo sigue.
+
+Sólo recorre en Python los caracteres estructurales: el resto se salta con regex.
+"""
+import json, re
+from typing import List, Optional, Tuple
+
+# Fuera de strings sólo interesan llaves, corchetes y comillas; dentro, comilla y escape
+_STRUCT = re.compile(r'[{}\[\]"]')
+_IN_STRING = re.compile(r'["\\]')
+_KEY_GAP = re.compile(r'\s*:\s*')
+
+_OPEN = "{["
+
+
+class JsonStreamExtractor:
+    def __init__(self, roots: str = "{[", pages: bool = False) -> None:
+        self.roots = roots              # con qué puede empezar un valor de nivel superior
+        self.pages = pages
+        self.values: List[str] = []
+        self._buf = ""                  # valor en curso, desde su primer carácter
+        self._pos = 0                   # hasta dónde de _buf ya se analizó
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._str_start = 0
+        self._last_key: Optional[Tuple[str, int]] = None    # (clave, fin) en el nivel 1
+        self._pages_depth = 0           # profundidad del array "pages" (0 = fuera)
+        self._page_start = -1
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """[("page" | "value", texto JSON)] completados con este fragmento."""
+        out: List[Tuple[str, str]] = []
+        while chunk:
+            if self._depth == 0:
+                chunk = self._seek_root(chunk)
+                if not chunk:
+                    break
+            self._buf += chunk
+            chunk = self._scan(out)
+        return out
+
+    def _seek_root(self, chunk: str) -> str:
+        starts = [i for i in (chunk.find(c) for c in self.roots) if i >= 0]
+        if not starts:
+            return ""
+        self._buf, self._pos, self._last_key = "", 0, None
+        self._pages_depth, self._page_start = 0, -1
+        return chunk[min(starts):]
+
+    def _scan(self, out: List[Tuple[str, str]]) -> str:
+        """Avanza sobre _buf; devuelve lo que sobra tras cerrar un valor raíz."""
+        buf, i = self._buf, self._pos
+        if self._escape and i < len(buf):
+            self._escape, i = False, i + 1
+        while True:
+            if self._in_string:
+                m = _IN_STRING.search(buf, i)
+                if m is None:
+                    i = len(buf)
+                    break
+                i = m.end()
+                if m.group() == "\\":
+                    if i >= len(buf):
+                        self._escape = True
+                        break
+                    i += 1
+                    continue
+                self._in_string = False
+                if self._depth == 1:
+                    self._last_key = (buf[self._str_start:i - 1], i)
+                continue
+
+            m = _STRUCT.search(buf, i)
+            if m is None:
+                i = len(buf)
+                break
+            ch, i = m.group(), m.end()
+            if ch == '"':
+                self._in_string, self._str_start = True, i
+            elif ch in _OPEN:
+                self._depth += 1
+                self._open(buf, i, ch)
+            else:
+                self._depth -= 1
+                if self._close(buf, i, out):
+                    rest = buf[i:]
+                    self._buf, self._pos = "", 0
+                    return rest
+        self._pos = i
+        return ""
+
+    def _open(self, buf: str, i: int, ch: str) -> None:
+        if not self.pages:
+            return
+        if (ch == "[" and self._depth == 2 and self._last_key is not None
+                and self._last_key[0] == "pages" and _KEY_GAP.fullmatch(buf, self._last_key[1], i - 1)):
+            self._pages_depth = 2
+        elif ch == "{" and self._pages_depth and self._depth == self._pages_depth + 1:
+            self._page_start = i - 1
+
+    def _close(self, buf: str, i: int, out: List[Tuple[str, str]]) -> bool:
+        if self._page_start >= 0 and self._depth == self._pages_depth:
+            out.append(("page", buf[self._page_start:i]))
+            self._page_start = -1
+        elif self._pages_depth and self._depth < self._pages_depth:
+            self._pages_depth = 0
+        if self._depth > 0:
+            return False
+        value = buf[:i]
+        self.values.append(value)
+        out.append(("value", value))
+        return True
+
+
+def first_valid(values: List[str]) -> str:
+    """Primer valor que además es JSON válido (descarta cosas como "{ejemplo}" en la prosa)."""
+    for text in values:
+        try:
+            json.loads(text)
+        except ValueError:
+            continue
+        return text
+    raise ValueError("No se encontró un objeto JSON válido.")
+
+def extract_json(raw: str) -> str:
+    """Primer objeto JSON completo y válido de la respuesta del modelo."""
+    ex = JsonStreamExtractor(roots="{")
+    ex.feed(raw)
+    return first_valid(ex.values)
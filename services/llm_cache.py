@@ -0,0 +1,103 @@
+"""
+llm_cache.py
+Caché de respuestas del LLM para prompts repetidos (galería de templates,
+onboarding): mismo prompt normalizado + modelo + temperatura + versión del
+template de prompt → misma respuesta.
+
+Dos niveles: LRU con TTL en memoria del proceso y, si hay REDIS_URL, Redis
+compartido entre workers (core/redis_client). Sólo se guardan respuestas ya
+validadas por el endpoint. Los misses idénticos simultáneos comparten una
+sola llamada al modelo (services/single_flight).
+"""
+import hashlib, json, logging, re, time, unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Tuple
+
+from core.config import settings
+from core.metrics import Counter
+from core.redis_client import redis
+from services.single_flight import SingleFlight
+
+log = logging.getLogger(__name__)
+
+LLM_CACHE_HITS = Counter("llm_cache_hits_total", "Respuestas del LLM servidas desde caché")
+LLM_CACHE_MISSES = Counter("llm_cache_misses_total", "Respuestas del LLM que requirieron llamar al modelo")
+
+
+def normalize_prompt(text: str) -> str:
+    # NFC + espacios colapsados: mismas palabras → misma clave
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+class LLMCache:
+    def __init__(self, name: str, ttl: int, max_entries: int) -> None:
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._mem: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._flight = SingleFlight(name)
+
+    def key(self, prompt: str, model: str, temperature: Optional[float], template_version: str) -> str:
+        raw = json.dumps([normalize_prompt(prompt), model, temperature, template_version], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.name}:{key}"
+
+    async def get(self, key: str) -> Optional[str]:
+        hit = self._mem.get(key)
+        if hit is not None:
+            if hit[0] > time.time():
+                self._mem.move_to_end(key)
+                return hit[1]
+            del self._mem[key]
+        if redis is not None:
+            try:
+                value = await redis.get(self._redis_key(key))
+            except Exception:
+                log.warning("Redis no disponible para %s; sólo caché local", self.name, exc_info=True)
+                return None
+            if value is not None:
+                self._put_local(key, value)
+                return value
+        return None
+
+    async def lookup(self, key: str) -> Optional[str]:
+        """get() contando el acierto o fallo en las métricas."""
+        value = await self.get(key)
+        (LLM_CACHE_HITS if value is not None else LLM_CACHE_MISSES).inc(cache=self.name)
+        return value
+
+    def _put_local(self, key: str, value: str) -> None:
+        self._mem[key] = (time.time() + self.ttl, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    async def set(self, key: str, value: str) -> None:
+        self._put_local(key, value)
+        if redis is not None:
+            try:
+                await redis.set(self._redis_key(key), value, ex=self.ttl)
+            except Exception:
+                log.warning("No se pudo guardar %s en Redis", self.name, exc_info=True)
+
+    async def get_or_call(self, key: str, produce: Callable[[], Awaitable[str]],
+                          cacheable: Callable[[str], bool] = lambda value: True) -> Tuple[str, bool]:
+        """(respuesta, ¿vino de caché?). `produce` sólo corre en un miss, una vez por clave en curso;
+        lo que `cacheable` rechaza se devuelve pero no se guarda."""
+        value = await self.lookup(key)
+        if value is not None:
+            return value, True
+
+        async def produce_and_store() -> str:
+            value = await produce()
+            if cacheable(value):
+                await self.set(key, value)
+            return value
+
+        value, _ = await self._flight.do(key, produce_and_store)
+        return value, False
+
+
+llm_cache = LLMCache("llm_cache", settings.llm_cache_ttl, settings.llm_cache_max_entries)
@@ -0,0 +1,87 @@
+"""
+llm_calls.py
+Llamadas a chat.completions compartidas por los routers de /openai y las
+ediciones con IA.
+
+Cada flujo arma los kwargs de chat.completions.create en un *_request() para
+poder usarlos tanto con la respuesta completa como en streaming. Cada llamada
+pasa por la política de core/openai_client (reintentos + circuit breaker) y
+queda registrada (latencias, tokens, resultado) con el nombre de su endpoint.
+Lo que falla tras los reintentos sale como HTTPException: 503 si el upstream
+no está disponible (breaker abierto, timeout, conexión, cuota), 502 si no.
+"""
+from typing import Any, Callable, Dict, Optional
+
+import openai
+from fastapi import HTTPException
+
+from core import openai_client
+from core.llm_telemetry import LLMCall, classify
+from core.openai_client import UpstreamUnavailable
+from services.ui_repair import model_json_text
+
+
+def unavailable(e: UpstreamUnavailable) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="El servicio de IA no está disponible, reintenta en unos segundos.",
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+def upstream_error(e: openai.APIError) -> HTTPException:
+    """Error de OpenAI que quedó tras los reintentos → 503 si es pasajero, 502 si no."""
+    if isinstance(e, (openai.APIConnectionError, openai.RateLimitError)):    # incluye timeouts
+        return HTTPException(status_code=503, detail="El servicio de IA no está disponible, reintenta en unos segundos.")
+    return HTTPException(status_code=502, detail="El servicio de IA respondió con un error.")
+
+async def create(call: LLMCall, request: Dict[str, Any], **extra: Any):
+    async def attempt():
+        call.attempt()
+        return await openai_client.client.chat.completions.create(**request, **extra)
+    try:
+        return await openai_client.call(attempt)
+    except UpstreamUnavailable as e:
+        call.outcome = "circuit_open"
+        raise unavailable(e)
+    except openai.APIError as e:
+        call.outcome = classify(e)
+        raise upstream_error(e)
+
+async def complete(request: Dict[str, Any], endpoint: str,
+                   parse: Optional[Callable[[str], Any]] = None) -> Any:
+    """Texto de la respuesta, o lo que devuelva `parse`, que lo valida dentro de la
+    medición (HTTPException o ValueError → invalid_json)."""
+    with LLMCall(endpoint, request["model"]) as call:
+        response = await create(call, request)
+        call.record_usage(getattr(response, "usage", None))
+        text = response.choices[0].message.content
+        if parse is None:
+            return text
+        try:
+            return parse(text)
+        except (HTTPException, ValueError):
+            call.outcome = "invalid_json"
+            raise
+
+async def stream_completion(request: Dict[str, Any], call: LLMCall):
+    """Fragmentos de texto a medida que el modelo los genera."""
+    # los reintentos cubren abrir el stream; un corte a mitad de respuesta no se reintenta
+    stream = await create(call, request, stream=True, stream_options={"include_usage": True})
+    try:
+        async for chunk in stream:
+            # con include_usage el último chunk trae `usage` y ningún choice
+            call.record_usage(getattr(chunk, "usage", None))
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                call.token()
+                yield delta
+    finally:
+        # si el cliente SSE se desconecta, cortar también la respuesta de OpenAI
+        await stream.close()
+
+def valid_json_text(raw: Optional[str]) -> str:
+    """Bloque JSON de la respuesta del modelo (reparado localmente si hace falta), o 400."""
+    try:
+        return model_json_text(raw)
+    except ValueError:
+        raise HTTPException(400, "La IA no devolvió un JSON válido.")
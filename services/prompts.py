@@ -0,0 +1,69 @@
+"""
+prompts.py
+Registro de templates de prompt (utils/prompts/*.txt).
+
+Se leen y normalizan una sola vez por proceso; cada uno lleva una versión
+(hash de su texto) que entra en las claves de caché de respuestas, y su tamaño
+en tokens se registra al arrancar. La guía de widgets es común a los endpoints
+de análisis y va siempre como primer mensaje, idéntica byte a byte, para que
+OpenAI pueda reutilizar el prefijo cacheado entre peticiones.
+"""
+import hashlib, logging, textwrap
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+log = logging.getLogger(__name__)
+
+PROMPTS_DIR = Path(__file__).parent.parent / "utils" / "prompts"
+
+
+class PromptTemplate:
+    __slots__ = ("name", "text", "version", "tokens")
+
+    def __init__(self, name: str, text: str) -> None:
+        self.name = name
+        self.text = text
+        self.version = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+        self.tokens = count_tokens(text)
+
+
+@lru_cache(maxsize=None)
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model("gpt-4o")
+    except Exception:       # sin red para bajar el vocabulario, modelo desconocido...
+        log.warning("tiktoken no pudo cargar el encoding de gpt-4o; tokens estimados", exc_info=True)
+        return None
+
+def count_tokens(text: str) -> int:
+    enc = _encoding()
+    # sin tiktoken: ~4 caracteres por token
+    return len(enc.encode(text)) if enc is not None else (len(text) + 3) // 4
+
+
+@lru_cache(maxsize=None)
+def load_prompts() -> Dict[str, PromptTemplate]:
+    return {
+        p.stem: PromptTemplate(p.stem, textwrap.dedent(p.read_text(encoding="utf-8")).strip())
+        for p in sorted(PROMPTS_DIR.glob("*.txt"))
+    }
+
+def prompt(name: str) -> PromptTemplate:
+    return load_prompts()[name]
+
+def prompt_version(*names: str) -> str:
+    """Versión combinada de los templates que usa un endpoint."""
+    return "-".join(prompt(n).version for n in names)
+
+def log_prompt_sizes() -> None:
+    method = "tiktoken" if _encoding() is not None else "estimados"
+    for t in load_prompts().values():
+        log.info("Prompt %s v%s: %d tokens (%s), %d caracteres", t.name, t.version, t.tokens, method, len(t.text))
@@ -0,0 +1,87 @@
+"""
+scoped_edit.py
+Rutas JSON para las ediciones con IA acotadas a una página o un widget.
+
+Las rutas usan el mismo formato que los errores de ui_compiler:
+`$.pages[0]`, `$.pages[1].widgets[3].children[0]`... Sólo se puede apuntar a una
+página o a un widget, nunca a una clave suelta.
+
+replace_at() no modifica el documento original: copia sólo los contenedores
+del camino hasta el nodo reemplazado (el resto se comparte), así SQLAlchemy ve
+un `data` nuevo al asignarlo.
+"""
+import json, re
+from typing import Any, List, Optional, Union
+
+Step = Union[str, int]
+
+_TOKEN = re.compile(r"\.([A-Za-z_][A-Za-z0-9_]*)|\[(\d+)\]")
+
+# Último tramo de la ruta → qué se está editando
+_TARGETS = {"pages": "page", "widgets": "widget", "children": "widget"}
+
+
+class EditPathError(ValueError):
+    def __init__(self, path: str, msg: str) -> None:
+        super().__init__(f"{path}: {msg}")
+        self.path = path
+        self.msg = msg
+
+
+def split_path(path: str) -> List[Step]:
+    """`$.pages[0].widgets[2]` → ["pages", 0, "widgets", 2] (cualquier ruta)."""
+    if not path.startswith("$"):
+        raise EditPathError(path, "debe empezar con '$'")
+    steps: List[Step] = []
+    pos = 1
+    while pos < len(path):
+        m = _TOKEN.match(path, pos)
+        if m is None:
+            raise EditPathError(path, f"sintaxis inválida en la posición {pos}")
+        steps.append(m.group(1) if m.group(1) is not None else int(m.group(2)))
+        pos = m.end()
+    return steps
+
+def parse_path(path: str) -> List[Step]:
+    """Como split_path, pero la ruta tiene que apuntar a una página o a un widget."""
+    steps = split_path(path)
+    if len(steps) < 2 or not isinstance(steps[-1], int) or steps[-2] not in _TARGETS:
+        raise EditPathError(path, "debe apuntar a una página o a un widget (…pages[i], …widgets[i], …children[i])")
+    return steps
+
+def enclosing_target(steps: List[Step]) -> Optional[List[Step]]:
+    """Ruta de la página o widget más cercano que contiene `steps` (None si es del nivel app)."""
+    for i in range(len(steps) - 1, 0, -1):
+        if isinstance(steps[i], int) and steps[i - 1] in _TARGETS:
+            return steps[:i + 1]
+    return None
+
+def format_path(steps: List[Step]) -> str:
+    return "$" + "".join(f"[{s}]" if isinstance(s, int) else f".{s}" for s in steps)
+
+def target_kind(steps: List[Step]) -> str:
+    """"page" o "widget"."""
+    return _TARGETS[steps[-2]]
+
+def get_at(doc: Any, steps: List[Step], path: str = "$") -> Any:
+    node = doc
+    for step in steps:
+        try:
+            node = node[step]
+        except (KeyError, IndexError, TypeError):
+            raise EditPathError(path, f"no existe '{step}'")
+    return node
+
+def replace_at(doc: Any, steps: List[Step], value: Any) -> Any:
+    """Copia de `doc` con `value` en `steps`."""
+    if not steps:
+        return value
+    head = steps[0]
+    copy = list(doc) if isinstance(doc, list) else dict(doc)
+    copy[head] = replace_at(doc[head], steps[1:], value)
+    return copy
+
+def edit_max_tokens(subtree: Any, floor: int = 256, ceiling: int = 4000) -> int:
+    """Tope de salida proporcional al subárbol: ~2x su tamaño (≈4 caracteres por token)."""
+    size = len(json.dumps(subtree, ensure_ascii=False, separators=(",", ":"))) // 4
+    return max(floor, min(ceiling, 2 * size + 200))
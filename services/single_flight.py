@@ -0,0 +1,48 @@
+"""
+single_flight.py
+Coalescencia de llamadas idénticas en curso ("single-flight").
+
+Si llega una petición con la misma clave mientras otra ya está esperando a
+OpenAI, se engancha a esa misma llamada en vez de lanzar otra: una sola llamada
+upstream, todos reciben su resultado (o su error). La llamada corre en su propia
+task y cada espera va protegida con asyncio.shield, así que si un cliente se
+desconecta la llamada sigue para los demás (y su resultado llega a la caché).
+
+Por proceso: entre workers la deduplicación la hace la caché compartida.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Tuple, TypeVar
+
+from core.metrics import Counter, Gauge
+
+T = TypeVar("T")
+
+SINGLE_FLIGHT_CALLS = Counter("single_flight_calls_total", "Llamadas por resultado (leader = upstream, shared = coalescida)")
+SINGLE_FLIGHT_INFLIGHT = Gauge("single_flight_inflight", "Llamadas upstream en curso")
+
+
+class SingleFlight:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._calls: Dict[str, "asyncio.Task"] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """(resultado, ¿se compartió una llamada ya en curso?)."""
+        task = self._calls.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            SINGLE_FLIGHT_INFLIGHT.set(len(self._calls), flight=self.name)
+        SINGLE_FLIGHT_CALLS.inc(flight=self.name, role="shared" if shared else "leader")
+        # shield: cancelar a un waiter no cancela la llamada compartida
+        return await asyncio.shield(task), shared
+
+    def _forget(self, key: str, task: "asyncio.Task") -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        SINGLE_FLIGHT_INFLIGHT.set(len(self._calls), flight=self.name)
+        # si todos los waiters se fueron, que el error no quede como "never retrieved"
+        if not task.cancelled():
+            task.exception()
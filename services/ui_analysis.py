@@ -0,0 +1,77 @@
+"""
+ui_analysis.py
+Analyze: UI JSON a partir de una captura o una descripción, compartido por
+/analyze-ui-* y sus variantes en streaming.
+
+La guía de widgets va primero y siempre idéntica (prefijo cacheable por
+OpenAI). La respuesta pasa por ui_repair antes de devolverla o cachearla; lo
+que no se puede arreglar localmente se re-pregunta sólo por el subárbol roto.
+"""
+import asyncio, json, logging
+from typing import Any, Dict, Tuple
+
+from core.config import settings
+from services.ai_edit import ScopedEditError, scoped_edit
+from services.image_prep import PreparedImage
+from services.prompts import prompt
+from services.scoped_edit import format_path, get_at, replace_at, target_kind
+from services.ui_repair import UI_REPAIRS, repair_ui
+
+
+def analyze_image_request(img: PreparedImage) -> Dict[str, Any]:
+    # guía de widgets primero y siempre idéntica: prefijo cacheable por OpenAI
+    return {
+        "model": "gpt-4o",
+        "temperature": 0.3,
+        "max_tokens": 3000,
+        "messages": [
+            {"role": "system", "content": prompt("widget_guide").text},
+            {"role": "system", "content": prompt("analyze_image_system").text},
+            {"role": "user", "content": [{"type": "image_url", "image_url": img.image_url}]}
+        ],
+    }
+
+def analyze_prompt_request(prompt_text: str) -> Dict[str, Any]:
+    # mismo prefijo que el endpoint de imagen; lo variable va al final
+    return {
+        "model": "gpt-4o",
+        "temperature": 0.1,
+        "max_tokens": 4000, # Limitar tokens
+        "messages": [
+            {"role": "system", "content": prompt("widget_guide").text},
+            {"role": "system", "content": prompt("analyze_prompt_system").text},
+            {"role": "user", "content": f"Descripción de la UI:\n{prompt_text}"}
+        ],
+    }
+
+async def repaired_ui_text(clean: str, endpoint: str) -> Tuple[str, bool]:
+    """(UI JSON, ¿lo acepta el generador?): arreglos locales y, sólo si no alcanzan,
+    re-prompt del subárbol roto (nunca del documento entero), registrado como
+    "<endpoint>-repair". Lo inválido no se cachea."""
+    doc = json.loads(clean)
+    if not isinstance(doc, dict):
+        return clean, False
+    changed, valid = False, False
+    for reprompt in range(settings.ui_repair_max_reprompts + 1):
+        # hasta MAX_LOCAL_FIXES rondas de esquema + dry-run: fuera del event loop. En un
+        # thread y no en export_pool, que puede ser de procesos: repair_ui arregla `doc` en el lugar
+        result = await asyncio.to_thread(repair_ui, doc)
+        changed = changed or bool(result.fixes)
+        if result.valid:
+            valid = True
+            break
+        if result.broken is None or reprompt == settings.ui_repair_max_reprompts:
+            UI_REPAIRS.inc(kind="unrepaired")
+            logging.warning("UI JSON del modelo sin reparar: %s", result.broken[1] if result.broken else "error sin ruta")
+            break
+        steps, error = result.broken
+        try:
+            edited = await scoped_edit(get_at(doc, steps), target_kind(steps),
+                                       f"Corrige sólo este error de validación: {error}", f"{endpoint}-repair")
+        except ScopedEditError:
+            UI_REPAIRS.inc(kind="unrepaired")
+            logging.warning("Re-prompt de %s sin JSON válido", format_path(steps))
+            break
+        UI_REPAIRS.inc(kind="reprompt")
+        doc, changed = replace_at(doc, steps, edited), True
+    return (json.dumps(doc, ensure_ascii=False) if changed else clean), valid
@@ -0,0 +1,833 @@
+"""
+ui_compiler.py
+UI JSON → main.dart en dos fases:
+
+1. compile_ui: un único recorrido por página que valida la entrada y arma un
+   árbol tipado (nodos con __slots__), juntando de paso variables de estado,
+   imports, appBar, bottomNavigationBar y FAB.
+2. emit_app: una sola pasada de emisión sobre ese árbol hacia el buffer DW.
+
+El código de cada página se cachea por hash de su JSON + rutas, de modo que una
+re-exportación tras editar una página sólo vuelve a generar esa página. Dentro
+de una página, los subárboles idénticos se unifican (hash-consing) y se
+renderizan una sola vez; opcionalmente se emiten como una clase privada compartida.
+"""
+import hashlib, json, re, threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Páginas ya generadas que se conservan por proceso
+PAGE_CACHE_SIZE = 512
+
+# Subárboles repetidos de al menos estas líneas pasan a una clase compartida
+SHARED_WIDGET_MIN_LINES = 3
+
+# ─────────── Errores ───────────
+
+class UIValidationError(ValueError):
+    """El JSON de UI no tiene lo que el generador necesita; `path` indica dónde."""
+    def __init__(self, path: str, msg: str) -> None:
+        super().__init__(f"{path}: {msg}")
+        self.path = path
+        self.msg = msg
+
+# ─────────────── Helpers ───────────────
+
+def _parse_size(val: Optional[str], dimension: str) -> Optional[str]:
+    if not val:
+        return None
+    if val.endswith("%"):
+        pct = float(val.rstrip("%")) / 100
+        return f"constraints.max{dimension.capitalize()} * {pct}"
+    if val.endswith("px"):
+        return f"{float(val.rstrip('px'))}"
+    return val
+
+def _edge(pad: Optional[str]) -> str:
+    if not pad:
+        return "EdgeInsets.zero"
+    parts = pad.replace("px", "").split()
+    if len(parts) == 1:
+        return f"EdgeInsets.all({parts[0]})"
+    return f"EdgeInsets.symmetric(horizontal: {parts[0]}, vertical: {parts[1]})"
+
+_color = lambda h: f"Color(0xFF{h.lstrip('#')})"
+
+# ─────────── Writer ───────────
+
+class DW:
+    def __init__(self) -> None:
+        self.lines: List[str] = []
+    def w(self, txt: str = "", ind: int = 0) -> None:
+        self.lines.append("  " * ind + txt)
+    def __str__(self) -> str:
+        return "\n".join(self.lines)
+
+# ───── Align & FAB mappings ─────
+
+_MAIN = {
+    "flex-start": "MainAxisAlignment.start",
+    "center":     "MainAxisAlignment.center",
+    "flex-end":   "MainAxisAlignment.end",
+    "space-between": "MainAxisAlignment.spaceBetween",
+    "space-around":  "MainAxisAlignment.spaceAround",
+}
+_CROSS = {
+    "flex-start": "CrossAxisAlignment.start",
+    "center":     "CrossAxisAlignment.center",
+    "flex-end":   "CrossAxisAlignment.end",
+}
+_ALIGN = {
+    "center":     "Alignment.center",
+    "flex-start": "Alignment.centerLeft",
+    "flex-end":   "Alignment.centerRight",
+}
+_FAB_LOC = {
+    "bottomRight":  "FloatingActionButtonLocation.endFloat",
+    "bottomLeft":   "FloatingActionButtonLocation.startFloat",
+    "bottomCenter": "FloatingActionButtonLocation.centerFloat",
+    "centerDocked": "FloatingActionButtonLocation.centerDocked",
+    "topRight":     "FloatingActionButtonLocation.endTop",
+    "topLeft":      "FloatingActionButtonLocation.startTop",
+}
+
+# Claves obligatorias por tipo de widget (las que el emisor lee con [])
+_REQUIRED: Dict[str, Tuple[str, ...]] = {
+    "text": ("text",), "heading": ("text",), "chip": ("text",),
+    "icon": ("icon",), "image": ("src",), "button": ("label",),
+    "checkbox": ("label",), "switch": ("label",),
+    "radioGroup": ("label", "options"), "dropdown": ("label", "items"),
+    "listTile": ("title", "subtitle"),
+    "listView": ("children",), "card": ("children",), "stack": ("children",),
+    "row": ("children",), "column": ("children",),
+    "dataTable": ("table",), "alertDialog": ("dialog",),
+}
+
+# Tipo esperado para las claves que no son texto libre
+_KEY_TYPES: Dict[str, Any] = {
+    "children": list, "options": (list, str), "items": (list, str),
+    "table": dict, "dialog": dict,
+}
+
+# Tipos que el emisor sabe generar; el resto sale como Container() vacío.
+SUPPORTED_WIDGETS = frozenset((
+    "text", "heading", "icon", "image", "button", "textField", "checkbox", "switch",
+    "slider", "radioGroup", "dropdown", "datePicker", "circleAvatar", "chip",
+    "listView", "listTile", "card", "stack", "row", "column", "container",
+    "dataTable", "alertDialog", "progressIndicator", "appBar", "bottomNavigationBar",
+))
+
+# Marcador del modo híbrido de /generate-flutter con código Dart ya generado.
+# No es un widget del esquema: sólo se compila con snippets=True, que pasa
+# únicamente hybrid_codegen; en cualquier otro JSON sale como Container().
+SNIPPET_TYPE = "dartSnippet"
+
+# Widgets con hijos y la sangría relativa con la que se emiten
+_CHILD_IND = {"listView": 1, "card": 2, "stack": 2, "row": 1, "column": 1, "container": 3}
+CHILD_WIDGETS = frozenset(_CHILD_IND)
+
+# Claves que nunca afectan al código generado (no cuentan para el hash-consing)
+_IGNORED_KEYS = frozenset(("children", "x", "y"))
+
+# ─────────── IR ───────────
+
+def page_class(name: str) -> str:
+    """Clase Dart de una página (y de su ruta `/<name>` en el MaterialApp)."""
+    return name.capitalize() + "Page"
+
+class WidgetNode:
+    __slots__ = ("kind", "attrs", "children", "var", "refs", "code")
+
+    def __init__(self, kind: str, attrs: Dict[str, Any], var: Optional[str]) -> None:
+        self.kind = kind
+        self.attrs = attrs
+        self.children: List["WidgetNode"] = []
+        self.var = var
+        self.refs = 0           # apariciones en la página tras el hash-consing
+        self.code: Optional[str] = None     # sólo marcadores del modo híbrido
+
+class PageIR:
+    __slots__ = ("name", "cls", "title", "background", "fab", "app_bar",
+                 "bottom_nav", "nav_index", "widgets", "state_vars", "needs_intl")
+
+    def __init__(self, name: str, title: Any) -> None:
+        self.name = name
+        self.cls = page_class(name)
+        self.title = title
+        self.background: Optional[str] = None
+        self.fab: Dict[str, Any] = {}
+        self.app_bar: Optional[Dict[str, Any]] = None
+        self.bottom_nav: Optional[Dict[str, Any]] = None
+        self.nav_index = 0
+        self.widgets: List[WidgetNode] = []
+        self.state_vars: Dict[str, str] = {}
+        self.needs_intl = False
+
+class AppIR:
+    __slots__ = ("name", "app_name", "primary", "routes", "pages", "needs_intl")
+
+    def __init__(self, name: str, primary: str, routes: List[str]) -> None:
+        raw = name.replace(" ", "")
+        self.name = name
+        self.app_name = raw if raw.lower().endswith("app") else f"{raw}App"
+        self.primary = primary
+        self.routes = routes
+        self.pages: List[PageIR] = []
+        self.needs_intl = False
+
+# ─────────── Compilación ───────────
+
+def _req(obj: Any, key: str, path: str, typ: Any = str) -> Any:
+    if not isinstance(obj, dict) or key not in obj:
+        raise UIValidationError(path, f"falta '{key}'")
+    val = obj[key]
+    if not isinstance(val, typ):
+        names = " o ".join(t.__name__ for t in (typ if isinstance(typ, tuple) else (typ,)))
+        raise UIValidationError(f"{path}.{key}", f"se esperaba {names}")
+    return val
+
+def _state_var(kind: str, w: Dict[str, Any], var: Optional[str]) -> Optional[Tuple[str, str]]:
+    if kind in ("switch", "checkbox"):
+        return var, f"bool {var} = {str(w.get('value', False)).lower()};"
+    if kind == "slider":
+        return "sliderValue", f"double sliderValue = {w.get('value', 0)};"
+    if kind in ("radioGroup", "dropdown"):
+        return var, f"String {var} = '{w.get('value','')}';"
+    if kind == "datePicker":
+        return "selectedDate", "DateTime? selectedDate;"
+    return None
+
+def _check_widget(kind: str, w: Dict[str, Any], path: str) -> None:
+    for key in _REQUIRED.get(kind, ()):
+        _req(w, key, path, _KEY_TYPES.get(key, object))
+    for key, table in (("mainAxisAlignment", _MAIN), ("crossAxisAlignment", _CROSS)):
+        if kind in ("row", "column", "container") and w.get(key) and w[key] not in table:
+            raise UIValidationError(f"{path}.{key}", f"valor no soportado '{w[key]}'")
+    if kind == "listTile" and w.get("icon"):
+        _req(w["icon"], "name", f"{path}.icon")
+        _req(w["icon"], "color", f"{path}.icon")
+    elif kind == "dataTable":
+        _req(w["table"], "columns", f"{path}.table", list)
+        _req(w["table"], "rows", f"{path}.table", list)
+    elif kind == "alertDialog":
+        dlg = w["dialog"]
+        _req(dlg, "title", f"{path}.dialog", object)
+        _req(dlg, "content", f"{path}.dialog", object)
+        buttons = _req(dlg, "buttons", f"{path}.dialog", dict)
+        for b in ("cancel", "confirm"):
+            _req(_req(buttons, b, f"{path}.dialog.buttons", dict), "text", f"{path}.dialog.buttons.{b}", object)
+
+def widget_supported(w: Any) -> bool:
+    """¿El emisor genera este widget tal cual? (tipo conocido y claves válidas; no mira los hijos)"""
+    if not isinstance(w, dict) or w.get("type") not in SUPPORTED_WIDGETS:
+        return False
+    try:
+        _check_widget(w["type"], w, "$")
+    except UIValidationError:
+        return False
+    return True
+
+def _compile_page(pg: Dict[str, Any], path: str, routes: List[str], snippets: bool = False) -> PageIR:
+    # el title sólo hace falta si hay appBar (es su texto)
+    page = PageIR(_req(pg, "name", path), pg.get("title"))
+    page.background = pg.get("background")
+    page.fab = pg.get("fab", {})
+    widgets = _req(pg, "widgets", path, list)
+
+    # (widget JSON, lista destino, ruta, ¿nivel superior?) en preorden
+    stack: List[Tuple[Any, List[WidgetNode], str, bool]] = [
+        (w, page.widgets, f"{path}.widgets[{i}]", True) for i, w in enumerate(widgets)
+    ]
+    stack.reverse()
+    while stack:
+        w, dest, wpath, top = stack.pop()
+        kind = _req(w, "type", wpath)
+        _check_widget(kind, w, wpath)
+
+        var = w["label"].lower().replace(" ", "_") if kind in ("switch", "checkbox", "radioGroup", "dropdown") else None
+        if sv := _state_var(kind, w, var):
+            page.state_vars[sv[0]] = sv[1]
+
+        if top:
+            if kind == "appBar":
+                if page.app_bar is None:
+                    _req(pg, "title", path, object)
+                    page.app_bar = w
+                continue
+            if kind == "bottomNavigationBar" and page.bottom_nav is None:
+                page.bottom_nav = w
+                _req(w, "selectedItemColor", wpath)
+                _req(w, "textColor", wpath)
+                for j, item in enumerate(_req(w, "items", wpath, list)):
+                    for key in ("icon", "label", "route"):
+                        _req(item, key, f"{wpath}.items[{j}]", object)
+                route = f"/{page.name}"
+                if route not in routes:
+                    raise UIValidationError(f"{path}.name", f"la ruta '{route}' no está en routes")
+                page.nav_index = routes.index(route)
+            if kind == "datePicker":
+                page.needs_intl = True
+
+        node = WidgetNode(kind, w, var)
+        if snippets and kind == SNIPPET_TYPE:
+            node.code = _req(w, "code", wpath)
+        dest.append(node)
+        children = w.get("children")
+        if kind in _CHILD_IND and isinstance(children, list):
+            for i in range(len(children) - 1, -1, -1):
+                stack.append((children[i], node.children, f"{wpath}.children[{i}]", False))
+        elif "children" in w and isinstance(children, list):
+            # widgets sin soporte de hijos: sólo importan sus variables de estado
+            for i in range(len(children) - 1, -1, -1):
+                stack.append((children[i], [], f"{wpath}.children[{i}]", False))
+    _intern(page.widgets)
+    return page
+
+def _intern(roots: List[WidgetNode]) -> None:
+    """Hash-consing en post-orden: subárboles iguales pasan a ser el mismo nodo."""
+    table: Dict[Tuple[Any, ...], WidgetNode] = {}
+    stack: List[Tuple[List[WidgetNode], int, bool]] = [(roots, i, False) for i in range(len(roots) - 1, -1, -1)]
+    while stack:
+        lst, i, done = stack.pop()
+        n = lst[i]
+        if not done:
+            stack.append((lst, i, True))
+            for j in range(len(n.children) - 1, -1, -1):
+                stack.append((n.children, j, False))
+            continue
+        attrs = json.dumps(
+            {k: v for k, v in n.attrs.items() if k not in _IGNORED_KEYS},
+            sort_keys=True, separators=(",", ":"), default=str,
+        )
+        # var entra en la clave: cada widget con estado tiene su propia variable
+        key = (n.kind, n.var, n.code, attrs, tuple(id(c) for c in n.children))
+        canon = table.setdefault(key, n)
+        canon.refs += 1
+        lst[i] = canon
+
+def _compile_app(ui: Dict[str, Any]) -> AppIR:
+    theme = _req(ui, "theme", "$", dict)
+    routes = _req(ui, "routes", "$", list)
+    if not routes:
+        raise UIValidationError("$.routes", "debe tener al menos una ruta")
+    return AppIR(_req(ui, "name", "$"), _req(theme, "primary", "$.theme"), routes)
+
+def compile_ui(ui: Dict[str, Any], snippets: bool = False) -> AppIR:
+    app = _compile_app(ui)
+    for i, pg in enumerate(_req(ui, "pages", "$", list)):
+        page = _compile_page(pg, f"$.pages[{i}]", app.routes, snippets)
+        app.needs_intl = app.needs_intl or page.needs_intl
+        app.pages.append(page)
+    return app
+
+# ─── IR → Dart widget converter ───
+
+# Cada widget se describe como (líneas de apertura, hijos, sangría relativa de
+# los hijos, líneas de cierre). _w2d recorre el árbol con una pila explícita y
+# escribe cada línea una sola vez, ya con su sangría final, en el buffer DW.
+_Frame = Tuple[List[str], List[WidgetNode], int, List[str]]
+
+def _render(n: WidgetNode) -> _Frame:
+    t, node, var = n.kind, n.attrs, n.var
+    out: List[str] = []
+
+    if n.code is not None:
+        # expresión de widget ya generada: se copia con la sangría del árbol
+        code = n.code.strip().rstrip(";,").splitlines() or ["Container()"]
+        out.extend(code[:-1] + [code[-1] + ","])
+    elif t in ("text","heading"):
+        txt = node["text"]
+        style_parts: List[str] = []
+        if node.get("fontSize"):
+            style_parts.append(f"fontSize: {node['fontSize']}")
+        if node.get("bold"):
+            style_parts.append("fontWeight: FontWeight.bold")
+        if node.get("textColor"):
+            style_parts.append(f"color: {_color(node['textColor'])}")
+        style = f", style: TextStyle({', '.join(style_parts)})" if style_parts else ""
+        widget = f"Text('{txt}'{style})"
+        if align := node.get("align"):
+            out.append(f"Align(alignment: {_ALIGN.get(align,'Alignment.center')}, child: {widget}),")
+        else:
+            out.append(f"{widget},")
+    elif t == "icon":
+        out.append(f"Icon(Icons.{node['icon']}),")
+    elif t == "image":
+        w = _parse_size(node.get("width"), "width")
+        h = _parse_size(node.get("height"), "height")
+        args: List[str] = []
+        if w: args.append(f"width: {w}")
+        if h: args.append(f"height: {h}")
+        arg_str = ", " + ", ".join(args) if args else ""
+        out.append(f"Image.network('{node['src']}'{arg_str}),")
+    elif t == "button":
+        style = ""
+        if node.get("backgroundColor"):
+            style = f" style: ElevatedButton.styleFrom(backgroundColor: {_color(node['backgroundColor'])}),"
+        out.extend([
+            "ElevatedButton(",
+            f"  onPressed: () {{ }},{style}",
+            f"  child: Text('{node['label']}'),",
+            "),",
+        ])
+    elif t == "textField":
+        dec: List[str] = []
+        if node.get("label"):
+            dec.append(f"labelText: '{node['label']}'")
+        if node.get("placeholder"):
+            dec.append(f"hintText: '{node['placeholder']}'")
+        out.append(f"TextField(decoration: InputDecoration({', '.join(dec)})),")
+    elif t == "checkbox":
+        out.append(
+            f"CheckboxListTile(title: Text('{node['label']}'), value: {var}, onChanged: (v) {{ setState(() => {var} = v!); }}),"
+        )
+    elif t == "switch":
+        out.append(
+            f"SwitchListTile(title: Text('{node['label']}'), value: {var}, onChanged: (v) {{ setState(() => {var} = v!); }}),"
+        )
+    elif t == "slider":
+        out.append("Slider(value: sliderValue, onChanged: (v) { setState(() => sliderValue = v); }, min: 0, max: 100),")
+    elif t == "radioGroup":
+        out.append("Column(children: [")
+        for opt in node["options"]:
+            out.append(
+                f"  RadioListTile<String>(value: '{opt}', groupValue: {var}, title: Text('{opt}'), onChanged: (v) {{ setState(() => {var} = v!); }},),"
+            )
+        out.append("]),")
+    elif t == "dropdown":
+        items = ", ".join(f'DropdownMenuItem(value: "{i}", child: Text("{i}"))' for i in node["items"])
+        out.append(
+            f"DropdownButton<String>(value: {var}, items: [{items}], onChanged: (v) {{ setState(() => {var} = v!); }}),"
+        )
+    elif t == "datePicker":
+        ph = node.get("placeholder", "Select date")
+        out.extend([
+            "OutlinedButton(",
+            "  onPressed: () async {",
+            "    final d = await showDatePicker(",
+            "      context: context, firstDate: DateTime(2000), lastDate: DateTime(2100), initialDate: DateTime.now(),",
+            "    ); if (d != null) setState(() => selectedDate = d);",
+            "  },",
+            f"  child: Text('{ph}'),",
+            "),"
+        ])
+    elif t == "circleAvatar":
+        out.append("CircleAvatar(radius: 24),")
+    elif t == "chip":
+        out.append(f"Chip(label: Text('{node['text']}')),")
+    elif t == "listView":
+        h = _parse_size(node.get("height"), "height")
+        if h:
+            out.append(f"SizedBox(height: {h}, child: ListView(children: [")
+        else:
+            out.append("ListView(shrinkWrap: true, children: [")
+        return out, n.children, 1, ["])),"]
+    elif t == "listTile":
+        out.append("ListTile(")
+        if icon := node.get("icon"):
+            out.append(f"  leading: Icon(Icons.{icon['name']}, color: {_color(icon['color'])}),")
+        out.append(f"  title: Text('{node['title']}'),")
+        out.append(f"  subtitle: Text('{node['subtitle']}'),")
+        if node.get("check"):
+            out.append("  trailing: Icon(Icons.check),")
+        out.append("),")
+    elif t == "card":
+        out.append("Card(")
+        if bc := node.get("backgroundColor"):
+            out.append(f"  color: {_color(bc)},")
+        out.append("  child: Column(children: [")
+        return out, n.children, 2, ["  ]),", "),"]
+    elif t == "stack":
+        bg = node.get("backgroundColor")
+        h = _parse_size(node.get("height"), "height")
+        out.append("Container(")
+        if bg: out.append(f"  color: {_color(bg)},")
+        if h: out.append(f"  height: {h},")
+        out.append("  child: Stack(children: [")
+        return out, n.children, 2, ["  ]),", "),"]
+    elif t in ("row","column"):
+        lay = "Row" if t=="row" else "Column"
+        out.append(f"{lay}(")
+        if ma := node.get("mainAxisAlignment"):
+            out.append(f"  mainAxisAlignment: {_MAIN[ma]},")
+        if ca := node.get("crossAxisAlignment"):
+            out.append(f"  crossAxisAlignment: {_CROSS[ca]},")
+        out.append("  children: [")
+        return out, n.children, 1, ["  ],", "),"]
+    elif t == "container":
+        w = _parse_size(node.get("width"), "width") or "constraints.maxWidth"
+        h = _parse_size(node.get("height"), "height")
+        out.append("Container(")
+        out.append(f"  width: {w},")
+        if h: out.append(f"  height: {h},")
+        if bc := node.get("backgroundColor"):
+            out.append(f"  color: {_color(bc)},")
+        if node.get("children"):
+            out.append("  child: Column(")
+            if ma := node.get("mainAxisAlignment"):
+                out.append(f"    mainAxisAlignment: {_MAIN[ma]},")
+            if ca := node.get("crossAxisAlignment"):
+                out.append(f"    crossAxisAlignment: {_CROSS[ca]},")
+            out.append("    children: [")
+            return out, n.children, 3, ["    ],", "  ),", "),"]
+        out.append("),")
+    elif t == "dataTable":
+        cols = ", ".join(f'DataColumn(label: Text("{c}"))' for c in node["table"]["columns"])
+        rows = []
+        for r in node["table"]["rows"]:
+            cells = ", ".join(f'DataCell(Text("{c}"))' for c in r)
+            rows.append(f"DataRow(cells: [{cells}])")
+        out.append(f"SingleChildScrollView(scrollDirection: Axis.horizontal, child: DataTable(columns: [{cols}], rows: [{','.join(rows)}])),")
+    elif t == "alertDialog":
+        dlg = node["dialog"]
+        out.extend([
+            "ElevatedButton(",
+            "  onPressed: () {",
+            "    showDialog(",
+            "      context: context,",
+            "      builder: (_) => AlertDialog(",
+            f"        title: Text('{dlg['title']}'),",
+            f"        content: Text('{dlg['content']}'),",
+            "        actions: [",
+            f"          TextButton(onPressed: ()=>Navigator.pop(context), child: Text('{dlg['buttons']['cancel']['text']}')),",
+            f"          TextButton(onPressed: ()=>Navigator.pop(context), child: Text('{dlg['buttons']['confirm']['text']}')),",
+            "        ],",
+            "      ),",
+            "    );",
+            "  },",
+            f"  child: Text('{dlg['buttons']['confirm']['text']}'),",
+            "),"
+        ])
+    elif t == "progressIndicator":
+        if node.get("value") is not None:
+            out.append(f"LinearProgressIndicator(value: {node['value']}/100),")
+        else:
+            out.append("CircularProgressIndicator(),")
+    else:
+        out.append("Container(),")
+
+    return out, [], 0, []
+
+class _Memo:
+    """Bloques ya renderizados de nodos repetidos (líneas sin la sangría base)."""
+    def __init__(self, prefix: Optional[str] = None) -> None:
+        self.blocks: Dict[int, List[str]] = {}
+        self.prefix = prefix            # None → no extraer clases compartidas
+        self.classes: List[Tuple[str, List[str]]] = []
+
+class _EndCapture:
+    __slots__ = ("node", "start", "depth")
+    def __init__(self, node: WidgetNode, start: int, depth: int) -> None:
+        self.node, self.start, self.depth = node, start, depth
+
+def _end_capture(cap: _EndCapture, lines: List[str], memo: _Memo) -> None:
+    cut = 2 * cap.depth
+    block = [l[cut:] for l in lines[cap.start:]]
+    if (memo.prefix is not None and len(block) >= SHARED_WIDGET_MIN_LINES
+            and not any("setState" in l or "constraints." in l for l in block)):
+        # sin estado ni constraints del LayoutBuilder: puede vivir en su propia clase
+        name = f"{memo.prefix}{len(memo.classes)}"
+        memo.classes.append((name, block))
+        block = [f"const {name}(),"]
+        lines[cap.start:] = ["  " * cap.depth + block[0]]
+    memo.blocks[id(cap.node)] = block
+
+def _w2d(node: WidgetNode, ind: int, dw: DW, memo: Optional[_Memo] = None) -> None:
+    lines = dw.lines
+    memo = memo or _Memo()
+    # pila de (widget, sangría) o (línea de cierre, sangría); iterativo para no
+    # depender del límite de recursión con árboles muy profundos
+    stack: List[Tuple[Any, int]] = [(node, ind)]
+    while stack:
+        item, depth = stack.pop()
+        pad = "  " * depth
+        if isinstance(item, str):
+            lines.append(pad + item)
+            continue
+        if isinstance(item, _EndCapture):
+            _end_capture(item, lines, memo)
+            continue
+        if item.refs > 1:
+            if (block := memo.blocks.get(id(item))) is not None:
+                for l in block:
+                    lines.append(pad + l)
+                continue
+            stack.append((_EndCapture(item, len(lines), depth), depth))
+        head, children, child_ind, tail = _render(item)
+        for l in head:
+            lines.append(pad + l)
+        for l in reversed(tail):
+            stack.append((l, depth))
+        for ch in reversed(children):
+            stack.append((ch, depth + child_ind))
+
+# ─── Emisión ───
+
+def _emit_app_shell(app_ir: AppIR, app: DW, imports: List[str]) -> None:
+    app_name, routes = app_ir.app_name, app_ir.routes
+    app.w("import 'package:flutter/material.dart';")
+    for imp in imports:
+        app.w(f"import '{imp}';")
+    app.w()
+    app.w(f"void main() => runApp(const {app_name}());")
+    app.w()
+    app.w(f"class {app_name} extends StatelessWidget {{")
+    app.w("  const " + app_name + "({super.key});")
+    app.w("  @override")
+    app.w("  Widget build(BuildContext context) {")
+    app.w("    return MaterialApp(",1)
+    app.w(f"      title: '{app_ir.name}',",2)
+    app.w("      theme: ThemeData(",2)
+    app.w(f"        primaryColor: const {_color(app_ir.primary)},",3)
+    app.w(f"        colorScheme: ColorScheme.fromSeed(seedColor: const {_color(app_ir.primary)}),",3)
+    app.w("      ),",2)
+    app.w(f"      initialRoute: '{routes[0]}',",2)
+    app.w("      routes: {",2)
+    for rt in routes:
+        cls = page_class(rt.lstrip("/"))
+        app.w(f"        '{rt}': (_) => const {cls}(),",3)
+    app.w("      },",2)
+    app.w("    );")
+    app.w("  }")
+    app.w("}")
+    app.w()
+
+def _emit_page(pg: PageIR, app: DW, shared_widgets: bool = False) -> None:
+    cls, fab, state_vars = pg.cls, pg.fab, pg.state_vars
+    memo = _Memo(f"_{cls}Shared" if shared_widgets else None)
+
+    if state_vars:
+        app.w(f"class {cls} extends StatefulWidget {{")
+        app.w("  const " + cls + "({super.key});")
+        app.w("  @override")
+        app.w(f"  _{cls}State createState() => _{cls}State();")
+        app.w("}")
+        app.w()
+        app.w(f"class _{cls}State extends State<{cls}> {{")
+        for decl in state_vars.values():
+            app.w(f"  {decl}")
+        app.w()
+        app.w("  @override")
+        app.w("  Widget build(BuildContext context) {")
+    else:
+        app.w(f"class {cls} extends StatelessWidget {{")
+        app.w("  const " + cls + "({super.key});")
+        app.w("  @override")
+        app.w("  Widget build(BuildContext context) {")
+
+    app.w("    return Scaffold(",2)
+    if bg := pg.background:
+        app.w(f"      backgroundColor: const {_color(bg)},",3)
+
+    # only if an appBar widget is present in JSON
+    if ab := pg.app_bar:
+        bgc = ab.get("backgroundColor")
+        tc  = ab.get("textColor")
+        ht  = None
+        if ab.get("height", "").endswith("px"):
+            ht = float(ab["height"].rstrip("px"))
+        app.w("      appBar: AppBar(",3)
+        if bgc:
+            app.w(f"        backgroundColor: {_color(bgc)},",4)
+        if ht is not None:
+            app.w(f"        toolbarHeight: {ht},",4)
+        if tc:
+            app.w(f"        title: Text('{pg.title}', style: TextStyle(color: {_color(tc)})),",4)
+        else:
+            app.w(f"        title: Text('{pg.title}'),",4)
+        app.w("      ),",3)
+
+    # FAB
+    if fab:
+        icon = fab.get("icon","add")
+        lbl  = fab.get("label","")
+        act  = fab.get("action","").replace("'", "\\'")
+        loc  = _FAB_LOC.get(fab.get("position","bottomRight"))
+        if fab.get("showLabel", False):
+            app.w("      floatingActionButton: FloatingActionButton.extended(",3)
+            app.w(f"        onPressed: () => ScaffoldMessenger.of(context).showSnackBar(const SnackBar(content: Text('{act}'))),",4)
+            app.w(f"        icon: const Icon(Icons.{icon}),",4)
+            app.w(f"        label: const Text('{lbl}'),",4)
+            app.w("      ),",3)
+        else:
+            app.w("      floatingActionButton: FloatingActionButton(",3)
+            app.w(f"        onPressed: () => ScaffoldMessenger.of(context).showSnackBar(const SnackBar(content: Text('{act}'))),",4)
+            app.w(f"        child: const Icon(Icons.{icon}),",4)
+            app.w("      ),",3)
+        app.w(f"      floatingActionButtonLocation: {loc},",3)
+
+    # Body
+    app.w("      body: LayoutBuilder(",3)
+    app.w("        builder: (context, constraints) => SingleChildScrollView(",4)
+    app.w("          padding: const EdgeInsets.all(16),",5)
+    app.w("          child: Column(",5)
+    app.w("            children: [",6)
+    for w in pg.widgets:
+        _w2d(w, 8, app, memo)
+    app.w("            ],",6)
+    app.w("          ),",5)
+    app.w("        ),",4)
+    app.w("      ),",3)
+
+    # BottomNavigationBar
+    if bn := pg.bottom_nav:
+        app.w("      bottomNavigationBar: BottomNavigationBar(",3)
+        app.w(f"        currentIndex: {pg.nav_index},",4)
+        sel = _color(bn["selectedItemColor"])
+        uns = _color(bn["textColor"])
+        app.w(f"        selectedItemColor: const {sel},",4)
+        app.w(f"        unselectedItemColor: const {uns},",4)
+        app.w("        onTap: (i) {",4)
+        for i, item in enumerate(bn["items"]):
+            app.w(f"          if (i == {i}) Navigator.pushReplacementNamed(context, '{item['route']}');",5)
+        app.w("        },",4)
+        app.w("        items: const [",4)
+        for item in bn["items"]:
+            app.w(f"          BottomNavigationBarItem(icon: Icon(Icons.{item['icon']}), label: '{item['label']}'),",5)
+        app.w("        ],",4)
+        app.w("      ),",3)
+
+    app.w("    );",2)
+    app.w("  }")
+    app.w("}")
+    app.w()
+
+    # Subárboles repetidos extraídos como widgets privados
+    for name, block in memo.classes:
+        app.w(f"class {name} extends StatelessWidget {{")
+        app.w(f"  const {name}();")
+        app.w("  @override")
+        app.w("  Widget build(BuildContext context) {")
+        body = block[:-1] + [block[-1].rstrip(",") + ";"]
+        app.w(f"return {body[0]}", 2)
+        for l in body[1:]:
+            app.w(l, 2)
+        app.w("  }")
+        app.w("}")
+        app.w()
+
+def emit_app(app_ir: AppIR) -> str:
+    app = DW()
+    _emit_app_shell(app_ir, app, ["package:intl/intl.dart"] if app_ir.needs_intl else [])
+    for pg in app_ir.pages:
+        _emit_page(pg, app)
+    return str(app)
+
+# ─── Caché por página ───
+
+_page_cache: "OrderedDict[str, Tuple[str, bool]]" = OrderedDict()
+_page_lock = threading.Lock()
+
+_encode_str = json.encoder.encode_basestring      # el de json.dumps con ensure_ascii=False
+_SCALARS = {True: "true", False: "false", None: "null"}
+
+class _Punct(str):
+    """Puntuación ya serializada dentro de la pila de _canonical_json (no es un valor del JSON)."""
+    __slots__ = ()
+
+_COMMA = _Punct(",")
+
+def _canonical_json(value: Any) -> str:
+    """El mismo texto que json.dumps(sort_keys=True, separators=(",", ":"),
+    ensure_ascii=False), con pila explícita en vez de recursión."""
+    out: List[str] = []
+    # valores por serializar y, como _Punct, la puntuación ya lista
+    stack: List[Any] = [value]
+    while stack:
+        v = stack.pop()
+        t = type(v)
+        if t is str:
+            out.append(_encode_str(v))
+        elif t is _Punct:
+            out.append(v)
+        elif t is dict:
+            parts: List[Any] = []
+            sep = "{"
+            for k in sorted(v):
+                parts.append(_Punct(sep + _encode_str(k) + ":"))
+                parts.append(v[k])
+                sep = ","
+            stack.append(_Punct("}" if parts else "{}"))
+            stack.extend(reversed(parts))
+        elif t is list:
+            stack.append(_Punct("]"))
+            for i in range(len(v) - 1, 0, -1):
+                stack.append(v[i])
+                stack.append(_COMMA)
+            if v:
+                stack.append(v[0])
+            stack.append(_Punct("["))
+        elif v is None or t is bool:
+            out.append(_SCALARS[v])
+        else:
+            out.append(json.dumps(v))
+    return "".join(out)
+
+def _page_key(pg: Dict[str, Any], routes: List[str], shared_widgets: bool, snippets: bool) -> str:
+    # las rutas son lo único del nivel app que usa una página (índice del bottom nav)
+    value = [pg, routes, shared_widgets, snippets]
+    try:
+        raw = json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    except RecursionError:
+        # más profunda que el límite de recursión: el mismo texto, sin recursar
+        raw = _canonical_json(value)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _page_code(pg: Dict[str, Any], path: str, routes: List[str],
+               shared_widgets: bool = False, snippets: bool = False) -> Tuple[str, bool]:
+    """(clases Dart de la página, ¿usa intl?), desde caché si la página no cambió."""
+    key = _page_key(pg, routes, shared_widgets, snippets)
+    with _page_lock:
+        if (hit := _page_cache.get(key)) is not None:
+            _page_cache.move_to_end(key)
+            return hit
+    page = _compile_page(pg, path, routes, snippets)
+    dw = DW()
+    _emit_page(page, dw, shared_widgets)
+    val = (str(dw), page.needs_intl)
+    with _page_lock:
+        _page_cache[key] = val
+        while len(_page_cache) > PAGE_CACHE_SIZE:
+            _page_cache.popitem(last=False)
+    return val
+
+def clear_page_cache() -> None:
+    with _page_lock:
+        _page_cache.clear()
+
+def _page_file(name: str) -> str:
+    return re.sub(r"[^a-z0-9_]", "_", name.lower()) + ".dart"
+
+# ─── Build main.dart ───
+
+def build_main_dart(ui: Dict[str, Any], shared_widgets: bool = False, snippets: bool = False) -> str:
+    """Todo en un solo main.dart. snippets=True sólo para la copia de plan_hybrid."""
+    app_ir = _compile_app(ui)
+    pages = [_page_code(pg, f"$.pages[{i}]", app_ir.routes, shared_widgets, snippets) for i, pg in enumerate(_req(ui, "pages", "$", list))]
+    shell = DW()
+    _emit_app_shell(app_ir, shell, ["package:intl/intl.dart"] if any(intl for _, intl in pages) else [])
+    return "\n".join([str(shell)] + [code for code, _ in pages])
+
+def build_app_shell(name: str, primary: str, routes: List[str]) -> str:
+    """Sólo main() y el MaterialApp (tema + rutas); las clases de página las aporta quien llama."""
+    shell = DW()
+    _emit_app_shell(AppIR(name, primary, routes), shell, [])
+    return str(shell)
+
+def build_dart_files(ui: Dict[str, Any], shared_widgets: bool = False) -> Dict[str, str]:
+    """main.dart con MaterialApp + rutas y un lib/pages/<página>.dart por página.
+
+    Con shared_widgets=True los subárboles repetidos se emiten como clases
+    privadas `_<Página>SharedN` en el archivo de la página.
+    """
+    app_ir = _compile_app(ui)
+    files: Dict[str, str] = {}
+    for i, pg in enumerate(_req(ui, "pages", "$", list)):
+        code, intl = _page_code(pg, f"$.pages[{i}]", app_ir.routes, shared_widgets)
+        header = "import 'package:flutter/material.dart';\n"
+        if intl:
+            header += "import 'package:intl/intl.dart';\n"
+        files[f"lib/pages/{_page_file(pg['name'])}"] = header + "\n" + code
+    shell = DW()
+    _emit_app_shell(app_ir, shell, [f"pages/{p.rsplit('/', 1)[1]}" for p in files])
+    return {"lib/main.dart": str(shell), **files}
@@ -0,0 +1,327 @@
+"""
+ui_repair.py
+Validación y reparación local del UI JSON que devuelve el modelo, antes de
+cachearlo o devolverlo al frontend.
+
+1. Texto: si extract_json no encuentra un objeto válido se reparan localmente
+   los errores típicos (fences de markdown, comillas tipográficas, comas
+   colgantes, True/False/None, respuesta truncada por max_tokens).
+2. Estructura: el esquema compilado (ui_schema) junta todos los errores en una
+   pasada y, ya limpio, un dry-run del generador (compile_ui + emit_app) cubre
+   las reglas entre páginas. Cada UIValidationError se arregla en su ruta con
+   un default, una conversión de tipo o quitando el valor no soportado; los
+   tipos de widget desconocidos pasan a `container` y las opciones en string se
+   parten en lista.
+3. Lo que no se puede arreglar localmente se devuelve como `broken` (ruta + error)
+   para que quien llama re-pregunte al modelo sólo por ese subárbol.
+"""
+import copy, json, logging, re
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from core.metrics import Counter
+from services.json_stream import extract_json
+from services.prompts import prompt
+from services.scoped_edit import EditPathError, Step, enclosing_target, get_at, split_path
+from services.ui_compiler import SUPPORTED_WIDGETS, UIValidationError, compile_ui, emit_app
+from services.ui_schema import ui_schema_errors
+
+log = logging.getLogger(__name__)
+
+UI_REPAIRS = Counter("ui_repairs_total", "Reparaciones de UI JSON del modelo (syntax, local, reprompt, unrepaired)")
+
+# Rondas de arreglos locales por documento (cada una re-valida)
+MAX_LOCAL_FIXES = 200
+
+# ─────────── 1. Texto ───────────
+
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_QUOTES = str.maketrans({"“": '"', "”": '"', "„": '"', "‘": "'", "’": "'"})
+_WORD = re.compile(r"[A-Za-z_]+")
+
+
+def _drop_trailing_comma(out: List[str]) -> None:
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+def _close(text: str) -> str:
+    """Un pase sobre el objeto raíz: quita comas colgantes, traduce literales de
+    Python y cierra strings/llaves que quedaron abiertas."""
+    out: List[str] = []
+    stack: List[str] = []
+    in_str = esc = False
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if in_str:
+            out.append(c)
+            if esc:
+                esc = False
+            elif c == "\\":
+                esc = True
+            elif c == '"':
+                in_str = False
+            i += 1
+            continue
+        if c == '"':
+            in_str = True
+        elif c in "{[":
+            stack.append("}" if c == "{" else "]")
+        elif c in "}]":
+            _drop_trailing_comma(out)
+            if not stack:
+                break
+            out.append(stack.pop())
+            i += 1
+            if not stack:
+                break           # objeto raíz completo: lo que sigue es prosa
+            continue
+        elif c.isalpha() or c == "_":
+            word = _WORD.match(text, i).group()
+            out.append(_LITERALS.get(word, word))
+            i += len(word)
+            continue
+        out.append(c)
+        i += 1
+    if in_str:
+        if esc:
+            out.pop()
+        out.append('"')
+    _drop_trailing_comma(out)
+    out.extend(reversed(stack))
+    return "".join(out)
+
+def _commas(text: str) -> List[int]:
+    """Posiciones de las comas fuera de strings."""
+    found, in_str, esc = [], False, False
+    for i, c in enumerate(text):
+        if in_str:
+            if esc:
+                esc = False
+            elif c == "\\":
+                esc = True
+            elif c == '"':
+                in_str = False
+        elif c == '"':
+            in_str = True
+        elif c == ",":
+            found.append(i)
+    return found
+
+def repair_json_text(raw: str) -> Optional[str]:
+    """Objeto JSON reparado localmente, o None si no hay arreglo razonable."""
+    lines = [l for l in raw.translate(_QUOTES).splitlines() if not l.strip().startswith("```")]
+    text = "\n".join(lines)
+    start = text.find("{")
+    if start < 0:
+        return None
+    text = text[start:]
+    # truncado a mitad de un par clave/valor: recortar hasta la coma anterior
+    commas = _commas(text)
+    for _ in range(20):
+        candidate = _close(text)
+        try:
+            if isinstance(json.loads(candidate), dict):
+                return candidate
+        except ValueError:
+            pass
+        if not commas:
+            return None
+        text = text[:commas.pop()]
+    return None
+
+def model_json_text(raw: Optional[str]) -> str:
+    """Primer objeto JSON válido de la respuesta o, si no hay, el reparado localmente.
+    ValueError si no hay nada recuperable."""
+    try:
+        return extract_json(raw)
+    except (ValueError, TypeError):
+        pass
+    fixed = repair_json_text(raw or "")
+    if fixed is None:
+        raise ValueError("No se encontró un objeto JSON válido.")
+    UI_REPAIRS.inc(kind="syntax")
+    return fixed
+
+# ─────────── 2. Estructura ───────────
+
+@lru_cache(maxsize=None)
+def known_widget_types() -> FrozenSet[str]:
+    """Tipos que el generador soporta más los que documenta la guía de widgets."""
+    guide = set(re.findall(r'"type"\s*:\s*"(\w+)"', prompt("widget_guide").text))
+    return frozenset(SUPPORTED_WIDGETS | guide)
+
+_BUTTONS = {"cancel": {"text": "Cancelar"}, "confirm": {"text": "Aceptar"}}
+
+# Default por clave faltante (las que dependen del contexto van en _default())
+_DEFAULTS: Dict[str, Any] = {
+    "text": "", "label": "", "subtitle": "", "content": "",
+    "src": "https://via.placeholder.com/150",
+    "options": [], "items": [], "children": [], "widgets": [], "columns": [], "rows": [],
+    "color": "#000000", "route": "/", "selectedItemColor": "#2196F3", "textColor": "#757575",
+    "primary": "#2196F3", "theme": {"primary": "#2196F3"},
+    "table": {"columns": [], "rows": []},
+    "buttons": _BUTTONS, **_BUTTONS,
+    "dialog": {"title": "", "content": "", "buttons": _BUTTONS},
+}
+
+# La guía usa números en campos vecinos (x, fontSize): el modelo a veces los copia acá
+_SIZES = frozenset(("width", "height"))
+
+def _routes(doc: Dict[str, Any]) -> List[str]:
+    pages = doc.get("pages") if isinstance(doc.get("pages"), list) else []
+    return [f"/{p['name']}" for p in pages if isinstance(p, dict) and isinstance(p.get("name"), str)] or ["/home"]
+
+def _default(doc: Dict[str, Any], steps: List[Step], key: str) -> Any:
+    parent = steps[-2] if len(steps) >= 2 else None
+    obj = get_at(doc, steps) if steps else doc
+    if key == "routes":
+        return _routes(doc)
+    if key == "name":
+        if not steps:
+            return "FlutterApp"
+        return f"page{steps[-1]}" if parent == "pages" else "star"
+    if key == "title":
+        return str(obj.get("name", "")) if parent == "pages" else ""
+    if key == "icon":
+        return "home" if parent == "items" else "star"
+    if key == "type":
+        return "container"
+    if key in _DEFAULTS:
+        return copy.deepcopy(_DEFAULTS[key])
+    raise KeyError(key)
+
+def _coerce(value: Any, expected: str, key: str) -> Any:
+    if "list" in expected:
+        # un string suelto no es un widget: los children nunca se parten como las opciones
+        if isinstance(value, str) and key != "children":
+            return [s.strip() for s in value.split(",") if s.strip()]
+        if isinstance(value, dict):
+            return [value]
+        return copy.deepcopy(_DEFAULTS.get(key, []))
+    if key in _SIZES and isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"{value}px"
+    if "str" in expected and value is not None and not isinstance(value, (dict, list)):
+        return str(value)
+    raise KeyError(key)
+
+def _fix(doc: Dict[str, Any], err: UIValidationError) -> Optional[str]:
+    """Arregla `err` en `doc` (in place); descripción del arreglo o None si no es local."""
+    try:
+        steps = split_path(err.path)
+        if (m := re.fullmatch(r"falta '(\w+)'", err.msg)) is not None:
+            obj = get_at(doc, steps) if steps else doc
+            if not isinstance(obj, dict):
+                return None
+            obj[m.group(1)] = _default(doc, steps, m.group(1))
+            return f"{err.path}.{m.group(1)}: default"
+        if (m := re.fullmatch(r"se esperaba (.+)", err.msg)) is not None and steps:
+            obj, key = (get_at(doc, steps[:-1]) if len(steps) > 1 else doc), steps[-1]
+            obj[key] = _coerce(obj[key], m.group(1), key)
+            return f"{err.path}: convertido a {m.group(1)}"
+        if err.msg.startswith("valor no soportado") and steps:
+            obj = get_at(doc, steps[:-1])
+            del obj[steps[-1]]
+            return f"{err.path}: eliminado"
+        if (m := re.fullmatch(r"la ruta '(.+)' no está en routes", err.msg)) is not None and isinstance(doc.get("routes"), list):
+            doc["routes"].append(m.group(1))
+            return f"$.routes: agregada {m.group(1)}"
+        if err.path == "$.routes" and err.msg.startswith("debe tener al menos"):
+            doc["routes"] = _routes(doc)
+            return "$.routes: derivadas de las páginas"
+    except (EditPathError, KeyError, TypeError, IndexError):
+        return None
+    return None
+
+def _normalize(doc: Dict[str, Any]) -> List[str]:
+    """Pase previo sobre todos los widgets: tipos desconocidos, opciones en string, children sueltos."""
+    fixes: List[str] = []
+    known = known_widget_types()
+    pages = doc.get("pages") if isinstance(doc.get("pages"), list) else []
+    stack: List[Tuple[Any, str]] = []
+    for i, pg in enumerate(pages):
+        if isinstance(pg, dict) and isinstance(pg.get("widgets"), list):
+            stack.extend((w, f"$.pages[{i}].widgets[{j}]") for j, w in enumerate(pg["widgets"]))
+    while stack:
+        w, path = stack.pop()
+        if not isinstance(w, dict):
+            continue
+        if isinstance(w.get("type"), str) and w["type"] not in known:
+            fixes.append(f"{path}: tipo '{w['type']}' → container")
+            w["type"] = "container"
+        for key in ("options", "items"):
+            if isinstance(w.get(key), str):
+                w[key] = _coerce(w[key], "list", key)
+                fixes.append(f"{path}.{key}: string → lista")
+        if "children" in w and not isinstance(w["children"], list):
+            w["children"] = _coerce(w["children"], "list", "children")
+            fixes.append(f"{path}.children: → lista")
+        if isinstance(w.get("children"), list):
+            stack.extend((c, f"{path}.children[{j}]") for j, c in enumerate(w["children"]))
+    return fixes
+
+
+class RepairResult:
+    __slots__ = ("doc", "fixes", "broken", "valid")
+
+    def __init__(self, doc: Dict[str, Any], fixes: List[str],
+                 broken: Optional[Tuple[List[Step], str]] = None, valid: bool = True) -> None:
+        self.doc = doc
+        self.fixes = fixes
+        self.broken = broken        # (ruta de la página/widget a re-preguntar, error)
+        self.valid = valid
+
+
+def _errors(doc: Dict[str, Any]) -> List[UIValidationError]:
+    """Todos los errores de estructura; si no hay, el primero del dry-run del generador."""
+    errors = ui_schema_errors(doc)
+    if errors:
+        return errors
+    try:
+        emit_app(compile_ui(doc))
+    except UIValidationError as e:
+        return [e]
+    return []
+
+def _broken(doc: Dict[str, Any], fixes: List[str], err: UIValidationError) -> RepairResult:
+    try:
+        target = enclosing_target(split_path(err.path))
+    except EditPathError:
+        target = None
+    if target is None:
+        return RepairResult(doc, fixes, None, valid=False)
+    return RepairResult(doc, fixes, (target, f"{err.path}: {err.msg}"), valid=False)
+
+
+def repair_ui(doc: Dict[str, Any]) -> RepairResult:
+    """Valida `doc` contra el esquema y el generador arreglándolo en el lugar todo lo que se pueda."""
+    fixes = _normalize(doc)
+    for _ in range(MAX_LOCAL_FIXES):
+        try:
+            errors = _errors(doc)
+        except Exception:
+            # falla del emisor sin ruta (tamaños raros, etc.): no hay subárbol que re-preguntar
+            log.warning("UI JSON no generable y sin ruta de error", exc_info=True)
+            return RepairResult(doc, fixes, None, valid=False)
+        if not errors:
+            if fixes:
+                UI_REPAIRS.inc(len(fixes), kind="local")
+            return RepairResult(doc, fixes)
+        # los arreglos no mueven índices de listas: se aplican todos los de la ronda
+        before, unfixable, seen = len(fixes), None, set()
+        for err in errors:
+            # un valor puede fallar el tipo en dos reglas (común a widgets y propia del tipo)
+            key = err.path if err.msg.startswith("se esperaba") else f"{err.path}: {err.msg}"
+            if key in seen:
+                continue
+            seen.add(key)
+            if (fix := _fix(doc, err)) is not None:
+                fixes.append(fix)
+            elif unfixable is None:
+                unfixable = err
+        if len(fixes) == before:
+            return _broken(doc, fixes, unfixable)
+    return RepairResult(doc, fixes, None, valid=False)
+
@@ -0,0 +1,354 @@
+"""
+ui_schema.py
+JSON Schema del UI JSON (app → pages → widgets) y su validador, compilado una
+sola vez a closures al importar el módulo.
+
+El esquema se arma con las mismas tablas que usa ui_compiler (_REQUIRED,
+_KEY_TYPES, _MAIN, _CROSS), así no se desincroniza del generador. Cubre la
+estructura: claves obligatorias, tipos y valores enumerados. Lo que depende del
+documento entero (que la ruta de la bottomNavigationBar esté en routes) sigue
+en compile_ui.
+
+Sólo se implementa el subconjunto de JSON Schema que usa UI_SCHEMA (type,
+required, properties, items, minItems, contains, enum, const, $ref, allOf,
+if/then); una
+palabra clave desconocida falla al compilar, no se ignora. Un allOf de if/then
+sobre el mismo `type` se compila a un dict (un lookup por widget, no uno por
+regla). Los errores tienen la ruta y el mensaje de UIValidationError.
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.ui_compiler import _CROSS, _KEY_TYPES, _MAIN, _REQUIRED, UIValidationError
+
+# La ruta viaja como (padre, paso) y sólo se formatea si hay error
+Path = Any
+# Los $ref no se validan en el momento: se encolan en `pending` (pila explícita,
+# como _compile_page en ui_compiler) y la profundidad del documento no usa la
+# pila de Python
+Pending = List[Tuple[Any, Any, Path]]
+Check = Callable[[Any, Path, List[UIValidationError], Pending], None]
+
+# Tope de errores que se devuelven por documento
+MAX_ERRORS = 50
+
+# ─────────── Esquema ───────────
+
+_JSON_TYPES = {list: "array", dict: "object", str: "string"}
+
+# Opcionales a los que el emisor aplica métodos de string (_parse_size, _color, .replace)
+_OPT_STR = {"type": ["string", "null"]}
+_STR = {"type": "string"}
+
+# El title de la página sólo lo usa el appBar de nivel superior
+_HAS_APP_BAR = {
+    "required": ["widgets"],
+    "properties": {"widgets": {"contains": {
+        "type": "object", "required": ["type"], "properties": {"type": {"const": "appBar"}},
+    }}},
+}
+
+# Variables de estado: el nombre sale de label.lower()
+_STATEFUL = {"properties": {"label": _STR}}
+
+# falsy = sin alineación (el generador sólo valida si viene algo)
+_ALIGN = {
+    "mainAxisAlignment": {"enum": [*_MAIN, "", None]},
+    "crossAxisAlignment": {"enum": [*_CROSS, "", None]},
+}
+
+_EXTRA: Dict[str, Dict[str, Any]] = {
+    "row": {"properties": _ALIGN}, "column": {"properties": _ALIGN}, "container": {"properties": _ALIGN},
+    "checkbox": _STATEFUL, "switch": _STATEFUL, "radioGroup": _STATEFUL, "dropdown": _STATEFUL,
+    # la altura del appBar se lee con .get("height", "").endswith: null no vale
+    "appBar": {"properties": {"height": _STR}},
+    "listTile": {"properties": {"icon": {"type": ["object", "null"], "required": ["name", "color"]}}},
+    "dataTable": {"properties": {"table": {
+        "required": ["columns", "rows"],
+        "properties": {"columns": {"type": "array"}, "rows": {"type": "array"}},
+    }}},
+    "alertDialog": {"properties": {"dialog": {
+        "required": ["title", "content", "buttons"],
+        "properties": {"buttons": {
+            "type": "object",
+            "required": ["cancel", "confirm"],
+            "properties": {"cancel": {"$ref": "#/$defs/dialogButton"}, "confirm": {"$ref": "#/$defs/dialogButton"}},
+        }},
+    }}},
+    "bottomNavigationBar": {
+        "required": ["selectedItemColor", "textColor", "items"],
+        "properties": {
+            "selectedItemColor": _STR, "textColor": _STR,
+            "items": {"type": "array", "items": {"type": "object", "required": ["icon", "label", "route"]}},
+        },
+    },
+}
+
+def _json_type(typ: Any) -> Any:
+    if isinstance(typ, tuple):
+        return [_JSON_TYPES[t] for t in typ]
+    return _JSON_TYPES[typ]
+
+def _widget_rule(kind: str) -> Dict[str, Any]:
+    keys = _REQUIRED.get(kind, ())
+    then: Dict[str, Any] = {
+        "required": list(keys),
+        "properties": {k: {"type": _json_type(_KEY_TYPES[k])} for k in keys if k in _KEY_TYPES},
+    }
+    for key, value in _EXTRA.get(kind, {}).items():
+        if key == "required":
+            then["required"] += value
+        else:
+            for prop, sub in value.items():
+                then["properties"][prop] = {**then["properties"].get(prop, {}), **sub}
+    return {"if": {"properties": {"type": {"const": kind}}}, "then": then}
+
+UI_SCHEMA: Dict[str, Any] = {
+    "$schema": "https://json-schema.org/draft/2020-12/schema",
+    "title": "UI JSON de una app Flutter",
+    "type": "object",
+    "required": ["theme", "routes", "name", "pages"],
+    "properties": {
+        "name": {"type": "string"},
+        "theme": {"type": "object", "required": ["primary"], "properties": {"primary": {"type": "string"}}},
+        "routes": {"type": "array", "minItems": 1, "items": {"type": "string"}},
+        "pages": {"type": "array", "items": {"$ref": "#/$defs/page"}},
+    },
+    "$defs": {
+        "page": {
+            "type": "object",
+            "required": ["name", "widgets"],
+            "properties": {
+                "name": {"type": "string"},
+                "widgets": {"type": "array", "items": {"$ref": "#/$defs/widget"}},
+                "background": _OPT_STR,
+                "fab": {"type": ["object", "null"], "properties": {"action": _STR}},
+            },
+            "if": _HAS_APP_BAR, "then": {"required": ["title"]},
+        },
+        "widget": {
+            "type": "object",
+            "required": ["type"],
+            "properties": {
+                "type": {"type": "string"},
+                "children": {"items": {"$ref": "#/$defs/widget"}},
+                "width": _OPT_STR, "height": _OPT_STR,
+                "backgroundColor": _OPT_STR, "textColor": _OPT_STR,
+            },
+            "allOf": [_widget_rule(kind) for kind in sorted({*_REQUIRED, *_EXTRA})],
+        },
+        "dialogButton": {"type": "object", "required": ["text"]},
+    },
+}
+
+# ─────────── Compilador ───────────
+
+_TYPE_NAMES = {"string": "str", "array": "list", "object": "dict", "integer": "int",
+               "number": "float", "boolean": "bool", "null": "None"}
+
+_PY_TYPES = {"string": (str,), "array": (list,), "object": (dict,), "integer": (int,),
+             "number": (int, float), "boolean": (bool,), "null": (type(None),)}
+
+# Anotaciones: no validan nada
+_IGNORED = frozenset(("$schema", "$id", "$defs", "title", "description"))
+
+_KEYWORDS = frozenset(("type", "required", "properties", "items", "minItems", "contains", "enum",
+                       "const", "$ref", "allOf", "if", "then"))
+
+def _fmt(path: Path) -> str:
+    steps: List[Any] = []
+    while isinstance(path, tuple):
+        path, step = path
+        steps.append(step)
+    return path + "".join(f"[{s}]" if isinstance(s, int) else f".{s}" for s in reversed(steps))
+
+def _error(path: Path, msg: str) -> UIValidationError:
+    return UIValidationError(_fmt(path), msg)
+
+def _unsupported(v: Any) -> str:
+    return f"valor no soportado '{v}'"
+
+def _in(v: Any, values: frozenset) -> bool:
+    try:
+        return v in values
+    except TypeError:       # dict/list: nunca están en un enum de escalares
+        return False
+
+def _py_types(types: List[str]) -> Tuple[type, ...]:
+    return tuple(t for name in types for t in _PY_TYPES[name])
+
+def _run(check: Check, v: Any, path: Path, errs: List[UIValidationError]) -> None:
+    pending: Pending = [(check, v, path)]
+    while pending:
+        check, v, path = pending.pop()
+        mark = len(pending)
+        check(v, path, errs, pending)
+        # lo que encoló este nodo sale en orden de documento, antes que sus hermanos
+        if len(pending) > mark + 1:
+            pending[mark:] = pending[mark:][::-1]
+
+
+class _Compiler:
+    def __init__(self, root: Dict[str, Any]) -> None:
+        self.root = root
+        self.refs: Dict[str, Check] = {}
+
+    def ref(self, ref: str) -> Check:
+        if ref not in self.refs:
+            # el esquema puede referirse a sí mismo (children → widget): el destino
+            # se compila después y el check sólo lo encola
+            cell: List[Check] = []
+            def check_ref(v, path, errs, pending):
+                pending.append((cell[0], v, path))
+            self.refs[ref] = check_ref
+            node: Any = self.root
+            for part in ref.lstrip("#/").split("/"):
+                node = node[part]
+            cell.append(self.compile(node))
+        return self.refs[ref]
+
+    def dispatch(self, rules: List[Dict[str, Any]]) -> Optional[Check]:
+        """allOf de `if: {properties: {P: {const: X}}}, then: ...` con la misma P → lookup."""
+        keys, table = set(), {}
+        for rule in rules:
+            cond = rule.get("if", {})
+            if set(rule) != {"if", "then"} or set(cond) != {"properties"} or len(cond["properties"]) != 1:
+                return None
+            (key, sub), = cond["properties"].items()
+            if set(sub) != {"const"}:
+                return None
+            keys.add(key)
+            table[sub["const"]] = self.compile(rule["then"])
+        if len(keys) != 1:
+            return None
+        key = keys.pop()
+
+        def check_dispatch(v, path, errs, pending):
+            if isinstance(v, dict):
+                kind = v.get(key)
+                if isinstance(kind, str) and kind in table:
+                    table[kind](v, path, errs, pending)
+        return check_dispatch
+
+    def compile(self, schema: Dict[str, Any]) -> Check:
+        unknown = set(schema) - _IGNORED - _KEYWORDS
+        if unknown:
+            raise ValueError(f"palabras clave no soportadas: {sorted(unknown)}")
+
+        checks: List[Check] = []
+        if "$ref" in schema:
+            checks.append(self.ref(schema["$ref"]))
+
+        required = tuple(schema.get("required", ()))
+        props = tuple((k, self.compile(sub)) for k, sub in schema.get("properties", {}).items())
+        if required or props:
+            def check_object(v, path, errs, pending):
+                if isinstance(v, dict):
+                    for k in required:
+                        if k not in v:
+                            errs.append(_error(path, f"falta '{k}'"))
+                    for k, c in props:
+                        if k in v:
+                            c(v[k], (path, k), errs, pending)
+            checks.append(check_object)
+
+        if "minItems" in schema:
+            min_items = schema["minItems"]
+            min_msg = "debe tener al menos un elemento" if min_items == 1 else f"debe tener al menos {min_items} elementos"
+            def check_min(v, path, errs, pending):
+                if isinstance(v, list) and len(v) < min_items:
+                    errs.append(_error(path, min_msg))
+            checks.append(check_min)
+
+        if "items" in schema:
+            item = self.compile(schema["items"])
+            def check_items(v, path, errs, pending):
+                if isinstance(v, list):
+                    for i, x in enumerate(v):
+                        item(x, (path, i), errs, pending)
+            checks.append(check_items)
+
+        if "contains" in schema:
+            match = self.compile(schema["contains"])
+            def check_contains(v, path, errs, pending):
+                # cada elemento se resuelve entero, como la condición de un if
+                if isinstance(v, list):
+                    for x in v:
+                        scratch: List[UIValidationError] = []
+                        _run(match, x, path, scratch)
+                        if not scratch:
+                            return
+                    errs.append(_error(path, "ningún elemento cumple el esquema"))
+            checks.append(check_contains)
+
+        if "enum" in schema:
+            values = frozenset(schema["enum"])
+            def check_enum(v, path, errs, pending):
+                if not _in(v, values):
+                    errs.append(_error(path, _unsupported(v)))
+            checks.append(check_enum)
+
+        if "const" in schema:
+            const = schema["const"]
+            def check_const(v, path, errs, pending):
+                if v != const:
+                    errs.append(_error(path, _unsupported(v)))
+            checks.append(check_const)
+
+        if "allOf" in schema:
+            fast = self.dispatch(schema["allOf"])
+            checks.extend([fast] if fast else [self.compile(sub) for sub in schema["allOf"]])
+
+        if "if" in schema:
+            cond, then = self.compile(schema["if"]), self.compile(schema.get("then", {}))
+            def check_if(v, path, errs, pending):
+                # la condición se resuelve entera antes de decidir (con sus propios $ref)
+                scratch: List[UIValidationError] = []
+                _run(cond, v, path, scratch)
+                if not scratch:
+                    then(v, path, errs, pending)
+            checks.append(check_if)
+
+        inner = tuple(checks)
+        if "type" in schema:
+            types = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+            py = _py_types(types)
+            # bool es subclase de int: True no cuenta como integer/number
+            no_bool = int in py and bool not in py
+            type_msg = "se esperaba " + " o ".join(_TYPE_NAMES[t] for t in types)
+            # un valor del tipo equivocado no se sigue mirando por dentro
+            def check_typed(v, path, errs, pending):
+                if not isinstance(v, py) or (no_bool and isinstance(v, bool)):
+                    errs.append(_error(path, type_msg))
+                    return
+                for c in inner:
+                    c(v, path, errs, pending)
+            return check_typed
+
+        if len(inner) == 1:
+            return inner[0]
+        def check_all(v, path, errs, pending):
+            for c in inner:
+                c(v, path, errs, pending)
+        return check_all
+
+
+_compiler = _Compiler(UI_SCHEMA)
+_VALIDATORS: Dict[str, Check] = {
+    "app": _compiler.compile(UI_SCHEMA),
+    "page": _compiler.ref("#/$defs/page"),
+    "widget": _compiler.ref("#/$defs/widget"),
+}
+
+# ─────────── API ───────────
+
+def ui_schema_errors(doc: Any, node: str = "app", path: str = "$") -> List[UIValidationError]:
+    """Errores de estructura de `doc` (una app, o una "page"/"widget" suelta)."""
+    errs: List[UIValidationError] = []
+    _run(_VALIDATORS[node], doc, path, errs)
+    return errs[:MAX_ERRORS]
+
+def validate_ui(doc: Any) -> None:
+    """UIValidationError con el primer error de estructura, si hay alguno."""
+    errs = ui_schema_errors(doc)
+    if errs:
+        raise errs[0]
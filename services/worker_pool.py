@@ -0,0 +1,94 @@
+"""
+worker_pool.py
+Pool acotado (hilos o procesos) para el trabajo de CPU/disco de las exportaciones
+(codegen + compresión), para no bloquear el event loop de uvicorn.
+
+Si ya hay `workers + queue_max` tareas en curso, run() falla de inmediato con
+PoolSaturated en vez de encolar sin límite. Una tarea cuenta hasta que termina
+en el worker, aunque quien la esperaba se haya cancelado.
+"""
+import asyncio, threading, time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from core.config import settings
+from core.metrics import Counter, Gauge, Histogram
+
+POOL_QUEUE_DEPTH = Gauge("export_pool_queue_depth", "Tareas esperando un worker libre")
+POOL_IN_FLIGHT = Gauge("export_pool_in_flight", "Tareas aceptadas (en cola + ejecutándose)")
+POOL_WAIT = Histogram("export_pool_wait_seconds", "Tiempo en cola antes de empezar a ejecutarse")
+POOL_RUN = Histogram("export_pool_run_seconds", "Tiempo de ejecución en el worker")
+POOL_REJECTED = Counter("export_pool_rejected_total", "Tareas rechazadas por pool lleno")
+
+
+class PoolSaturated(Exception):
+    def __init__(self, retry_after: int) -> None:
+        super().__init__("Export pool saturated")
+        self.retry_after = retry_after
+
+
+def _timed_call(fn: Callable[..., Any], *args: Any) -> tuple:
+    # time.time() y no perf_counter: debe ser comparable entre procesos
+    started = time.time()
+    return started, fn(*args), time.time() - started
+
+
+class WorkerPool:
+    def __init__(self, kind: str, workers: int, queue_max: int, retry_after: int) -> None:
+        self.kind = kind
+        self.workers = workers
+        self.queue_max = queue_max
+        self.retry_after = retry_after
+        self._pending = 0
+        self._lock = threading.Lock()     # _release corre en el thread que completa la tarea
+        self._executor: Optional[Executor] = None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            cls = ProcessPoolExecutor if self.kind == "process" else ThreadPoolExecutor
+            self._executor = cls(max_workers=self.workers)
+        return self._executor
+
+    def _update_gauges(self) -> None:
+        POOL_IN_FLIGHT.set(self._pending)
+        POOL_QUEUE_DEPTH.set(max(0, self._pending - self.workers))
+
+    def _release(self, _future: Optional[Future] = None) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._update_gauges()
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            if self._pending >= self.workers + self.queue_max:
+                POOL_REJECTED.inc()
+                raise PoolSaturated(self.retry_after)
+            self._pending += 1
+            self._update_gauges()
+        submitted = time.time()
+        try:
+            future = self.executor.submit(_timed_call, fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        # se libera cuando el worker termina (o la tarea se cancela antes de empezar), no
+        # cuando deja de esperarla el awaiter: cancelarlo no frena una tarea ya en ejecución
+        future.add_done_callback(self._release)
+        started, result, elapsed = await asyncio.wrap_future(future)
+        POOL_WAIT.observe(max(0.0, started - submitted))
+        POOL_RUN.observe(elapsed)
+        return result
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+export_pool = WorkerPool(
+    settings.export_pool_kind,
+    settings.export_pool_workers,
+    settings.export_pool_queue,
+    settings.export_pool_retry_after,
+)
@@ -0,0 +1,71 @@
+"""
+zip_stream.py
+Escritor ZIP mínimo que acepta entradas ya comprimidas y las copia tal cual.
+
+zipfile no permite reutilizar datos DEFLATE previamente calculados, así que el
+skeleton se comprime una vez (prepare_entry) y cada exportación sólo concatena
+cabeceras + bytes. Sin ZIP64: pensado para proyectos de unos pocos MB.
+"""
+import struct, zlib
+from typing import Iterable, Iterator, Optional
+
+STORED, DEFLATED = 0, 8
+
+# Formatos ya comprimidos: DEFLATE no gana nada, se guardan tal cual
+STORE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".webp", ".ico", ".jar", ".zip", ".gz")
+
+# 1980-01-01 00:00:00 en formato DOS (hora, fecha)
+_DOS_TIME, _DOS_DATE = 0, (1 << 5) | 1
+
+_FILE_ATTR = 0o100644 << 16
+_DIR_ATTR = (0o40755 << 16) | 0x10
+
+
+class ZipEntry:
+    __slots__ = ("name", "method", "crc", "size", "data", "external_attr")
+
+    def __init__(self, name: str, method: int, crc: int, size: int, data: bytes, external_attr: int) -> None:
+        self.name = name
+        self.method = method
+        self.crc = crc
+        self.size = size
+        self.data = data
+        self.external_attr = external_attr
+
+
+def prepare_entry(name: str, content: Optional[bytes], level: int = 6) -> ZipEntry:
+    """Comprime (o no) una entrada; `content=None` es un directorio."""
+    if content is None:
+        return ZipEntry(name, STORED, 0, 0, b"", _DIR_ATTR)
+    crc = zlib.crc32(content)
+    if not name.lower().endswith(STORE_EXTENSIONS):
+        co = zlib.compressobj(level, zlib.DEFLATED, -15)
+        packed = co.compress(content) + co.flush()
+        if len(packed) < len(content):
+            return ZipEntry(name, DEFLATED, crc, len(content), packed, _FILE_ATTR)
+    return ZipEntry(name, STORED, crc, len(content), content, _FILE_ATTR)
+
+
+def iter_zip(entries: Iterable[ZipEntry]) -> Iterator[bytes]:
+    """Emite el archivo ZIP entrada por entrada y el directorio central al final."""
+    central = []
+    offset = 0
+    for e in entries:
+        name = e.name.encode("utf-8")
+        flags = 0 if e.name.isascii() else 0x800
+        local = struct.pack(
+            "<IHHHHHIIIHH", 0x04034B50, 20, flags, e.method, _DOS_TIME, _DOS_DATE,
+            e.crc, len(e.data), e.size, len(name), 0,
+        )
+        central.append(struct.pack(
+            "<IHHHHHHIIIHHHHHII", 0x02014B50, (3 << 8) | 20, 20, flags, e.method,
+            _DOS_TIME, _DOS_DATE, e.crc, len(e.data), e.size, len(name), 0, 0, 0, 0,
+            e.external_attr, offset,
+        ) + name)
+        yield local + name + e.data
+        offset += len(local) + len(name) + len(e.data)
+
+    cd = b"".join(central)
+    yield cd + struct.pack(
+        "<IHHHHIIH", 0x06054B50, 0, 0, len(central), len(central), len(cd), offset, 0,
+    )
@@ -0,0 +1,18 @@
+import os, sys
+from pathlib import Path
+
+import pytest
+
+# core.config exige estas variables aunque los tests no usen base ni OpenAI reales
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("OPENAI_API_KEY", "offline")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_openai import FakeOpenAI
+
+
+@pytest.fixture(scope="session")
+def server():
+    fake = FakeOpenAI()
+    yield fake
+    fake.server.shutdown()
@@ -0,0 +1,63 @@
+"""
+Servidor OpenAI falso para los tests: responde chat.completions con un guion de
+códigos de estado, headers y demoras.
+"""
+import json, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+# (status, headers, segundos antes de responder)
+Reply = Tuple[int, Dict[str, str], float]
+
+
+def _completion(content: str) -> Dict:
+    return {
+        "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": "gpt-4o",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+    }
+
+
+class FakeOpenAI:
+    """Responde cada POST con la siguiente respuesta del guion (200 con `content` cuando se acaba)."""
+
+    def __init__(self) -> None:
+        self.script: List[Reply] = []
+        self.content = "ok"
+        self.hits = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with fake._lock:
+                    fake.hits += 1
+                    status, headers, delay = fake.script.pop(0) if fake.script else (200, {}, 0.0)
+                time.sleep(delay)
+                payload = _completion(fake.content) if status == 200 else {"error": {"message": f"fake {status}"}}
+                body = json.dumps(payload).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    for k, v in headers.items():
+                        self.send_header(k, v)
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:
+                    pass    # el cliente ya cortó por timeout
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def reset(self, *replies: Reply, content: str = "ok") -> None:
+        self.script, self.hits, self.content = list(replies), 0, content
+
+
+def reply(status: int, headers: Optional[Dict[str, str]] = None, delay: float = 0.0) -> Reply:
+    return status, headers or {}, delay
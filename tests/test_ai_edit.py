@@ -0,0 +1,142 @@
+"""
+POST /projects/projects/{id}/ai-edit contra el servidor OpenAI falso: edición
+guardada, respuestas inválidas del modelo y errores del upstream.
+"""
+import json, uuid
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from openai import AsyncOpenAI
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import main
+import models.user, models.project, models.user_project_access
+from core import openai_client
+from core.config import settings
+from core.database import Base
+from core.openai_client import CircuitBreaker
+from core.security import create_access_token
+from fake_openai import reply
+from models.project import Project
+from models.user import User
+from models.user_project_access import UserProjectAccess
+from routers.project import get_db
+
+UI = {
+    "name": "App", "theme": {"primary": "#2196F3"}, "routes": ["/home"],
+    "pages": [{"name": "home", "title": "Home", "widgets": [{"type": "text", "text": "hola"}]}],
+}
+WIDGET = "$.pages[0].widgets[0]"
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    # archivo y no :memory: — el endpoint usa la sesión desde otro thread
+    engine = create_engine(f"sqlite:///{tmp_path / 'ai_edit.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    main.app.dependency_overrides[get_db] = override
+    yield factory
+    main.app.dependency_overrides.pop(get_db, None)
+    engine.dispose()
+
+@pytest.fixture
+def project(session_factory):
+    db = session_factory()
+    user = User(username="ana", email="ana@example.com", password="x")
+    db.add(user)
+    db.flush()
+    row = Project(name="p", owner_id=user.id, data=UI)
+    db.add(row)
+    db.flush()
+    db.add(UserProjectAccess(user_id=user.id, project_id=row.id))
+    db.commit()
+    ids = row.id, user.id
+    db.close()
+    return ids
+
+@pytest.fixture
+def fake(server, monkeypatch):
+    server.reset()
+    monkeypatch.setattr(settings, "openai_max_retries", 0)
+    monkeypatch.setattr(openai_client, "breaker", CircuitBreaker(3, 30))
+    monkeypatch.setattr(openai_client, "client", AsyncOpenAI(
+        api_key="x", base_url=server.url, max_retries=0, timeout=httpx.Timeout(0.3)))
+    return server
+
+
+def ai_edit(project, instruction: str = "cambia el texto", path: str = WIDGET) -> httpx.Response:
+    project_id, user_id = project
+    token = create_access_token({"sub": str(user_id)})
+    return TestClient(main.app).post(
+        f"/projects/projects/{project_id}/ai-edit",
+        json={"path": path, "instruction": instruction},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+def stored(session_factory, project) -> dict:
+    db = session_factory()
+    try:
+        return db.get(Project, project[0]).data
+    finally:
+        db.close()
+
+# ─────────── Edición ───────────
+
+def test_saves_the_edited_widget(fake, project, session_factory):
+    fake.reset(content='```json\n{"type": "text", "text": "chau"}\n```')
+    response = ai_edit(project)
+    assert response.status_code == 200
+    assert response.json()["data"]["pages"][0]["widgets"] == [{"type": "text", "text": "chau"}]
+    assert stored(session_factory, project)["pages"][0]["widgets"][0]["text"] == "chau"
+
+def test_non_object_answer_is_400(fake, project, session_factory):
+    fake.reset(content="[1, 2]")
+    assert ai_edit(project).status_code == 400
+    assert stored(session_factory, project) == UI
+
+def test_schema_error_is_422_with_path(fake, project, session_factory):
+    fake.reset(content=json.dumps({"type": "text", "text": "x", "width": 100}))
+    response = ai_edit(project)
+    assert response.status_code == 422
+    assert response.json()["detail"] == {"path": f"{WIDGET}.width", "error": "se esperaba str o None"}
+    assert stored(session_factory, project) == UI
+
+# ─────────── Errores del upstream ───────────
+
+@pytest.mark.parametrize("status", [400, 500])
+def test_upstream_status_error_is_502(fake, project, session_factory, status):
+    fake.reset(reply(status))
+    assert ai_edit(project).status_code == 502
+    assert stored(session_factory, project) == UI
+
+def test_upstream_timeout_is_503(fake, project):
+    fake.reset(reply(200, delay=0.6))
+    assert ai_edit(project).status_code == 503
+
+def test_rate_limit_is_503(fake, project):
+    fake.reset(reply(429))
+    assert ai_edit(project).status_code == 503
+
+def test_open_breaker_is_503_with_retry_after(fake, project):
+    fake.reset(*[reply(500)] * 3)
+    for _ in range(3):
+        assert ai_edit(project).status_code == 502
+    response = ai_edit(project)
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    assert fake.hits == 3
+
+def test_unknown_project_is_404_without_calling_the_model(fake, project):
+    assert ai_edit((uuid.uuid4(), project[1])).status_code == 404
+    assert fake.hits == 0
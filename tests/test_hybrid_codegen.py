@@ -0,0 +1,34 @@
+"""
+Marcadores del modo híbrido: sólo la copia de plan_hybrid inyecta código Dart.
+"""
+from services.hybrid_codegen import plan_hybrid
+from services.ui_compiler import SNIPPET_TYPE, build_main_dart, compile_ui
+from services.ui_schema import ui_schema_errors
+
+
+def app(*widgets) -> dict:
+    return {
+        "name": "App", "theme": {"primary": "#2196F3"}, "routes": ["/home"],
+        "pages": [{"name": "home", "title": "Home", "widgets": list(widgets)}],
+    }
+
+
+def test_client_snippet_is_not_injected():
+    ui = app({"type": SNIPPET_TYPE, "code": "evil()"})
+    assert "evil()" not in build_main_dart(ui)
+    assert "Container()," in build_main_dart(ui)
+    assert compile_ui(ui).pages[0].widgets[0].code is None
+
+def test_client_snippet_is_not_in_the_schema():
+    assert not ui_schema_errors({"type": SNIPPET_TYPE, "code": 1}, "widget")
+
+def test_hybrid_markers_are_injected():
+    ui = app({"type": "text", "text": "hola"}, {"type": "carousel", "items": [1, 2]})
+    plan = plan_hybrid(ui)
+    (key,) = plan.snippets
+    plan.fill({key: "CarouselView(itemExtent: 200, children: [])"})
+    code = build_main_dart(plan.ui, snippets=True)
+    assert "CarouselView(itemExtent: 200, children: [])," in code
+    assert "Text('hola'" in code
+    # la misma copia sin el flag no inyecta nada
+    assert "CarouselView" not in build_main_dart(plan.ui)
@@ -0,0 +1,39 @@
+"""
+Preprocesado de capturas para visión: orientación EXIF y re-encode sin metadatos.
+"""
+import io
+
+import pytest
+from PIL import Image
+
+from core.config import settings
+from services.image_prep import _prepare
+
+ORIENTATION, MAKE = 0x0112, 0x010F
+
+
+def photo(fmt: str, orientation: int = 1, **save) -> bytes:
+    exif = Image.Exif()
+    exif[ORIENTATION] = orientation
+    exif[MAKE] = "Cámara"
+    buf = io.BytesIO()
+    Image.effect_noise((120, 60), 64).convert("RGB").save(buf, fmt, exif=exif.tobytes(), **save)
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize("fmt", ["JPEG", "PNG"])
+def test_exif_orientation_is_applied(fmt):
+    prepared = _prepare(photo(fmt, orientation=6), f"image/{fmt.lower()}")
+    assert prepared.size == prepared.original_size == (60, 120)
+    assert Image.open(io.BytesIO(prepared.data)).size == (60, 120)
+
+@pytest.mark.parametrize("out_fmt", ["jpeg", "png", "webp"])
+def test_metadata_is_always_stripped(monkeypatch, out_fmt):
+    monkeypatch.setattr(settings, "vision_format", out_fmt)
+    # JPEG de baja calidad: el re-encode pesa más y aun así es lo que se manda
+    data = photo("JPEG", quality=20)
+    prepared = _prepare(data, "image/jpeg")
+    assert prepared.data != data
+    out = Image.open(io.BytesIO(prepared.data))
+    assert not out.getexif()
+    assert "icc_profile" not in out.info and "exif" not in out.info
@@ -0,0 +1,69 @@
+"""
+JsonStreamExtractor: valores y páginas completos en cuanto se cierran, con
+strings y escapes que contienen llaves y comillas, partidos en cualquier punto.
+"""
+import json
+
+import pytest
+
+from services.json_stream import JsonStreamExtractor, extract_json, first_valid
+
+TRICKY = {
+    "label": "llaves } y { dentro",
+    "quote": 'dice "hola" \\ y sigue',
+    "tail": "termina en barra \\",
+    "list": ["]", "[", "}{"],
+    "unicode": "ñandú é 😀",
+}
+
+
+def feed_all(ex: JsonStreamExtractor, text: str, size: int) -> list:
+    out = []
+    for i in range(0, len(text), size):
+        out += ex.feed(text[i:i + size])
+    return out
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_strings_and_escapes_at_any_split(size):
+    text = json.dumps(TRICKY, ensure_ascii=False)
+    raw = f"Aquí va {{no es JSON}} y luego:\n```json\n{text}\n```\nListo."
+    ex = JsonStreamExtractor(roots="{")
+    out = feed_all(ex, raw, size)
+    assert [kind for kind, _ in out] == ["value", "value"]
+    assert json.loads(first_valid(ex.values)) == TRICKY
+
+def test_escaped_backslash_closes_the_string():
+    # "a\\" termina en la segunda comilla: la llave siguiente sí cierra el objeto
+    ex = JsonStreamExtractor()
+    assert ex.feed('{"a": "x\\\\"} resto') == [("value", '{"a": "x\\\\"}')]
+
+def test_escape_split_between_chunks():
+    ex = JsonStreamExtractor()
+    assert ex.feed('{"a": "x\\') == []
+    assert ex.feed('"}"}') == [("value", '{"a": "x\\"}"}')]
+
+def test_several_top_level_values():
+    ex = JsonStreamExtractor()
+    assert [v for _, v in ex.feed('[1] texto {"b": [2]} [')] == ["[1]", '{"b": [2]}']
+    assert ex.feed("3]") == [("value", "[3]")]
+
+def test_pages_are_emitted_before_the_root_closes():
+    pages = [{"name": "home", "widgets": [{"type": "text", "text": "} ]"}]},
+             {"name": "otra", "pages": [{"no": "es página"}]}]
+    text = json.dumps({"name": "App", "pages": pages, "routes": ["/home"]})
+    ex = JsonStreamExtractor(roots="{", pages=True)
+    cut = text.index('"routes"')
+    first = ex.feed(text[:cut])
+    assert [json.loads(v) for kind, v in first if kind == "page"] == pages
+    assert all(kind == "page" for kind, _ in first)
+    assert ex.feed(text[cut:]) == [("value", text)]
+
+def test_pages_only_from_the_root_key():
+    text = json.dumps({"meta": {"pages": [{"a": 1}]}, "label": "pages", "x": [{"b": 2}]})
+    ex = JsonStreamExtractor(roots="{", pages=True)
+    assert ex.feed(text) == [("value", text)]
+
+def test_extract_json_without_a_valid_object():
+    with pytest.raises(ValueError):
+        extract_json("sin JSON {ejemplo} aquí")
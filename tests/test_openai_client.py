@@ -0,0 +1,126 @@
+"""
+Política de resiliencia de core/openai_client contra un servidor OpenAI falso
+local: reintentos, Retry-After / retry-after-ms, timeouts y circuit breaker.
+"""
+import asyncio, time
+
+import httpx
+import openai
+import pytest
+from openai import AsyncOpenAI
+
+from core import openai_client
+from core.config import settings
+from core.openai_client import CircuitBreaker, UpstreamUnavailable
+from fake_openai import FakeOpenAI, reply
+
+
+@pytest.fixture
+def fake(server, monkeypatch):
+    server.reset()
+    monkeypatch.setattr(settings, "openai_max_retries", 3)
+    monkeypatch.setattr(settings, "openai_backoff_base", 0.01)
+    monkeypatch.setattr(settings, "openai_backoff_max", 2)
+    monkeypatch.setattr(openai_client, "breaker", CircuitBreaker(3, 0.3))
+    return server
+
+
+def complete(fake: FakeOpenAI, timeout: float = 2.0) -> str:
+    async def run() -> str:
+        async with AsyncOpenAI(api_key="x", base_url=fake.url, max_retries=0,
+                               timeout=httpx.Timeout(timeout)) as client:
+            response = await openai_client.call(lambda: client.chat.completions.create(
+                model="gpt-4o", messages=[{"role": "user", "content": "hola"}]))
+            return response.choices[0].message.content
+    return asyncio.run(run())
+
+# ─────────── Reintentos ───────────
+
+def test_retries_server_errors_then_succeeds(fake):
+    fake.reset(reply(500), reply(503))
+    assert complete(fake) == "ok"
+    assert fake.hits == 3
+
+def test_gives_up_after_max_retries(fake, monkeypatch):
+    monkeypatch.setattr(settings, "openai_max_retries", 2)
+    fake.reset(reply(500), reply(500), reply(500), reply(500))
+    with pytest.raises(openai.InternalServerError):
+        complete(fake)
+    assert fake.hits == 3
+
+def test_client_errors_are_not_retried(fake):
+    fake.reset(reply(400))
+    with pytest.raises(openai.BadRequestError):
+        complete(fake)
+    assert fake.hits == 1
+
+def test_timeout_is_retried(fake):
+    fake.reset(reply(200, delay=0.6))
+    assert complete(fake, timeout=0.2) == "ok"
+    assert fake.hits == 2
+
+# ─────────── Retry-After ───────────
+
+def test_honours_retry_after_ms(fake):
+    fake.reset(reply(429, {"retry-after-ms": "300"}))
+    start = time.monotonic()
+    assert complete(fake) == "ok"
+    assert time.monotonic() - start >= 0.3
+    assert fake.hits == 2
+
+def test_honours_retry_after_seconds(fake):
+    fake.reset(reply(503, {"Retry-After": "1"}))
+    start = time.monotonic()
+    assert complete(fake) == "ok"
+    assert time.monotonic() - start >= 1
+
+def test_gives_up_when_retry_after_exceeds_cap(fake):
+    fake.reset(reply(429, {"Retry-After": "60"}))
+    start = time.monotonic()
+    with pytest.raises(openai.RateLimitError):
+        complete(fake)
+    assert time.monotonic() - start < 1
+    assert fake.hits == 1
+
+# ─────────── Circuit breaker ───────────
+
+def test_breaker_opens_then_recovers_after_probe(fake, monkeypatch):
+    monkeypatch.setattr(settings, "openai_max_retries", 0)
+    fake.reset(reply(500), reply(500), reply(500))
+    for _ in range(3):
+        with pytest.raises(openai.InternalServerError):
+            complete(fake)
+    assert openai_client.breaker.state == "open"
+
+    # abierto: corta sin llegar al upstream
+    with pytest.raises(UpstreamUnavailable) as exc:
+        complete(fake)
+    assert exc.value.retry_after >= 1
+    assert fake.hits == 3
+
+    time.sleep(0.35)
+    assert openai_client.breaker.state == "half_open"
+    assert complete(fake) == "ok"
+    assert openai_client.breaker.state == "closed"
+
+def test_failed_probe_reopens_breaker(fake, monkeypatch):
+    monkeypatch.setattr(settings, "openai_max_retries", 0)
+    fake.reset(*[reply(500)] * 4)
+    for _ in range(3):
+        with pytest.raises(openai.InternalServerError):
+            complete(fake)
+    time.sleep(0.35)
+    with pytest.raises(openai.InternalServerError):
+        complete(fake)
+    assert openai_client.breaker.state == "open"
+    with pytest.raises(UpstreamUnavailable):
+        complete(fake)
+    assert fake.hits == 4
+
+def test_rate_limits_do_not_open_breaker(fake, monkeypatch):
+    monkeypatch.setattr(settings, "openai_max_retries", 0)
+    fake.reset(*[reply(429)] * 5)
+    for _ in range(5):
+        with pytest.raises(openai.RateLimitError):
+            complete(fake)
+    assert openai_client.breaker.state == "closed"
@@ -0,0 +1,32 @@
+"""
+Generador determinístico: páginas más profundas que el límite de recursión y
+clave de la caché por página.
+"""
+import json, sys
+
+from services.ui_compiler import _canonical_json, build_main_dart, clear_page_cache
+
+
+def app(*widgets) -> dict:
+    return {
+        "name": "App", "theme": {"primary": "#2196F3"}, "routes": ["/home"],
+        "pages": [{"name": "home", "title": "Home", "widgets": list(widgets)}],
+    }
+
+def nested(depth: int, leaf: dict) -> dict:
+    widget = leaf
+    for _ in range(depth):
+        widget = {"type": "column", "children": [widget]}
+    return widget
+
+
+def test_deep_page_builds_and_hits_the_cache():
+    clear_page_cache()
+    ui = app(nested(sys.getrecursionlimit() * 3, {"type": "text", "text": "hoja"}))
+    code = build_main_dart(ui)
+    assert "Text('hoja'" in code
+    assert build_main_dart(ui) == code
+
+def test_canonical_json_matches_json_dumps():
+    doc = {"b": [1, 2.5, -0.0, 1e300, True, None, [], {}], "a": {"ñ": "é\n\"\\", "z": [[{}]]}, "": ""}
+    assert _canonical_json(doc) == json.dumps(doc, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
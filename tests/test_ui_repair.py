@@ -0,0 +1,84 @@
+"""
+Reparación local del UI JSON del modelo: converge en pocas rondas a un
+documento que el generador acepta, y lo que no puede arreglar lo señala.
+"""
+import copy, json, sys
+
+import pytest
+
+from services import ui_repair
+from services.ui_compiler import build_main_dart
+from services.ui_repair import model_json_text, repair_ui
+from services.ui_schema import ui_schema_errors
+
+
+def app(*widgets) -> dict:
+    return {
+        "name": "App", "theme": {"primary": "#2196F3"}, "routes": ["/home"],
+        "pages": [{"name": "home", "title": "Home", "widgets": list(widgets)}],
+    }
+
+def messy() -> dict:
+    # lo que suele devolver el modelo: claves faltantes, tipos mezclados, valores inventados
+    return {"name": "App", "pages": [
+        {"name": "home", "widgets": [
+            {"type": "appBar"},
+            {"type": "text"},
+            {"type": "dropdown", "label": "País", "items": "AR, UY ,CL"},
+            {"type": "column", "children": {"type": "image"}, "width": 120, "mainAxisAlignment": "left"},
+            {"type": "carousel"},
+            {"type": "bottomNavigationBar", "items": [{"icon": "home"}]},
+        ]},
+        {"name": "perfil", "title": "Perfil", "widgets": [{"type": "alertDialog", "dialog": {}}]},
+    ]}
+
+
+def test_messy_document_converges(monkeypatch):
+    # todos los errores de una ronda se arreglan juntos: alcanzan unas pocas
+    monkeypatch.setattr(ui_repair, "MAX_LOCAL_FIXES", 3)
+    result = repair_ui(messy())
+    assert result.valid and result.broken is None
+    assert ui_schema_errors(result.doc) == []
+    assert "DropdownButton" in build_main_dart(result.doc)
+    home = result.doc["pages"][0]
+    assert home["title"] == "home"
+    assert home["widgets"][2]["items"] == ["AR", "UY", "CL"]
+    assert home["widgets"][3]["width"] == "120px"
+    assert home["widgets"][4]["type"] == "container"
+    assert result.doc["routes"] == ["/home", "/perfil"]
+
+def test_repaired_document_is_a_fixed_point():
+    doc = repair_ui(messy()).doc
+    again = repair_ui(copy.deepcopy(doc))
+    assert again.valid and again.fixes == []
+    assert again.doc == doc
+
+def test_valid_document_is_untouched():
+    doc = app({"type": "text", "text": "hola"})
+    result = repair_ui(copy.deepcopy(doc))
+    assert result.valid and result.fixes == [] and result.doc == doc
+
+def test_unfixable_error_points_to_the_enclosing_widget():
+    doc = app({"type": "alertDialog", "dialog": {
+        "title": "t", "content": "c", "buttons": {"cancel": {"text": "No"}, "confirm": "Sí"},
+    }})
+    result = repair_ui(doc)
+    assert not result.valid
+    assert result.broken == (["pages", 0, "widgets", 0],
+                             "$.pages[0].widgets[0].dialog.buttons.confirm: se esperaba dict")
+
+def test_deep_document_is_repaired():
+    widget = {"type": "text"}
+    for _ in range(sys.getrecursionlimit() * 3):
+        widget = {"type": "column", "children": [widget]}
+    result = repair_ui(app(widget))
+    assert result.valid
+    assert [f.rsplit(": ", 1)[1] for f in result.fixes] == ["default"]
+
+def test_model_text_is_repaired():
+    raw = 'Claro:\n```json\n{“name”: “A”, "ok": True, "x": None, "list": [1, 2,], "t": "trunc'
+    assert json.loads(model_json_text(raw)) == {"name": "A", "ok": True, "x": None, "list": [1, 2], "t": "trunc"}
+
+def test_model_text_without_json_fails():
+    with pytest.raises(ValueError):
+        model_json_text("No puedo ayudarte con eso.")
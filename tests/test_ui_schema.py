@@ -0,0 +1,110 @@
+"""
+Validador compilado de services/ui_schema: rutas y mensajes de error, y
+documentos más profundos que el límite de recursión de Python.
+"""
+import sys
+
+import pytest
+
+from services.ui_compiler import UIValidationError, build_main_dart
+from services.ui_schema import MAX_ERRORS, ui_schema_errors, validate_ui
+
+
+def app(*widgets, **page) -> dict:
+    return {
+        "name": "App", "theme": {"primary": "#2196F3"}, "routes": ["/home"],
+        "pages": [{"name": "home", "title": "Home", "widgets": list(widgets), **page}],
+    }
+
+def untitled(*widgets) -> dict:
+    doc = app(*widgets)
+    del doc["pages"][0]["title"]
+    return doc
+
+def nested(depth: int, leaf: dict) -> dict:
+    widget = leaf
+    for _ in range(depth):
+        widget = {"type": "column", "children": [widget]}
+    return widget
+
+def messages(doc, node: str = "app") -> list:
+    return [str(e) for e in ui_schema_errors(doc, node)]
+
+# ─────────── Rutas y mensajes ───────────
+
+def test_valid_document_has_no_errors():
+    doc = app({"type": "column", "mainAxisAlignment": "center", "children": [{"type": "text", "text": "hola"}]},
+              fab={"action": "save"})
+    assert ui_schema_errors(doc) == []
+    validate_ui(doc)
+
+@pytest.mark.parametrize("doc, expected", [
+    ([], ["$: se esperaba dict"]),
+    ({"name": "A"}, ["$: falta 'theme'", "$: falta 'routes'", "$: falta 'pages'"]),
+    ({**app(), "routes": []}, ["$.routes: debe tener al menos un elemento"]),
+    (app(fab={"action": 1}), ["$.pages[0].fab.action: se esperaba str"]),
+    (app({"text": "x"}), ["$.pages[0].widgets[0]: falta 'type'"]),
+    (app({"type": "text", "text": "x", "width": 100}), ["$.pages[0].widgets[0].width: se esperaba str o None"]),
+    (app({"type": "column", "children": "x"}), ["$.pages[0].widgets[0].children: se esperaba list"]),
+    (app({"type": "row", "mainAxisAlignment": "left", "children": []}),
+     ["$.pages[0].widgets[0].mainAxisAlignment: valor no soportado 'left'"]),
+    (app({"type": "alertDialog", "dialog": {"title": "t", "content": "c", "buttons": {"cancel": {}, "confirm": "x"}}}),
+     ["$.pages[0].widgets[0].dialog.buttons.cancel: falta 'text'",
+      "$.pages[0].widgets[0].dialog.buttons.confirm: se esperaba dict"]),
+    (app({"type": "bottomNavigationBar", "selectedItemColor": "#fff", "textColor": "#000", "items": [{"icon": "h"}]}),
+     ["$.pages[0].widgets[0].items[0]: falta 'label'", "$.pages[0].widgets[0].items[0]: falta 'route'"]),
+])
+def test_error_paths_and_messages(doc, expected):
+    assert messages(doc) == expected
+
+def test_errors_come_in_document_order():
+    doc = app({"type": "column", "width": 3, "children": [{"type": "text"}, {"type": "image"}]}, {"type": "icon"})
+    assert messages(doc) == [
+        "$.pages[0].widgets[0].width: se esperaba str o None",
+        "$.pages[0].widgets[0].children[0]: falta 'text'",
+        "$.pages[0].widgets[0].children[1]: falta 'src'",
+        "$.pages[0].widgets[1]: falta 'icon'",
+    ]
+
+def test_unknown_widget_types_are_not_errors():
+    assert messages(app({"type": "carousel", "items": 1})) == []
+
+def test_subtree_errors_use_the_given_path():
+    [error] = ui_schema_errors({"type": "text"}, "widget", "$.pages[1].widgets[2]")
+    assert (error.path, error.msg) == ("$.pages[1].widgets[2]", "falta 'text'")
+    assert messages({"name": "p"}, "page") == ["$: falta 'widgets'"]
+
+def test_errors_are_capped():
+    assert len(ui_schema_errors(app(*[{"type": "text"}] * (MAX_ERRORS + 10)))) == MAX_ERRORS
+
+def test_validate_ui_raises_the_first_error():
+    with pytest.raises(UIValidationError) as e:
+        validate_ui(app({"type": "text"}, {"type": "icon"}))
+    assert (e.value.path, e.value.msg) == ("$.pages[0].widgets[0]", "falta 'text'")
+
+# ─────────── Anidamiento profundo ───────────
+
+def test_deep_tree_validates_without_recursion():
+    depth = sys.getrecursionlimit() * 3
+    assert ui_schema_errors(app(nested(depth, {"type": "text", "text": "hoja"}))) == []
+    validate_ui(app(nested(depth, {"type": "text", "text": "hoja"})))
+
+def test_deep_error_keeps_its_full_path():
+    depth = sys.getrecursionlimit() * 2
+    [error] = ui_schema_errors(app(nested(depth, {"type": "text"})))
+    assert error.path == "$.pages[0].widgets[0]" + ".children[0]" * depth
+    assert error.msg == "falta 'text'"
+
+# ─────────── title de la página ───────────
+
+def test_title_is_optional_without_app_bar():
+    doc = untitled({"type": "text", "text": "hola"}, {"type": "column", "children": [{"type": "appBar"}]})
+    assert ui_schema_errors(doc) == []
+    assert "appBar:" not in build_main_dart(doc)
+
+def test_title_is_required_with_app_bar():
+    doc = untitled({"type": "text", "text": "hola"}, {"type": "appBar"})
+    assert messages(doc) == ["$.pages[0]: falta 'title'"]
+    with pytest.raises(UIValidationError) as e:
+        build_main_dart(doc)
+    assert str(e.value) == "$.pages[0]: falta 'title'"
@@ -0,0 +1,38 @@
+"""
+UploadLimitMiddleware: el 413 muestra el máximo configurado, no el del body con
+el margen del multipart.
+"""
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from core.upload_limits import MULTIPART_OVERHEAD, UploadLimitMiddleware
+
+MAX = 1024 * 1024
+MULTIPART = {"content-type": "multipart/form-data; boundary=x"}
+
+
+def client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(UploadLimitMiddleware, max_bytes=MAX)
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        return {"size": len(await request.body())}
+
+    return TestClient(app)
+
+
+def test_body_within_the_multipart_margin_passes():
+    response = client().post("/upload", content=b"x" * (MAX + MULTIPART_OVERHEAD), headers=MULTIPART)
+    assert response.status_code == 200
+
+def test_too_large_by_content_length_shows_the_configured_max():
+    response = client().post("/upload", content=b"x" * (MAX + MULTIPART_OVERHEAD + 1), headers=MULTIPART)
+    assert response.status_code == 413
+    assert response.json()["detail"] == "La imagen supera el máximo de 1 MB."
+
+def test_too_large_while_streaming_shows_the_configured_max():
+    chunks = (b"x" * (64 * 1024) for _ in range((MAX + MULTIPART_OVERHEAD) // (64 * 1024) + 1))
+    response = client().post("/upload", content=chunks, headers=MULTIPART)
+    assert response.status_code == 413
+    assert response.json()["detail"] == "La imagen supera el máximo de 1 MB."
@@ -0,0 +1,51 @@
+"""
+WorkerPool: una tarea ocupa su lugar hasta que termina en el worker, aunque
+quien la esperaba se cancele.
+"""
+import asyncio, threading, time
+
+import pytest
+
+from services.worker_pool import PoolSaturated, WorkerPool
+
+
+def test_cancelled_caller_keeps_the_slot_until_the_job_ends():
+    async def run():
+        pool = WorkerPool("thread", 1, 0, 3)
+        gate = threading.Event()
+        try:
+            waiter = asyncio.create_task(pool.run(gate.wait))
+            await asyncio.sleep(0.05)
+            waiter.cancel()
+            await asyncio.sleep(0.05)
+            # el worker sigue ocupado: no se acepta otra tarea
+            with pytest.raises(PoolSaturated):
+                await asyncio.wait_for(pool.run(time.sleep, 0), 1)
+            gate.set()
+            await asyncio.sleep(0.05)
+            return await pool.run(sum, [1, 2]), pool._pending
+        finally:
+            gate.set()
+            pool.shutdown()
+
+    assert asyncio.run(run()) == (3, 0)
+
+def test_cancelled_queued_job_frees_its_slot():
+    async def run():
+        pool = WorkerPool("thread", 1, 1, 3)
+        gate = threading.Event()
+        try:
+            busy = asyncio.create_task(pool.run(gate.wait))
+            queued = asyncio.create_task(pool.run(time.sleep, 0))
+            await asyncio.sleep(0.05)
+            queued.cancel()
+            await asyncio.sleep(0.05)
+            pending = pool._pending
+            gate.set()
+            await busy
+            return pending
+        finally:
+            gate.set()
+            pool.shutdown()
+
+    assert asyncio.run(run()) == 1
@@ -0,0 +1,65 @@
+"""
+ZIP en streaming con entradas precomprimidas: archivos válidos para zipfile y
+bytes idénticos para la misma entrada (la caché de exportaciones depende de eso).
+"""
+import io, os, zipfile
+
+from services.flutter_generator import compress_overlays, generate_flutter_app, iter_flutter_zip
+from services.zip_stream import DEFLATED, STORED, iter_zip, prepare_entry
+
+FILES = {
+    "lib/": None,
+    "lib/main.dart": b"void main() {}\n" * 50,
+    "assets/ícono.png": b"\x89PNG" + bytes(range(256)),
+    "random.bin": os.urandom(512),
+    "vacío.txt": b"",
+}
+DATA = {"generated_code": "void main() {}\n", "appName": "demo_app",
+        "generated_files": {"lib/pages/home.dart": "class HomePage {}\n"}}
+
+
+def build(files: dict) -> bytes:
+    return b"".join(iter_zip(prepare_entry(name, content) for name, content in files.items()))
+
+
+def test_archive_is_valid_and_round_trips():
+    with zipfile.ZipFile(io.BytesIO(build(FILES))) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == list(FILES)
+        for name, content in FILES.items():
+            info = zf.getinfo(name)
+            assert info.date_time == (1980, 1, 1, 0, 0, 0)
+            if content is None:
+                assert info.is_dir()
+            else:
+                assert zf.read(name) == content
+                assert info.external_attr >> 16 == 0o100644
+
+def test_compression_method_per_entry():
+    with zipfile.ZipFile(io.BytesIO(build(FILES))) as zf:
+        assert zf.getinfo("lib/main.dart").compress_type == DEFLATED
+        # ya comprimido por extensión, o DEFLATE no gana nada
+        assert zf.getinfo("assets/ícono.png").compress_type == STORED
+        assert zf.getinfo("random.bin").compress_type == STORED
+
+def test_same_entries_give_the_same_bytes():
+    assert build(FILES) == build(FILES)
+
+def test_flutter_zip_is_deterministic():
+    first = b"".join(iter_flutter_zip(compress_overlays(DATA)))
+    # el orden de las entradas no depende del orden de los overlays
+    reordered = compress_overlays(DATA)
+    second = b"".join(iter_flutter_zip(dict(reversed(list(reordered.items())))))
+    assert first == second
+
+def test_flutter_zip_matches_the_project_on_disk(tmp_path):
+    generate_flutter_app(DATA, tmp_path)
+    on_disk = {p.relative_to(tmp_path).as_posix(): p.read_bytes() for p in tmp_path.rglob("*") if p.is_file()}
+    with zipfile.ZipFile(io.BytesIO(b"".join(iter_flutter_zip(compress_overlays(DATA))))) as zf:
+        assert zf.testzip() is None
+        names = zf.namelist()
+        assert names == sorted(names, key=lambda n: n.rstrip("/"))
+        assert "lib/pages/" in names
+        assert {n: zf.read(n) for n in names if not n.endswith("/")} == on_disk
+    assert on_disk["lib/main.dart"] == b"void main() {}\n"
+    assert b"demo_app" in on_disk["pubspec.yaml"]